@@ -0,0 +1,105 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_THINK_RE = re.compile(r"<think>.*?(</think>|$)", re.DOTALL)
+# A rule still open at the end of the text: RULE with no END after it.
+_OPEN_RULE_RE = re.compile(r"\bRULE\b(?!.*\bEND\b)", re.DOTALL)
+
+
+class GenerationProfile:
+    """
+    Per-model generation settings sent with every LLM call.
+
+    stop: stop sequences; generation halts once the rule is closed.
+    max_tokens: cap on answer tokens.
+    reasoning_effort / reasoning_max_tokens: OpenRouter reasoning controls for
+        reasoning models. Reasoning tokens count against max_tokens, so the
+        reasoning budget is added on top of the answer cap.
+    exclude_reasoning: ask the provider not to return the reasoning trace.
+    """
+    def __init__(self, stop: Optional[List[str]] = None, max_tokens: Optional[int] = None,
+                 reasoning_effort: Optional[str] = None, reasoning_max_tokens: Optional[int] = None,
+                 exclude_reasoning: bool = False):
+        self.stop = stop or []
+        self.max_tokens = max_tokens
+        self.reasoning_effort = reasoning_effort
+        self.reasoning_max_tokens = reasoning_max_tokens
+        self.exclude_reasoning = exclude_reasoning
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "GenerationProfile":
+        return cls(
+            stop=config.get("stop"),
+            max_tokens=config.get("max_tokens"),
+            reasoning_effort=config.get("reasoning_effort"),
+            reasoning_max_tokens=config.get("reasoning_max_tokens"),
+            exclude_reasoning=config.get("exclude_reasoning", False),
+        )
+
+    def llm_kwargs(self, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Keyword arguments for llm.bind(); max_tokens overrides the profile's answer cap."""
+        kwargs: Dict[str, Any] = {}
+        if self.stop:
+            kwargs["stop"] = list(self.stop)
+        caps = [t for t in (max_tokens, self.max_tokens) if t]
+        answer_tokens = min(caps) if caps else None
+        reasoning: Dict[str, Any] = {}
+        if self.reasoning_max_tokens:
+            reasoning["max_tokens"] = self.reasoning_max_tokens
+        elif self.reasoning_effort:
+            reasoning["effort"] = self.reasoning_effort
+        if self.exclude_reasoning:
+            reasoning["exclude"] = True
+        if reasoning:
+            kwargs["extra_body"] = {"reasoning": reasoning}
+        if answer_tokens:
+            kwargs["max_tokens"] = answer_tokens + (self.reasoning_max_tokens or 0)
+        return kwargs
+
+    def restore_stop(self, answer: str, finish_reason: Optional[str]) -> str:
+        """
+        Re-append the stop sequence that the provider strips when generation halts on it.
+        "stop" is also the finish reason of a natural end of sequence, so an answer whose
+        rule is already closed (possibly followed by prose) is left as is.
+        """
+        if not self.stop or finish_reason != "stop":
+            return answer
+        stripped = answer.rstrip()
+        if _OPEN_RULE_RE.search(stripped) and not stripped.endswith("```"):
+            return f"{stripped}\n{self.stop[0]}"
+        return answer
+
+
+def split_reasoning(message) -> Tuple[str, str]:
+    """
+    Separate a chat message into (reasoning, answer).
+    Reasoning comes from the provider's dedicated field when present and from
+    inline <think>...</think> blocks otherwise; the answer is what remains.
+    """
+    content = getattr(message, "content", message)
+    if not isinstance(content, str):
+        content = str(content)
+    extra = getattr(message, "additional_kwargs", None) or {}
+    reasoning_parts = []
+    for key in ("reasoning_content", "reasoning"):
+        if extra.get(key):
+            reasoning_parts.append(str(extra[key]))
+    if "<think>" in content:
+        reasoning_parts.extend(m.group(0) for m in _THINK_RE.finditer(content))
+        content = _THINK_RE.sub("", content)
+    return "\n".join(reasoning_parts), content.strip()
+
+
+def get_generation_profile(model: Optional[str]) -> GenerationProfile:
+    """
+    Return the profile for a model from settings.GENERATION_PROFILES.
+    Keys are matched as model-name prefixes (longest wins), falling back to 'default'.
+    """
+    from config.settings import get_settings
+    profiles = get_settings().GENERATION_PROFILES
+    key = "default"
+    if model:
+        matches = [k for k in profiles if k != "default" and model.startswith(k)]
+        if matches:
+            key = max(matches, key=len)
+    return GenerationProfile.from_config(profiles.get(key, {}))
@@ -1,13 +1,30 @@
 from ..base_agent import BaseAgent
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnablePassthrough
+from .generation_profile import GenerationProfile, split_reasoning
 import re
 
+_DSL_BLOCK_RE = re.compile(r'```dsl\s*\n(.*?)\n```', re.DOTALL)
+_RULE_RE = re.compile(r'RULE\s+\w+.*?END', re.DOTALL)
+
+def response_usage(result):
+    """Prompt and completion tokens the provider reported for a chat response, or None."""
+    usage = getattr(result, "usage_metadata", None)
+    if usage:
+        return {"prompt_tokens": usage.get("input_tokens"), "completion_tokens": usage.get("output_tokens")}
+    usage = (getattr(result, "response_metadata", None) or {}).get("token_usage")
+    if usage:
+        return {"prompt_tokens": usage.get("prompt_tokens"), "completion_tokens": usage.get("completion_tokens")}
+    return None
+
 class SimpleLLMAgent(BaseAgent):
     """Simple LLM agent that directly generates DSL code without ReAct complexity."""
     
-    def __init__(self, llm, tools=None, memory=None, agent_type=None, verbose=True, **kwargs):
+    def __init__(self, llm, tools=None, memory=None, agent_type=None, verbose=True, generation_profile=None, **kwargs):
         super().__init__(llm, tools, memory, agent_type, verbose, **kwargs)
+        # Stop sequences, output caps and reasoning budget for this model
+        self.generation_profile = generation_profile or GenerationProfile()
+        self.last_reasoning = ""
         
         # Create a simple prompt template
         self.prompt_template = PromptTemplate(
@@ -38,18 +55,16 @@ END
         self._chain = self.prompt_template | self.llm
 
     def _extract_dsl_code(self, text):
-        """Extract DSL code from LLM response."""
-        # Look for DSL code blocks
-        dsl_pattern = r'```dsl\s*\n(.*?)\n```'
-        matches = re.findall(dsl_pattern, text, re.DOTALL)
-        if matches:
-            return matches[0].strip()
+        """Extract DSL code from the answer channel of an LLM response."""
+        # Look for DSL code blocks (first match only, no full scan)
+        match = _DSL_BLOCK_RE.search(text)
+        if match:
+            return match.group(1).strip()
         
         # Look for RULE patterns without code blocks
-        rule_pattern = r'RULE\s+\w+.*?END'
-        matches = re.findall(rule_pattern, text, re.DOTALL)
-        if matches:
-            return matches[0].strip()
+        match = _RULE_RE.search(text)
+        if match:
+            return match.group(0).strip()
         
         return text.strip()
 
@@ -62,7 +77,7 @@ END
         for i, example in enumerate(examples, 1):
             if isinstance(example, dict):
                 prompt = example.get('prompt', '')
-                dsl_pattern = example.get('dsl_pattern', '')
+                dsl_pattern = example.get('dsl_pattern') or example.get('response', '')
                 if prompt and dsl_pattern:
                     formatted_examples.append(f"Example {i}:")
                     formatted_examples.append(f"Prompt: {prompt}")
@@ -72,24 +87,41 @@ END
         
         return "\n".join(formatted_examples)
 
-    def query(self, query, prompt=None, context=None):
+    def query(self, query, prompt=None, context=None, max_tokens=None, timeout=None):
+        return self.generate(query, prompt, context, max_tokens, timeout)["code"]
+
+    def generate(self, query, prompt=None, context=None, max_tokens=None, timeout=None):
+        """Like query(), but returns {"code", "model", "usage"} with the responding model and its reported usage."""
         if self._chain is None:
             raise RuntimeError("Agent not initialized.")
         
         # Format context as string with examples
         context_str = self._format_examples(context)
         
+        # Generation profile (stop/max_tokens/reasoning) plus per-request output cap
+        llm_kwargs = self.generation_profile.llm_kwargs(max_tokens=max_tokens)
+        if timeout is not None:
+            # Per-request HTTP timeout (the remaining request deadline)
+            llm_kwargs["timeout"] = timeout
+        chain = self.prompt_template | self.llm.bind(**llm_kwargs) if llm_kwargs else self._chain
+        
         try:
             # Single LLM call - no retries needed
-            result = self._chain.invoke({
+            result = chain.invoke({
                 "prompt": prompt or "You are a helpful AI assistant that generates DSL code.",
                 "context": context_str,
                 "query": query
             })
             
+            # Keep reasoning out of the extractor; only the answer channel is scanned
+            self.last_reasoning, answer = split_reasoning(result)
+            metadata = getattr(result, "response_metadata", None) or {}
+            answer = self.generation_profile.restore_stop(answer, metadata.get("finish_reason"))
+            
             # Extract and return DSL code
-            dsl_code = self._extract_dsl_code(result.content)
-            return dsl_code
+            dsl_code = self._extract_dsl_code(answer)
+            return {"code": dsl_code, "model": metadata.get("model_name") or getattr(self.llm, "model_name", None),
+                    "usage": response_usage(result)}
             
         except Exception as e:
-            return f"[Error] {str(e)}" 
\ No newline at end of file
+            return {"code": f"[Error] {str(e)}", "model": getattr(self.llm, "model_name", None), "usage": None} 
\ No newline at end of file
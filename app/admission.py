@@ -0,0 +1,103 @@
+"""
+Admission control and load shedding for generation requests.
+
+At most `concurrency` workflows run at once, on a dedicated thread pool;
+further requests wait in a queue of at most `max_queue`. A request is
+rejected up front (Overloaded, served as 503) when the queue is full or when
+its estimated wait, from its position in the queue and a moving average of
+service time, plus its own service time already exceeds its remaining
+deadline: it could not finish in time anyway. Rejecting early keeps
+the queue short, so accepted requests see stable latency instead of a
+growing backlog.
+"""
+import asyncio
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+from app.deadline import Deadline, DeadlineExceeded
+from app.metrics import metrics
+from config.settings import get_settings
+
+
+class Overloaded(RuntimeError):
+    """Request shed by admission control; retry_after is the estimated wait in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency plus a deadline-aware bounded queue."""
+
+    def __init__(self, concurrency: int = 4, max_queue: int = 32, smoothing: float = 0.2):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.smoothing = smoothing
+        self.service_time: Optional[float] = None
+        self.queued = 0
+        self.running = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="generate")
+
+    def estimated_wait(self) -> float:
+        """Expected time until a new request would start running."""
+        ahead = self.queued + self.running - self.concurrency + 1
+        if ahead <= 0 or not self.service_time:
+            return 0.0
+        return math.ceil(ahead / self.concurrency) * self.service_time
+
+    def _record(self, seconds: float):
+        if self.service_time is None:
+            self.service_time = seconds
+        else:
+            self.service_time += self.smoothing * (seconds - self.service_time)
+
+    def _release(self, future, started: float):
+        self.running -= 1
+        self._slots.release()
+        self._record(time.monotonic() - started)
+
+    async def run(self, deadline: Deadline, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(*args) on the pool within the deadline, or raise Overloaded / DeadlineExceeded."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        wait = self.estimated_wait()
+        if self.queued >= self.max_queue or wait + (self.service_time or 0.0) > deadline.remaining():
+            metrics.inc("admission_rejected_total")
+            raise Overloaded(f"Server busy: estimated wait {wait:.1f}s does not fit the request budget "
+                             f"({deadline.remaining():.1f}s) or the queue is full", retry_after=wait)
+        metrics.inc("admission_accepted_total")
+        queued_at = time.monotonic()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline.remaining())
+        except asyncio.TimeoutError:
+            metrics.inc("admission_expired_in_queue_total")
+            raise DeadlineExceeded("Deadline exceeded while queued")
+        finally:
+            self.queued -= 1
+        started = time.monotonic()
+        metrics.observe("admission_queue_wait_seconds", started - queued_at)
+        self.running += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        # The slot is held until the worker thread really finishes, even if we stop waiting for it.
+        future.add_done_callback(lambda f: self._release(f, started))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline exceeded while generating")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "queued": self.queued, "concurrency": self.concurrency,
+                "max_queue": self.max_queue, "service_time": self.service_time,
+                "estimated_wait": round(self.estimated_wait(), 3)}
+
+
+@lru_cache
+def get_admission_controller() -> AdmissionController:
+    settings = get_settings()
+    return AdmissionController(settings.GENERATE_CONCURRENCY, settings.GENERATE_MAX_QUEUE)
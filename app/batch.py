@@ -0,0 +1,304 @@
+"""
+Bulk rule generation from a JSONL file of queries.
+
+Each input line is a JSON object with a "query" (and optionally an "id"; the
+line number otherwise) or a bare JSON string. Rows are streamed: at most
+2 x concurrency generations are in flight, spaced by a requests-per-minute
+limit. Each result is appended to the output JSONL as soon as it completes,
+so output order is completion order.
+
+Queries that are identical after whitespace and case normalization are
+generated once. A duplicate gets the result of the first occurrence, marked
+with "duplicate_of" (a failed query is generated again when it reappears
+after its failure was written).
+
+Each written row is followed by a line in <output>.checkpoint giving the row
+id and the output size. A run with --resume cuts the output back to the last
+checkpointed size and skips the checkpointed rows; it stops with a
+CheckpointError if the output is missing or shorter than that. Rows whose generation
+failed (including a rule that came back as an error message) are checkpointed too
+and only re-run with --retry-errors; the newer output line for an id then supersedes the older one.
+
+    python -m app.batch queries.jsonl -o results.jsonl --concurrency 4 --rpm 20 [--resume]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.deadline import Deadline, DeadlineExceeded
+from app.dsl.validator import generation_error
+from app.ratelimit import RateLimiter
+
+logger = logging.getLogger("batch")
+
+Generate = Callable[[str, Optional[Deadline]], Dict[str, Any]]
+_encode = json.JSONEncoder(default=str).encode
+
+
+class CheckpointError(Exception):
+    """The output file does not match its checkpoint, so the run cannot be resumed."""
+
+
+def query_key(query: str) -> str:
+    """Dedup key: hash of the query with whitespace collapsed and case folded."""
+    return hashlib.sha256(" ".join(query.split()).casefold().encode("utf-8")).hexdigest()[:16]
+
+
+def workflow_generate(query: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Default generator: the full LangGraph workflow."""
+    from app.main_workflow import run_workflow
+    result = run_workflow(query, deadline=deadline)
+    validation = result.get("validation") or {}
+    return {"rule": result.get("codegen_result") or "", "valid": validation.get("valid"),
+            "model": result.get("codegen_model"), "tier": result.get("codegen_tier")}
+
+
+def iter_rows(path: str) -> Iterator[Tuple[Any, Optional[str], Optional[str]]]:
+    """(id, query, error) per non-empty input line."""
+    with open(path, "r", encoding="utf-8") as f:
+        line_number = -1
+        for line in f:
+            if not line.strip():
+                continue
+            line_number += 1
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(item, str):
+                yield line_number, item, None
+            elif isinstance(item, dict) and isinstance(item.get("query"), str):
+                yield item.get("id", line_number), item["query"], None
+            else:
+                yield line_number, None, "Line has no query"
+
+
+class BatchStats:
+    def __init__(self):
+        self.read = 0
+        self.skipped = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def written(self) -> int:
+        return self.generated + self.duplicates + self.invalid
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.written / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "read": self.read,
+            "skipped": self.skipped,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "invalid_lines": self.invalid,
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 2),
+        }
+
+
+class BatchRunner:
+    """Concurrent, rate-limited, resumable generation over a JSONL file (see module docstring)."""
+
+    def __init__(self, generate: Generate = workflow_generate, concurrency: int = 4, rpm: float = 0.0,
+                 timeout: Optional[float] = None):
+        self.generate = generate
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rpm)
+        self.timeout = timeout
+
+    def _generate(self, query: str) -> Dict[str, Any]:
+        self.limiter.wait()
+        started = time.perf_counter()
+        try:
+            result = dict(self.generate(query, Deadline.after(self.timeout) if self.timeout else None))
+            # The workflow reports provider failures as text; those rows are errors, not results.
+            error = generation_error(result.get("rule"))
+            result["status"] = "ok" if error is None else "error"
+            if error is not None:
+                result["error"] = error
+        except DeadlineExceeded as e:
+            result = {"status": "timeout", "error": str(e)}
+        except Exception as e:
+            result = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        result["latency"] = round(time.perf_counter() - started, 3)
+        return result
+
+    @staticmethod
+    def _load_checkpoint(path: str, retry_errors: bool) -> Tuple[Set[str], int]:
+        """
+        Done row ids (as JSON) and the output size at the last complete checkpoint line.
+        A torn last line (from a crash mid-write) is cut off.
+        """
+        done: Set[str] = set()
+        size = 0
+        valid = 0
+        with open(path, "r+b") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid += len(line)
+                size = entry["offset"]
+                row = _encode(entry["id"])
+                if entry["ok"] or not retry_errors:
+                    done.add(row)
+                else:
+                    done.discard(row)
+            f.truncate(valid)
+        return done, size
+
+    def run(self, input_path: str, output_path: str, resume: bool = False, retry_errors: bool = False,
+            progress_every: float = 5.0) -> BatchStats:
+        checkpoint_path = output_path + ".checkpoint"
+        done: Set[str] = set()
+        output_size = 0
+        if resume and os.path.exists(checkpoint_path):
+            done, output_size = self._load_checkpoint(checkpoint_path, retry_errors)
+            actual_size = os.path.getsize(output_path) if os.path.exists(output_path) else None
+            if actual_size is None or actual_size < output_size:
+                found = "is missing" if actual_size is None else f"has {actual_size} bytes"
+                raise CheckpointError(f"{output_path} {found} but its checkpoint records {output_size}; "
+                                      f"run without --resume to start over.")
+            logger.info(f"Resuming {input_path}: {len(done)} rows already done.")
+        elif os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        stats = BatchStats()
+        started = last_report = time.perf_counter()
+        # key -> output offset of the line holding its result; key -> rows waiting for an in-flight original.
+        finished: Dict[str, int] = {}
+        waiting: Dict[str, List[Any]] = {}
+        pending: Dict[Future, Tuple[Any, str, str]] = {}
+
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        with open(output_path, "ab") as out, open(output_path, "rb") as reread, \
+                open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            # Lines written after the last checkpoint are dropped and their rows redone.
+            out.truncate(output_size)
+            out.seek(0, os.SEEK_END)
+            self._index_output(reread, output_size, finished)
+
+            def write(record: Dict[str, Any]) -> int:
+                offset = out.tell()
+                out.write(_encode(record).encode("utf-8") + b"\n")
+                out.flush()
+                ok = record.get("status") == "ok"
+                checkpoint.write(_encode({"id": record["id"], "offset": out.tell(), "ok": ok}) + "\n")
+                checkpoint.flush()
+                if not ok:
+                    stats.errors += 1
+                return offset
+
+            def write_duplicate(row_id: Any, query: str, offset: int):
+                reread.seek(offset)
+                original = json.loads(reread.readline())
+                original.update(id=row_id, query=query, duplicate_of=original["id"])
+                write(original)
+                stats.duplicates += 1
+
+            def complete(future: Future):
+                row_id, query, key = pending.pop(future)
+                record = {"id": row_id, "query": query, "key": key, **future.result()}
+                offset = write(record)
+                stats.generated += 1
+                if record["status"] == "ok":
+                    finished[key] = offset
+                for dup_id, dup_query in waiting.pop(key):
+                    write_duplicate(dup_id, dup_query, offset)
+
+            try:
+                for row_id, query, error in iter_rows(input_path):
+                    stats.read += 1
+                    if _encode(row_id) in done:
+                        stats.skipped += 1
+                        continue
+                    if error is not None:
+                        write({"id": row_id, "status": "error", "error": error})
+                        stats.invalid += 1
+                        continue
+                    key = query_key(query)
+                    if key in finished:
+                        write_duplicate(row_id, query, finished[key])
+                    elif key in waiting:
+                        waiting[key].append((row_id, query))
+                    else:
+                        waiting[key] = []
+                        pending[pool.submit(self._generate, query)] = (row_id, query, key)
+                    while len(pending) >= 2 * self.concurrency:
+                        for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                            complete(future)
+                    now = time.perf_counter()
+                    if now - last_report >= progress_every:
+                        last_report = now
+                        self._report(stats, now - started, len(pending))
+                while pending:
+                    for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                        complete(future)
+            finally:
+                # On an interrupt, queued generations are dropped rather than run.
+                pool.shutdown(wait=True, cancel_futures=True)
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    @staticmethod
+    def _index_output(reread, size: int, finished: Dict[str, int]):
+        """Rebuild the key -> offset index from the output of earlier runs."""
+        reread.seek(0)
+        while reread.tell() < size:
+            offset = reread.tell()
+            record = json.loads(reread.readline())
+            if record.get("status") == "ok" and "duplicate_of" not in record:
+                finished[record["key"]] = offset
+
+    @staticmethod
+    def _report(stats: BatchStats, elapsed: float, in_flight: int):
+        stats.elapsed = elapsed
+        logger.info(f"{stats.written} written ({stats.duplicates} duplicates, {stats.errors} errors, "
+                    f"{stats.skipped} skipped) of {stats.read} read, {in_flight} in flight, "
+                    f"{stats.rows_per_second:.2f} rows/s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.batch", description="Generate rules for a JSONL file of queries.")
+    parser.add_argument("input", help="JSONL file with one query per line")
+    parser.add_argument("-o", "--output", required=True, help="Results JSONL file")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=20.0, help="Max generations started per minute (0 for no limit)")
+    parser.add_argument("--timeout", type=float, help="Deadline per generation in seconds")
+    parser.add_argument("--resume", action="store_true", help="Continue from the output's checkpoint")
+    parser.add_argument("--retry-errors", action="store_true", help="On resume, re-run rows that failed")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    runner = BatchRunner(concurrency=args.concurrency, rpm=args.rpm, timeout=args.timeout)
+    try:
+        stats = runner.run(args.input, args.output, resume=args.resume, retry_errors=args.retry_errors,
+                           progress_every=args.progress_every)
+    except CheckpointError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(json.dumps(stats.as_dict()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
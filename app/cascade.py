@@ -0,0 +1,138 @@
+import logging
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+from agents.langchain.generation_profile import get_generation_profile
+from agents.langchain.simple_llm_agent import SimpleLLMAgent
+from app.deadline import Deadline
+from app.dsl.validator import ValidationResult, validate_rule
+from app.metrics import metrics
+from app.openrouter_client import get_openrouter_llm
+from app.utils.token_util import add_usage
+from config.settings import get_settings
+
+logger = logging.getLogger("cascade")
+
+
+class CascadeTier:
+    """One model in the cascade plus the validation score it must reach to be accepted."""
+    def __init__(self, name: str, model: str, temperature: float = 0.7, min_score: float = 1.0):
+        self.name = name
+        self.model = model
+        self.temperature = temperature
+        self.min_score = min_score
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "CascadeTier":
+        return cls(
+            name=config["name"],
+            model=config["model"],
+            temperature=config.get("temperature", 0.7),
+            min_score=config.get("min_score", 1.0),
+        )
+
+
+class ModelCascade:
+    """
+    Generator-stage model cascade.
+    Tiers are tried cheapest first. Each output is checked locally with the
+    grammar parser and structural checks; the request escalates to the next
+    tier only when the check fails. If every tier fails, the best-scoring
+    attempt is returned.
+    """
+    def __init__(
+        self,
+        tiers: List[CascadeTier],
+        llm_factory: Optional[Callable[..., Any]] = None,
+        validator: Callable[[str], ValidationResult] = validate_rule,
+    ):
+        if not tiers:
+            raise ValueError("ModelCascade requires at least one tier.")
+        self.tiers = tiers
+        self.validator = validator
+        self._llm_factory = llm_factory or get_openrouter_llm
+        self._agents: Dict[str, SimpleLLMAgent] = {}
+
+    def _agent(self, tier: CascadeTier) -> SimpleLLMAgent:
+        agent = self._agents.get(tier.name)
+        if agent is None:
+            llm = self._llm_factory(model=tier.model, temperature=tier.temperature)
+            agent = SimpleLLMAgent(llm=llm, verbose=False, generation_profile=get_generation_profile(tier.model))
+            self._agents[tier.name] = agent
+        return agent
+
+    def tier_index(self, name: str) -> int:
+        for index, tier in enumerate(self.tiers):
+            if tier.name == name:
+                return index
+        raise ValueError(f"Unknown cascade tier: {name}")
+
+    def run(self, query: str, prompt: Optional[str] = None, context=None, start_tier: int = 0,
+            max_tokens: Optional[int] = None, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Generate a rule, escalating through tiers from start_tier until one validates.
+        "model" is the model that answered; "usage" sums the reported tokens of every tier called.
+        With a deadline, each call's timeout is the remaining time and no tier is
+        started after it has passed (the best attempt so far is returned).
+        """
+        metrics.inc("cascade_requests_total")
+        best = None
+        usage = None  # provider-reported tokens of every tier called
+        for index in range(start_tier, len(self.tiers)):
+            tier = self.tiers[index]
+            if deadline is not None:
+                if best is not None and deadline.expired:
+                    logger.info(f"Deadline reached; not escalating to tier '{tier.name}'.")
+                    metrics.inc("cascade_deadline_stops_total")
+                    return dict(best, usage=usage)
+                deadline.check(f"cascade tier '{tier.name}'")
+            started = time.perf_counter()
+            reply = self._agent(tier).generate(query=query, prompt=prompt, context=context, max_tokens=max_tokens,
+                                               timeout=deadline.remaining() if deadline is not None else None)
+            code = reply["code"]
+            usage = add_usage(usage, reply["usage"])
+            metrics.observe("cascade_tier_latency_seconds", time.perf_counter() - started, tier=tier.name)
+
+            validation = self.validator(code)
+            attempt = {
+                "tier": tier.name,
+                "model": reply["model"] or tier.model,
+                "codegen_result": code,
+                "validation": validation.as_dict(),
+                "escalations": index - start_tier,
+                "usage": usage,
+            }
+            if best is None or validation.score > best["validation"]["score"]:
+                best = attempt
+            if validation.valid and validation.score >= tier.min_score:
+                metrics.inc("cascade_served_total", tier=tier.name)
+                if index > start_tier:
+                    metrics.inc("cascade_escalated_requests_total")
+                return attempt
+            if index + 1 < len(self.tiers):
+                logger.info(f"Tier '{tier.name}' failed validation (score={validation.score:.2f}); escalating.")
+                metrics.inc("cascade_escalations_total", tier=tier.name)
+
+        metrics.inc("cascade_exhausted_total")
+        if len(self.tiers) - 1 > start_tier:
+            metrics.inc("cascade_escalated_requests_total")
+        return dict(best, escalations=len(self.tiers) - 1 - start_tier, usage=usage)
+
+
+def cascade_stats() -> Dict[str, Any]:
+    """Summarize cascade metrics, including the fraction of requests that escalated."""
+    requests = metrics.get("cascade_requests_total")
+    escalated = metrics.get("cascade_escalated_requests_total")
+    return {
+        "requests": requests,
+        "escalated_requests": escalated,
+        "escalation_rate": escalated / requests if requests else 0.0,
+        "exhausted": metrics.get("cascade_exhausted_total"),
+    }
+
+
+@lru_cache
+def get_model_cascade() -> ModelCascade:
+    settings = get_settings()
+    return ModelCascade([CascadeTier.from_config(t) for t in settings.CASCADE_TIERS])
@@ -0,0 +1,147 @@
+"""
+Record/replay of LLM HTTP traffic.
+
+CassetteTransport is an httpx transport that sits under the OpenAI client used
+by ChatOpenAI, so every LLM call of the agents, the cascade and the workflow
+goes through it. Modes:
+  - record: forward to the provider and store the response;
+  - replay: serve stored responses only, raise CassetteMiss for unknown requests;
+  - passthrough: forward without touching the cassette.
+
+Requests are keyed by a hash of the method, URL path and JSON body with keys
+sorted and volatile fields removed, so header changes (API key, user agent,
+retry counters) and key order do not change the key. Responses are stored
+zlib-compressed in SQLite together with the time they took; replay can sleep
+for that time scaled by latency_scale to simulate the provider offline.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.metrics import metrics
+
+MODES = ("record", "replay", "passthrough")
+# Body fields that do not affect the completion.
+VOLATILE_FIELDS = frozenset(("user", "metadata", "stream_options"))
+# Headers that no longer apply once the body is stored decoded.
+_DROPPED_HEADERS = frozenset(("content-encoding", "content-length", "transfer-encoding", "connection"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    latency REAL NOT NULL,
+    recorded REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class CassetteMiss(LookupError):
+    """Replay mode received a request that was never recorded."""
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items() if v is not None and k not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """Stable hash of a request (see module docstring)."""
+    try:
+        payload = json.dumps(_normalize(json.loads(body)), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        payload = body.decode("utf-8", "replace")
+    return hashlib.sha256(f"{method.upper()} {path}\n{payload}".encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """Compressed store of recorded responses keyed by request hash."""
+
+    def __init__(self, path: str = "data/llm_cassette.db"):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Tuple[int, Dict[str, str], bytes, float]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, latency FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), zlib.decompress(row[2]), row[3]
+
+    def put(self, key: str, status: int, headers: Dict[str, str], body: bytes, latency: float):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, status, headers, body, latency, recorded) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(headers), zlib.compress(body, 9), latency, time.time()))
+
+    def close(self):
+        self._db.close()
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records, replays or passes through requests (see module docstring)."""
+
+    def __init__(self, cassette: Cassette, mode: str = "replay", latency_scale: float = 0.0,
+                 transport: Optional[httpx.BaseTransport] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.cassette = cassette
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "passthrough":
+            return self._transport.handle_request(request)
+        key = request_key(request.method, request.url.path, request.read())
+        if self.mode == "replay":
+            stored = self.cassette.get(key)
+            if stored is None:
+                metrics.inc("cassette_misses_total")
+                raise CassetteMiss(f"No recorded response for {request.method} {request.url.path} ({key[:12]})")
+            status, headers, body, latency = stored
+            if self.latency_scale > 0:
+                time.sleep(latency * self.latency_scale)
+            metrics.inc("cassette_hits_total")
+            return httpx.Response(status, headers=headers, content=body, request=request)
+
+        started = time.perf_counter()
+        response = self._transport.handle_request(request)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        latency = time.perf_counter() - started
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        # Only successful responses are worth replaying.
+        if response.status_code < 400:
+            self.cassette.put(key, response.status_code, headers, body, latency)
+            metrics.inc("cassette_recorded_total")
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    def close(self):
+        self._transport.close()
+
@@ -0,0 +1,47 @@
+"""
+Request deadlines.
+
+A Deadline is created when a request arrives (from the X-Deadline-Ms header or
+the default) and travels in the workflow state. Each node checks it before
+doing work, and the remaining time becomes the timeout of the LLM call, so a
+request never outlives its deadline by more than one in-progress step.
+"""
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time."""
+
+
+class Deadline:
+    """Absolute deadline on the monotonic clock."""
+    __slots__ = ("at",)
+
+    def __init__(self, at: float):
+        self.at = at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def check(self, stage: str = ""):
+        """Raise DeadlineExceeded once the deadline has passed."""
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline exceeded{' in ' + stage if stage else ''}")
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+def request_deadline(header_ms: Optional[float], default_seconds: float, max_seconds: float) -> Deadline:
+    """Deadline from a client budget in milliseconds, capped at max_seconds."""
+    seconds = header_ms / 1000.0 if header_ms is not None and header_ms > 0 else default_seconds
+    return Deadline.after(min(seconds, max_seconds))
@@ -0,0 +1,5 @@
+from .conflicts import Conflict, ConflictIndex
+from .parser import DSLSyntaxError, parse_rule, parse_rules
+from .validator import ValidationResult, extract_rule_text, validate_rule
+
+__all__ = ['Conflict', 'ConflictIndex', 'DSLSyntaxError', 'parse_rule', 'parse_rules', 'ValidationResult', 'extract_rule_text', 'validate_rule']
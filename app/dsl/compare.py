@@ -0,0 +1,99 @@
+"""
+Structural comparison of rules.
+
+normalize() rewrites a rule into a canonical syntax tree:
+  - the rule name is dropped;
+  - AND/OR operands are flattened, deduplicated and sorted, and IN lists are
+    sorted (their order does not change the result);
+  - comparisons against a literal put the field on the left (5 < x becomes
+    x > 5), and ==/!= between two fields order their operands;
+  - integral floats become ints (10000.0 is 10000).
+rule_similarity() scores 1.0 when two rules normalize to the same tree, else
+the F1 overlap of their canonical sub-trees, so a renamed rule still matches
+and a rule with one different threshold scores partially. An expected rule
+outside the grammar falls back to the F1 overlap of whitespace-separated
+tokens.
+"""
+from collections import Counter
+from typing import Optional
+
+from app.dsl.nodes import And, Compare, Field, In, ListValue, Literal, Node, Or, Rule
+from app.dsl.parser import DSLSyntaxError, parse_rule
+from app.dsl.validator import extract_rule_text, iter_nodes
+
+_FLIPPED = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "==": "==", "!=": "!="}
+
+
+def _canon(value):
+    if isinstance(value, tuple):
+        return tuple(_canon(v) for v in value)
+    if not isinstance(value, Node):
+        return value
+    if isinstance(value, Literal):
+        if value.kind == "number" and isinstance(value.value, float) and value.value.is_integer():
+            return Literal(int(value.value), "number")
+        return value
+    if isinstance(value, (And, Or)):
+        items = []
+        for item in (_canon(i) for i in value.items):
+            items.extend(item.items if type(item) is type(value) else (item,))
+        items = sorted(set(items), key=repr)
+        return items[0] if len(items) == 1 else type(value)(tuple(items))
+    if isinstance(value, Compare):
+        op, left, right = value.op, _canon(value.left), _canon(value.right)
+        if isinstance(left, Literal) and not isinstance(right, Literal):
+            op, left, right = _FLIPPED[op], right, left
+        elif op in ("==", "!=") and isinstance(left, Field) and isinstance(right, Field) and repr(right) < repr(left):
+            left, right = right, left
+        return Compare(op, left, right)
+    if isinstance(value, In) and isinstance(value.container, ListValue):
+        items = tuple(sorted(set(_canon(value.container.items)), key=repr))
+        return In(_canon(value.left), ListValue(items))
+    if isinstance(value, Rule):
+        return Rule("", _canon(value.clauses), _canon(value.otherwise))
+    return type(value)(*(_canon(getattr(value, f)) for f in value._fields))
+
+
+def normalize(rule: Rule) -> Rule:
+    """Canonical form of a rule (see module docstring)."""
+    return _canon(rule)
+
+
+def _features(rule: Rule) -> Counter:
+    return Counter(repr(node) for node in iter_nodes(rule) if not isinstance(node, Rule))
+
+
+def _tokens(text: str) -> Counter:
+    # Skip "RULE <name>" so a renamed rule is not penalized.
+    return Counter(extract_rule_text(text).split()[2:])
+
+
+def rule_similarity(generated: str, expected: str) -> float:
+    """Structural similarity in [0, 1]; 0.0 when the generated text does not parse against a parseable expected rule."""
+    try:
+        target = normalize(parse_rule(extract_rule_text(expected)))
+    except DSLSyntaxError:
+        return _f1(_tokens(generated or ""), _tokens(expected))
+    try:
+        actual = normalize(parse_rule(extract_rule_text(generated or "")))
+    except DSLSyntaxError:
+        return 0.0
+    if actual == target:
+        return 1.0
+    return _f1(_features(actual), _features(target))
+
+
+def _f1(a: Counter, b: Counter) -> float:
+    common = sum((a & b).values())
+    if not common:
+        return 0.0
+    precision, recall = common / sum(a.values()), common / sum(b.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def parses(text: Optional[str]) -> bool:
+    try:
+        parse_rule(extract_rule_text(text or ""))
+        return True
+    except DSLSyntaxError:
+        return False
@@ -0,0 +1,491 @@
+"""
+Static conflict detection across a rule library.
+
+Every clause of a rule is turned into the region of claims that fire it:
+the clause condition AND NOT every earlier clause (first match wins), and
+for ELSE the negation of all clauses. The region is kept in disjunctive
+normal form, and each conjunct is a set of per-field constraints:
+  - an interval from `field <op> literal` (numbers, or strings/ISO dates,
+    ordered the way the engine compares them);
+  - a set of allowed values from `==` / IN [...], and excluded values from `!=`.
+Other predicates (MATCHES, quantifiers, field-vs-field comparisons) are not
+interpreted and never rule an overlap out.
+
+Regions that can decide something (APPROVE/REJECT, SET) are indexed per
+field. Intervals and numeric equalities go in an interval tree, and
+equality/IN values go in a hash index. Checking a rule therefore only visits
+regions that overlap it on at least one field. Each candidate is then
+verified on every field the two constrain. A conflict is an overlap whose
+outcomes disagree: APPROVE against REJECT, or SET of the same target to
+different values. Regions that constrain no common field are independent
+and are not reported, and claims with a compared field missing are not
+modelled.
+"""
+from itertools import product
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from app.dsl.nodes import (
+    And, Approve, Compare, Field, IfAction, In, ListValue, Literal, Or, Reject, Rule, SetAction,
+)
+from app.dsl.parser import parse_rule
+
+MAX_CONJUNCTS = 64
+_NEGATED = {"<": ">=", ">": "<=", "<=": ">", ">=": "<", "==": "!=", "!=": "=="}
+_FLIPPED = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "==": "==", "!=": "!="}
+_BOTTOM, _TOP = (-1,), (1,)  # tree keys below / above every (0, value) key
+
+
+def _kind(value: Any) -> Optional[str]:
+    """Ordering domain of a value: number, string (dates are ISO strings), or None if unordered."""
+    if value.__class__ in (int, float):
+        return "number"
+    if value.__class__ is str:
+        return "string"
+    return None
+
+
+class Constraint:
+    """What a conjunct requires of one field."""
+    __slots__ = ("kind", "lo", "lo_open", "hi", "hi_open", "values", "excluded")
+
+    def __init__(self):
+        self.kind: Optional[str] = None  # set once the field is ordered against a literal
+        self.lo, self.lo_open = None, False  # None: unbounded
+        self.hi, self.hi_open = None, False
+        self.values: Optional[FrozenSet] = None  # None: any value
+        self.excluded: FrozenSet = frozenset()
+
+    def copy(self) -> "Constraint":
+        other = Constraint.__new__(Constraint)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def apply(self, op: str, value: Any) -> bool:
+        """Narrow by `field <op> value`; False when the atom cannot be represented."""
+        if op == "==":
+            self.values = frozenset((value,)) if self.values is None else self.values & {value}
+        elif op == "!=":
+            self.excluded = self.excluded | {value}
+        else:
+            kind = _kind(value)
+            if kind is None or (value != value):
+                return False
+            if self.kind not in (None, kind):
+                self.kind = "empty"
+                return True
+            self.kind = kind
+            if op in (">", ">="):
+                if self.lo is None or value > self.lo or (value == self.lo and op == ">"):
+                    self.lo, self.lo_open = value, op == ">"
+            elif self.hi is None or value < self.hi or (value == self.hi and op == "<"):
+                self.hi, self.hi_open = value, op == "<"
+        return True
+
+    def allowed(self, value: Any) -> bool:
+        if value in self.excluded:
+            return False
+        if self.kind is None:
+            return True
+        if self.kind == "empty" or _kind(value) != self.kind:
+            return False
+        if self.lo is not None and (value < self.lo or (value == self.lo and self.lo_open)):
+            return False
+        return not (self.hi is not None and (value > self.hi or (value == self.hi and self.hi_open)))
+
+    def satisfiable(self) -> bool:
+        if self.kind == "empty":
+            return False
+        if self.values is not None:
+            return any(self.allowed(v) for v in self.values)
+        if self.lo is not None and self.hi is not None:
+            return self.lo < self.hi or (self.lo == self.hi and not (self.lo_open or self.hi_open)
+                                         and self.lo not in self.excluded)
+        return True
+
+    def merge(self, other: "Constraint") -> "Constraint":
+        merged = self.copy()
+        if other.kind is not None:
+            if merged.kind not in (None, other.kind):
+                merged.kind = "empty"
+                return merged
+            merged.kind = other.kind
+            if other.lo is not None:
+                merged.apply(">" if other.lo_open else ">=", other.lo)
+            if other.hi is not None:
+                merged.apply("<" if other.hi_open else "<=", other.hi)
+        if other.values is not None:
+            merged.values = other.values if merged.values is None else merged.values & other.values
+        merged.excluded = merged.excluded | other.excluded
+        return merged
+
+    def describe(self) -> str:
+        parts = []
+        if self.values is not None:
+            allowed = sorted((v for v in self.values if self.allowed(v)), key=repr)
+            parts.append(f"in {allowed!r}" if len(allowed) > 1 else f"== {allowed[0]!r}" if allowed else "empty")
+        else:
+            if self.lo is not None:
+                parts.append(f"{'>' if self.lo_open else '>='} {self.lo!r}")
+            if self.hi is not None:
+                parts.append(f"{'<' if self.hi_open else '<='} {self.hi!r}")
+            if self.excluded:
+                parts.append(f"not in {sorted(self.excluded, key=repr)!r}")
+        return " and ".join(parts) or "any"
+
+    def tree_range(self) -> Optional[Tuple[str, tuple, tuple]]:
+        """(kind, lo key, hi key) covering this constraint in an interval tree, or None."""
+        if self.kind in ("number", "string"):
+            lo = _BOTTOM if self.lo is None else (0, self.lo)
+            hi = _TOP if self.hi is None else (0, self.hi)
+            return self.kind, lo, hi
+        return None
+
+
+# ---- conditions to DNF ----
+def _atom(node, negate: bool) -> Optional[List[Tuple[str, str, Any]]]:
+    """(field, op, value) constraints for a simple predicate, or None if it is not interpreted."""
+    if isinstance(node, Compare):
+        op, left, right = node.op, node.left, node.right
+        if isinstance(left, Literal) and isinstance(right, Field):
+            op, left, right = _FLIPPED[op], right, left
+        if not (isinstance(left, Field) and isinstance(right, Literal)) or left.path == ("current_date",):
+            return None
+        return [(left.dotted, _NEGATED[op] if negate else op, right.value)]
+    if isinstance(node, In) and isinstance(node.left, Field) and isinstance(node.container, ListValue) \
+            and all(isinstance(i, Literal) for i in node.container.items):
+        values = frozenset(i.value for i in node.container.items)
+        if negate:
+            return [(node.left.dotted, "!=", v) for v in values]
+        return [(node.left.dotted, "in", values)]
+    return None
+
+
+def _dnf(node, negate: bool = False) -> Optional[List[List[Tuple[str, str, Any]]]]:
+    """Disjunction of conjunctions of atoms; [[]] means "no constraint"; None if too large."""
+    if isinstance(node, (And, Or)):
+        conjunctive = isinstance(node, And) != negate
+        parts = [_dnf(item, negate) for item in node.items]
+        if any(p is None for p in parts):
+            return None
+        if not conjunctive:
+            return [c for p in parts for c in p] if sum(len(p) for p in parts) <= MAX_CONJUNCTS else None
+        size = 1
+        for p in parts:
+            size *= len(p)
+        if size > MAX_CONJUNCTS:
+            return None
+        return [[a for c in combo for a in c] for combo in product(*parts)]
+    atoms = _atom(node, negate)
+    return [atoms] if atoms is not None else [[]]
+
+
+def _conjunction(atoms: Iterable[Tuple[str, str, Any]]) -> Optional[Dict[str, Constraint]]:
+    """Per-field constraints of a conjunction, or None when it can never hold."""
+    constraints: Dict[str, Constraint] = {}
+    for field, op, value in atoms:
+        constraint = constraints.get(field)
+        if constraint is None:
+            constraint = constraints[field] = Constraint()
+        if op == "in":
+            constraint.values = value if constraint.values is None else constraint.values & value
+        else:
+            constraint.apply(op, value)  # unordered literals (booleans, NaN) in <, > are left uninterpreted
+    if not all(c.satisfiable() for c in constraints.values()):
+        return None
+    return constraints
+
+
+def _outcomes(actions) -> Set[tuple]:
+    """Decisions an action list can produce (both IF branches count)."""
+    found = set()
+    for action in actions:
+        if isinstance(action, Approve):
+            found.add(("APPROVE",))
+        elif isinstance(action, Reject):
+            found.add(("REJECT",))
+        elif isinstance(action, SetAction):
+            found.add(("SET", action.target.dotted, action.value))
+        elif isinstance(action, IfAction):
+            found |= _outcomes(action.then) | _outcomes(action.otherwise)
+    return found
+
+
+def _conflicting(a: Set[tuple], b: Set[tuple]) -> List[str]:
+    reasons = []
+    if ("APPROVE",) in a and ("REJECT",) in b:
+        reasons.append("APPROVE vs REJECT")
+    if ("REJECT",) in a and ("APPROVE",) in b:
+        reasons.append("REJECT vs APPROVE")
+    sets_b = {}
+    for outcome in b:
+        if outcome[0] == "SET":
+            sets_b.setdefault(outcome[1], set()).add(outcome[2])
+    for outcome in a:
+        if outcome[0] == "SET" and any(v != outcome[2] for v in sets_b.get(outcome[1], ())):
+            reasons.append(f"SET {outcome[1]} to different values")
+    return reasons
+
+
+class Region:
+    """One conjunct of the claims that fire a clause (clause index len(clauses) for ELSE)."""
+    __slots__ = ("rule", "clause", "constraints", "outcomes")
+
+    def __init__(self, rule: Rule, clause: int, constraints: Dict[str, Constraint], outcomes: Set[tuple]):
+        self.rule = rule
+        self.clause = clause
+        self.constraints = constraints
+        self.outcomes = outcomes
+
+
+def rule_regions(rule: Rule) -> List[Region]:
+    """Regions of every clause (and ELSE) that can decide something."""
+    branches = [(c.condition, c.actions) for c in rule.clauses]
+    regions = []
+    for index in range(len(branches) + (1 if rule.otherwise else 0)):
+        actions = branches[index][1] if index < len(branches) else rule.otherwise
+        outcomes = _outcomes(actions)
+        if not outcomes:
+            continue
+        parts = [_dnf(branches[index][0])] if index < len(branches) else []
+        parts += [_dnf(condition, negate=True) for condition, _ in branches[:index]]
+        parts = [p for p in parts if p is not None]  # too large: leave uninterpreted
+        size = 1
+        for p in parts:
+            size *= len(p)
+        if size > MAX_CONJUNCTS:
+            parts = parts[:1]
+        for combo in product(*parts):
+            constraints = _conjunction(a for conjunct in combo for a in conjunct)
+            if constraints:
+                regions.append(Region(rule, index, constraints, outcomes))
+    return regions
+
+
+class _StaticIntervals:
+    """Intervals sorted by start as an implicit balanced tree, with the max end of every subtree."""
+    __slots__ = ("starts", "ends", "items", "maxes")
+
+    def __init__(self, entries: List[Tuple[tuple, tuple, Any]]):
+        entries.sort(key=lambda e: e[0])
+        self.starts = [e[0] for e in entries]
+        self.ends = [e[1] for e in entries]
+        self.items = [e[2] for e in entries]
+        self.maxes = list(self.ends)
+        # Children before parents: process subtrees by increasing size.
+        spans = []
+        stack = [(0, len(entries))]
+        while stack:
+            start, stop = stack.pop()
+            if start < stop:
+                mid = (start + stop) // 2
+                spans.append((start, mid, stop))
+                stack.append((start, mid))
+                stack.append((mid + 1, stop))
+        maxes = self.maxes
+        for start, mid, stop in reversed(spans):
+            if start < mid:
+                left = maxes[(start + mid) // 2]
+                if left > maxes[mid]:
+                    maxes[mid] = left
+            if mid + 1 < stop:
+                right = maxes[(mid + 1 + stop) // 2]
+                if right > maxes[mid]:
+                    maxes[mid] = right
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def entries(self) -> List[Tuple[tuple, tuple, Any]]:
+        return list(zip(self.starts, self.ends, self.items))
+
+    def overlapping(self, lo: tuple, hi: tuple, out: list):
+        starts, ends, maxes, items = self.starts, self.ends, self.maxes, self.items
+        stack = [(0, len(starts))]
+        while stack:
+            start, stop = stack.pop()
+            if start >= stop:
+                continue
+            mid = (start + stop) // 2
+            if maxes[mid] < lo:
+                continue  # every interval in this subtree ends before lo
+            stack.append((start, mid))
+            if starts[mid] <= hi:  # otherwise mid and its right subtree start after hi
+                if ends[mid] >= lo:
+                    out.append(items[mid])
+                stack.append((mid + 1, stop))
+
+
+class IntervalTree:
+    """
+    Closed intervals with a payload. Inserts go to a small buffer; full
+    buffers become static augmented trees that are merged in doubling sizes
+    (a logarithmic number of trees), so inserts stay cheap at any size.
+    """
+    BUFFER_SIZE = 64
+
+    def __init__(self):
+        self._levels: List[_StaticIntervals] = []
+        self._buffer: List[Tuple[tuple, tuple, Any]] = []
+
+    def __len__(self) -> int:
+        return sum(len(level) for level in self._levels) + len(self._buffer)
+
+    def add(self, lo: tuple, hi: tuple, item: Any):
+        self._buffer.append((lo, hi, item))
+        if len(self._buffer) >= self.BUFFER_SIZE:
+            entries, self._buffer = self._buffer, []
+            while self._levels and len(self._levels[-1]) <= len(entries):
+                entries = self._levels.pop().entries() + entries
+            self._levels.append(_StaticIntervals(entries))
+
+    def overlapping(self, lo: tuple, hi: tuple) -> List[Any]:
+        """Items whose interval intersects [lo, hi]."""
+        found: List[Any] = []
+        for level in self._levels:
+            level.overlapping(lo, hi, found)
+        found.extend(item for b_lo, b_hi, item in self._buffer if b_lo <= hi and b_hi >= lo)
+        return found
+
+
+class Conflict:
+    """Two rule clauses that can fire for the same claim with contradicting outcomes."""
+
+    def __init__(self, rule: str, clause: int, other_rule: str, other_clause: int,
+                 overlap: Dict[str, str], reasons: List[str]):
+        self.rule = rule
+        self.clause = clause
+        self.other_rule = other_rule
+        self.other_clause = other_clause
+        self.overlap = overlap
+        self.reasons = reasons
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rule": self.rule,
+            "clause": self.clause,
+            "other_rule": self.other_rule,
+            "other_clause": self.other_clause,
+            "overlap": self.overlap,
+            "reasons": self.reasons,
+        }
+
+    def __repr__(self):
+        return f"Conflict({self.rule}[{self.clause}] vs {self.other_rule}[{self.other_clause}]: {self.reasons})"
+
+
+class ConflictIndex:
+    """
+    Rule library indexed for conflict checks. check(rule) reports the
+    conflicts of a rule with the indexed ones without adding it; add(rule)
+    indexes it.
+    """
+
+    def __init__(self, rules: Iterable[Union[str, Rule]] = ()):
+        self.rules: List[Rule] = []
+        self.regions: List[Region] = []
+        self._trees: Dict[Tuple[str, str], IntervalTree] = {}
+        self._values: Dict[str, Dict[Any, List[int]]] = {}
+        self._loose: Dict[str, List[int]] = {}  # fields constrained only by !=
+        for rule in rules:
+            self.add(rule)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def add(self, rule: Union[str, Rule]):
+        rule = parse_rule(rule) if isinstance(rule, str) else rule
+        self.rules.append(rule)
+        for region in rule_regions(rule):
+            index = len(self.regions)
+            self.regions.append(region)
+            for field, constraint in region.constraints.items():
+                if constraint.values is not None:
+                    for value in constraint.values:
+                        if constraint.allowed(value):
+                            self._values.setdefault(field, {}).setdefault(value, []).append(index)
+                            kind = _kind(value)
+                            if kind is not None:
+                                self._tree(field, kind).add((0, value), (0, value), index)
+                elif constraint.tree_range() is not None:
+                    kind, lo, hi = constraint.tree_range()
+                    self._tree(field, kind).add(lo, hi, index)
+                else:
+                    self._loose.setdefault(field, []).append(index)
+
+    def _tree(self, field: str, kind: str) -> IntervalTree:
+        tree = self._trees.get((field, kind))
+        if tree is None:
+            tree = self._trees[(field, kind)] = IntervalTree()
+        return tree
+
+    def _candidates(self, region: Region) -> Set[int]:
+        found: Set[int] = set()
+        for field, constraint in region.constraints.items():
+            found.update(self._loose.get(field, ()))
+            values = self._values.get(field, {})
+            if constraint.values is not None:
+                for value in constraint.values:
+                    if not constraint.allowed(value):
+                        continue
+                    found.update(values.get(value, ()))
+                    kind = _kind(value)
+                    if kind is not None and (field, kind) in self._trees:
+                        found.update(self._trees[(field, kind)].overlapping((0, value), (0, value)))
+            elif constraint.tree_range() is not None:
+                kind, lo, hi = constraint.tree_range()
+                if (field, kind) in self._trees:
+                    found.update(self._trees[(field, kind)].overlapping(lo, hi))
+            else:
+                for hits in values.values():
+                    found.update(hits)
+                for (tree_field, _), tree in self._trees.items():
+                    if tree_field == field:
+                        found.update(tree.overlapping(_BOTTOM, _TOP))
+        return found
+
+    def check(self, rule: Union[str, Rule]) -> List[Conflict]:
+        """Conflicts between a rule and the indexed library."""
+        rule = parse_rule(rule) if isinstance(rule, str) else rule
+        conflicts = []
+        seen = set()
+        for region in rule_regions(rule):
+            for index in sorted(self._candidates(region)):
+                other = self.regions[index]
+                if other.rule == rule:
+                    continue
+                key = (region.clause, index)
+                if key in seen:
+                    continue
+                seen.add(key)
+                reasons = _conflicting(region.outcomes, other.outcomes)
+                if not reasons:
+                    continue
+                overlap = self._overlap(region, other)
+                if overlap is not None:
+                    conflicts.append(Conflict(rule.name, region.clause, other.rule.name, other.clause,
+                                              overlap, reasons))
+        return conflicts
+
+    @staticmethod
+    def _overlap(a: Region, b: Region) -> Optional[Dict[str, str]]:
+        """Merged constraints on the fields both regions constrain, or None if they are disjoint."""
+        shared = a.constraints.keys() & b.constraints.keys()
+        if not shared:
+            return None
+        overlap = {}
+        for field in sorted(shared):
+            merged = a.constraints[field].merge(b.constraints[field])
+            if not merged.satisfiable():
+                return None
+            overlap[field] = merged.describe()
+        return overlap
+
+    def find_all(self) -> List[Conflict]:
+        """Every conflict in the library, each pair reported once (later rule against earlier ones)."""
+        library = ConflictIndex()
+        conflicts = []
+        for rule in self.rules:
+            conflicts.extend(library.check(rule))
+            library.add(rule)
+        return conflicts
@@ -0,0 +1,180 @@
+from typing import Any, Tuple
+
+
+class Node:
+    """
+    Base class for MedicalClaimsDSL syntax tree nodes.
+    Nodes are immutable value objects: two nodes are equal (and hash equal)
+    when they have the same type and the same field values, which lets rules
+    be compared structurally and predicates be used as dictionary keys.
+    """
+    __slots__ = ("_hash",)
+    _fields: Tuple[str, ...] = ()
+
+    def __init__(self, *args):
+        for name, value in zip(self._fields, args):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _key(self):
+        return (type(self).__name__,) + tuple(getattr(self, f) for f in self._fields)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        return isinstance(other, Node) and hash(self) == hash(other) and self._key() == other._key()
+
+    def __hash__(self):
+        # Computed once: rule sets use nodes as keys heavily (predicate sharing, mask caches).
+        try:
+            return self._hash
+        except AttributeError:
+            value = hash(self._key())
+            object.__setattr__(self, "_hash", value)
+            return value
+
+    def __reduce__(self):
+        return (type(self), tuple(getattr(self, f) for f in self._fields))
+
+    def __repr__(self):
+        args = ", ".join(repr(getattr(self, f)) for f in self._fields)
+        return f"{type(self).__name__}({args})"
+
+    def to_dict(self) -> Any:
+        """Return a JSON-serializable representation of the node."""
+        data = {"type": type(self).__name__}
+        for f in self._fields:
+            data[f] = _to_data(getattr(self, f))
+        return data
+
+
+def _to_data(value):
+    if isinstance(value, Node):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_to_data(v) for v in value]
+    return value
+
+
+# ---- Expressions ----
+class Field(Node):
+    """Dotted field path, e.g. claim.amount -> ('claim', 'amount')."""
+    __slots__ = ("path",)
+    _fields = ("path",)
+
+    @property
+    def dotted(self) -> str:
+        return ".".join(self.path)
+
+
+class Literal(Node):
+    """String, number, boolean or date literal. kind is one of string/number/boolean/date."""
+    __slots__ = ("value", "kind")
+    _fields = ("value", "kind")
+
+
+class Duration(Node):
+    """Duration literal such as `365 days` (extension used by the example corpus)."""
+    __slots__ = ("amount", "unit")
+    _fields = ("amount", "unit")
+
+
+class ListValue(Node):
+    __slots__ = ("items",)
+    _fields = ("items",)
+
+
+class BinOp(Node):
+    """Arithmetic expression (extension used by the example corpus)."""
+    __slots__ = ("op", "left", "right")
+    _fields = ("op", "left", "right")
+
+
+# ---- Conditions ----
+class Compare(Node):
+    __slots__ = ("op", "left", "right")
+    _fields = ("op", "left", "right")
+
+
+class In(Node):
+    """`left IN [..]` or `left IN some.collection`."""
+    __slots__ = ("left", "container")
+    _fields = ("left", "container")
+
+
+class Matches(Node):
+    __slots__ = ("left", "pattern")
+    _fields = ("left", "pattern")
+
+
+class And(Node):
+    __slots__ = ("items",)
+    _fields = ("items",)
+
+
+class Or(Node):
+    __slots__ = ("items",)
+    _fields = ("items",)
+
+
+class Exists(Node):
+    __slots__ = ("entity", "condition")
+    _fields = ("entity", "condition")
+
+
+class ForEach(Node):
+    __slots__ = ("item", "collection", "condition")
+    _fields = ("item", "collection", "condition")
+
+
+# ---- Actions ----
+class Approve(Node):
+    __slots__ = ()
+    _fields = ()
+
+
+class Reject(Node):
+    __slots__ = ("message",)
+    _fields = ("message",)
+
+
+class SetAction(Node):
+    __slots__ = ("target", "value")
+    _fields = ("target", "value")
+
+
+class Flag(Node):
+    __slots__ = ("message",)
+    _fields = ("message",)
+
+
+class Continue(Node):
+    __slots__ = ()
+    _fields = ()
+
+
+class IfAction(Node):
+    __slots__ = ("condition", "then", "otherwise")
+    _fields = ("condition", "then", "otherwise")
+
+
+# ---- Rule ----
+class Clause(Node):
+    """A single WHEN condition THEN actions pair."""
+    __slots__ = ("condition", "actions")
+    _fields = ("condition", "actions")
+
+
+class Rule(Node):
+    """
+    A parsed rule. clauses are evaluated in order and the first matching
+    clause fires; otherwise holds the ELSE actions (empty tuple if absent).
+    """
+    __slots__ = ("name", "clauses", "otherwise")
+    _fields = ("name", "clauses", "otherwise")
+
+
+CONDITION_TYPES = (Compare, In, Matches, And, Or, Exists, ForEach)
+ACTION_TYPES = (Approve, Reject, SetAction, Flag, Continue, IfAction)
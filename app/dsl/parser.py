@@ -0,0 +1,311 @@
+"""
+Hand-written recursive descent parser for MedicalClaimsDSL (grammars/grammar_1.0.g4).
+
+The parser follows the .g4 grammar and additionally accepts the constructs the
+example corpus already relies on:
+  - arithmetic in values: `claim.amount * 0.2`, `(a + b) > c`
+  - duration literals: `claim.service_date + 365 days`
+  - several `WHEN ... THEN ...` clauses before the optional ELSE
+  - `IN` / `MATCHES` against a field path instead of a literal
+
+AND binds tighter than OR. EXISTS ... WHERE and FOR EACH consume the rest of
+the condition they start.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from app.dsl.nodes import (
+    And, Approve, BinOp, Clause, Compare, Continue, Duration, Exists, Field, Flag,
+    ForEach, IfAction, In, ListValue, Literal, Matches, Or, Reject, Rule, SetAction,
+)
+
+KEYWORDS = {
+    "RULE", "WHEN", "THEN", "ELSE", "END", "IF", "FOR", "EACH", "IN", "WHERE",
+    "EXISTS", "APPROVE", "REJECT", "SET", "FLAG", "CONTINUE", "AND", "OR", "MATCHES",
+}
+COMPARISON_OPS = {"==", "!=", ">", "<", ">=", "<="}
+DURATION_UNITS = {"day": "days", "days": "days"}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<WS>\s+)
+  | (?P<COMMENT>//[^\r\n]*|/\*.*?\*/)
+  | (?P<STRING>"(?:[^"\\\r\n]|\\.)*")
+  | (?P<DATE>\d{4}-\d{2}-\d{2}(?![\w.]))
+  | (?P<NUMBER>\d+(?:\.\d+)?)
+  | (?P<IDENT>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<OP>==|!=|>=|<=|>|<|=|\+|-|\*|/)
+  | (?P<PUNCT>[()\[\].,])
+""", re.VERBOSE | re.DOTALL)
+
+
+class DSLSyntaxError(ValueError):
+    """Raised when rule text does not conform to the DSL grammar."""
+    def __init__(self, message: str, position: int = -1):
+        super().__init__(message if position < 0 else f"{message} (at offset {position})")
+        self.position = position
+
+
+class Token:
+    __slots__ = ("kind", "value", "pos")
+
+    def __init__(self, kind: str, value: str, pos: int):
+        self.kind = kind
+        self.value = value
+        self.pos = pos
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r})"
+
+
+def tokenize(text: str) -> List[Token]:
+    """Split rule text into tokens. Keywords get their own kind (e.g. 'WHEN')."""
+    tokens = []
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise DSLSyntaxError(f"Unexpected character {text[pos]!r}", pos)
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "IDENT":
+            if value in KEYWORDS:
+                kind = value
+            elif value in ("true", "false"):
+                kind = "BOOLEAN"
+        if kind not in ("WS", "COMMENT"):
+            tokens.append(Token(kind, value, pos))
+        pos = match.end()
+    tokens.append(Token("EOF", "", length))
+    return tokens
+
+
+class Parser:
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.index = 0
+
+    # ---- token helpers ----
+    @property
+    def current(self) -> Token:
+        return self.tokens[self.index]
+
+    def _peek(self, offset: int = 1) -> Token:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def _at(self, kind: str, value: Optional[str] = None) -> bool:
+        tok = self.current
+        return tok.kind == kind and (value is None or tok.value == value)
+
+    def _accept(self, kind: str, value: Optional[str] = None) -> Optional[Token]:
+        if self._at(kind, value):
+            tok = self.current
+            self.index += 1
+            return tok
+        return None
+
+    def _expect(self, kind: str, value: Optional[str] = None) -> Token:
+        tok = self._accept(kind, value)
+        if tok is None:
+            expected = value or kind
+            found = self.current.value or self.current.kind
+            raise DSLSyntaxError(f"Expected {expected}, found {found!r}", self.current.pos)
+        return tok
+
+    # ---- rule ----
+    def parse_rule(self) -> Rule:
+        self._expect("RULE")
+        name = self._expect("IDENT").value
+        clauses = []
+        while self._accept("WHEN"):
+            condition = self.parse_condition()
+            self._expect("THEN")
+            clauses.append(Clause(condition, self.parse_actions()))
+        if not clauses:
+            raise DSLSyntaxError("Rule must contain a WHEN clause", self.current.pos)
+        otherwise: Tuple = ()
+        if self._accept("ELSE"):
+            otherwise = self.parse_actions()
+        self._expect("END")
+        return Rule(name, tuple(clauses), otherwise)
+
+    # ---- actions ----
+    def parse_actions(self) -> tuple:
+        actions = [self.parse_action()]
+        while self._accept("AND"):
+            actions.append(self.parse_action())
+        return tuple(actions)
+
+    def parse_action(self):
+        tok = self.current
+        if self._accept("APPROVE"):
+            return Approve()
+        if self._accept("CONTINUE"):
+            return Continue()
+        if self._accept("REJECT"):
+            return Reject(self._parse_string())
+        if self._accept("FLAG"):
+            return Flag(self._parse_string())
+        if self._accept("SET"):
+            target = self.parse_field_path()
+            self._expect("OP", "=")
+            return SetAction(target, self.parse_expression())
+        if self._accept("IF"):
+            condition = self.parse_condition()
+            self._expect("THEN")
+            then = self.parse_actions()
+            otherwise: Tuple = ()
+            if self._accept("ELSE"):
+                otherwise = self.parse_actions()
+            self._expect("END")
+            return IfAction(condition, then, otherwise)
+        raise DSLSyntaxError(f"Expected action, found {tok.value or tok.kind!r}", tok.pos)
+
+    def _parse_string(self) -> str:
+        return _unquote(self._expect("STRING").value)
+
+    # ---- conditions ----
+    def parse_condition(self):
+        items = [self._parse_and()]
+        while self._accept("OR"):
+            items.append(self._parse_and())
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def _parse_and(self):
+        items = [self._parse_primary_condition()]
+        while self._accept("AND"):
+            items.append(self._parse_primary_condition())
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def _parse_primary_condition(self):
+        if self._accept("EXISTS"):
+            entity = self._expect("IDENT").value
+            self._expect("WHERE")
+            return Exists(entity, self.parse_condition())
+        if self._accept("FOR"):
+            self._expect("EACH")
+            item = self._expect("IDENT").value
+            self._expect("IN")
+            collection = self.parse_field_path()
+            return ForEach(item, collection, self.parse_condition())
+        if self._at("PUNCT", "("):
+            # Either a grouped condition or a parenthesised arithmetic operand.
+            start = self.index
+            self.index += 1
+            try:
+                condition = self.parse_condition()
+                self._expect("PUNCT", ")")
+                if not self._at_condition_operator():
+                    return condition
+            except DSLSyntaxError:
+                pass
+            self.index = start
+        return self._parse_simple_condition()
+
+    def _at_condition_operator(self) -> bool:
+        tok = self.current
+        return (tok.kind == "OP" and tok.value in COMPARISON_OPS) or tok.kind in ("IN", "MATCHES")
+
+    def _parse_simple_condition(self):
+        left = self.parse_expression()
+        tok = self.current
+        if tok.kind == "OP" and tok.value in COMPARISON_OPS:
+            self.index += 1
+            return Compare(tok.value, left, self.parse_expression())
+        if self._accept("IN"):
+            if self._at("PUNCT", "["):
+                return In(left, self._parse_list())
+            return In(left, self.parse_field_path())
+        if self._accept("MATCHES"):
+            if self._at("STRING"):
+                return Matches(left, Literal(self._parse_string(), "string"))
+            return Matches(left, self.parse_field_path())
+        raise DSLSyntaxError(f"Expected comparison operator, found {tok.value or tok.kind!r}", tok.pos)
+
+    # ---- values ----
+    def parse_field_path(self) -> Field:
+        parts = [self._expect("IDENT").value]
+        while self._at("PUNCT", ".") and self._peek().kind == "IDENT":
+            self.index += 1
+            parts.append(self._expect("IDENT").value)
+        return Field(tuple(parts))
+
+    def _parse_list(self) -> ListValue:
+        self._expect("PUNCT", "[")
+        items = []
+        if not self._at("PUNCT", "]"):
+            items.append(self.parse_expression())
+            while self._accept("PUNCT", ","):
+                items.append(self.parse_expression())
+        self._expect("PUNCT", "]")
+        return ListValue(tuple(items))
+
+    def parse_expression(self):
+        left = self._parse_term()
+        while self.current.kind == "OP" and self.current.value in ("+", "-"):
+            op = self.current.value
+            self.index += 1
+            left = BinOp(op, left, self._parse_term())
+        return left
+
+    def _parse_term(self):
+        left = self._parse_factor()
+        while self.current.kind == "OP" and self.current.value in ("*", "/"):
+            op = self.current.value
+            self.index += 1
+            left = BinOp(op, left, self._parse_factor())
+        return left
+
+    def _parse_factor(self):
+        tok = self.current
+        if self._accept("STRING"):
+            return Literal(_unquote(tok.value), "string")
+        if self._accept("DATE"):
+            return Literal(tok.value, "date")
+        if self._accept("BOOLEAN"):
+            return Literal(tok.value == "true", "boolean")
+        if tok.kind == "OP" and tok.value == "-" and self._peek().kind == "NUMBER":
+            self.index += 1
+            literal = self._parse_factor()
+            if isinstance(literal, Duration):
+                return Duration(-literal.amount, literal.unit)
+            return Literal(-literal.value, "number")
+        if self._accept("NUMBER"):
+            number = float(tok.value) if "." in tok.value else int(tok.value)
+            if self._at("IDENT") and self.current.value in DURATION_UNITS:
+                unit = DURATION_UNITS[self.current.value]
+                self.index += 1
+                return Duration(number, unit)
+            return Literal(number, "number")
+        if self._at("PUNCT", "["):
+            return self._parse_list()
+        if self._accept("PUNCT", "("):
+            expr = self.parse_expression()
+            self._expect("PUNCT", ")")
+            return expr
+        if tok.kind == "IDENT":
+            return self.parse_field_path()
+        raise DSLSyntaxError(f"Expected value, found {tok.value or tok.kind!r}", tok.pos)
+
+
+def _unquote(literal: str) -> str:
+    # Only escaped quotes are unescaped so MATCHES patterns keep their backslashes.
+    return literal[1:-1].replace('\\"', '"')
+
+
+def parse_rule(text: str) -> Rule:
+    """Parse a single `RULE ... END` block. Raises DSLSyntaxError on invalid input."""
+    parser = Parser(text)
+    rule = parser.parse_rule()
+    if not parser._at("EOF"):
+        raise DSLSyntaxError("Unexpected trailing input after END", parser.current.pos)
+    return rule
+
+
+def parse_rules(text: str) -> List[Rule]:
+    """Parse one or more consecutive rules from text."""
+    parser = Parser(text)
+    rules = []
+    while not parser._at("EOF"):
+        rules.append(parser.parse_rule())
+    return rules
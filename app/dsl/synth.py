@@ -0,0 +1,599 @@
+"""
+Synthetic rule and claim corpora for benchmarks.
+
+RuleGenerator walks the parser productions of grammars/grammar_<version>.g4:
+at each alternative, repetition and optional part it makes a random choice.
+Once a rule reaches max_depth levels of nesting (parenthesised or AND/OR
+conditions, EXISTS, FOR EACH, IF) or has used its budget of simple
+conditions, it takes the shallowest alternatives. Productions that need
+meaning rather than syntax are generated from a field schema instead of the
+grammar, so the rules can be evaluated against the generated claims:
+  - simple conditions (a field compared with a value of its type, IN, MATCHES);
+  - EXISTS / FOR EACH over the schema's collections;
+  - SET assignments, rule names and messages.
+
+near_valid() applies one small corruption (a dropped END, a misspelled
+keyword, `=` for `==`, ...) to a valid rule and keeps it only if it no longer
+parses; these exercise error paths and repair.
+
+ClaimGenerator draws records with the same fields from configurable
+distributions. Output is streamed to disk; every item is seeded from
+(seed, index), so a corpus is reproducible and can be generated in shards
+(--start) or by several processes (--workers) with the same result.
+
+    python -m app.dsl.synth rules rules.jsonl --count 1000000 --max-depth 4 --max-conditions 8 --near-valid 0.1
+    python -m app.dsl.synth claims claims.jsonl --count 1000000 --spec fields.yaml --workers 4
+"""
+import argparse
+import datetime
+import json
+import math
+import multiprocessing
+import random
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from app.dsl.parser import DSLSyntaxError, parse_rule
+
+# Field schema: dotted path -> distribution. Item fields (line_item.*,
+# diagnosis.*) belong to the collections in COLLECTIONS.
+DEFAULT_FIELDS: Dict[str, Dict[str, Any]] = {
+    "claim.amount": {"type": "number", "dist": "lognormal", "mu": 6.5, "sigma": 1.2},
+    "claim.units": {"type": "number", "dist": "int", "low": 1, "high": 20},
+    "claim.type": {"type": "string", "choices": ["inpatient", "outpatient", "emergency", "pharmacy"],
+                   "weights": [2, 5, 1, 2]},
+    "claim.service_date": {"type": "date", "start": "2023-01-01", "days": 730},
+    "claim.is_emergency": {"type": "bool", "p": 0.1},
+    "patient.age": {"type": "number", "dist": "int", "low": 0, "high": 100},
+    "patient.plan_type": {"type": "string", "choices": ["ppo", "hmo", "epo", "pos"]},
+    "patient.has_active_coverage": {"type": "bool", "p": 0.95},
+    "provider.network_status": {"type": "string", "choices": ["in_network", "out_network"], "weights": [4, 1]},
+    "provider.specialty": {"type": "string", "choices": ["cardiology", "oncology", "radiology", "family_medicine"]},
+    "provider.npi": {"type": "string", "dist": "digits", "length": 10, "pattern": "^[0-9]{10}$"},
+    "procedure.code": {"type": "string", "choices": ["99213", "99214", "70450", "93000", "36415"]},
+    "line_item.amount": {"type": "number", "dist": "lognormal", "mu": 4.5, "sigma": 1.0},
+    "line_item.units": {"type": "number", "dist": "int", "low": 1, "high": 10},
+    "line_item.code": {"type": "string", "choices": ["J1100", "J3420", "A4216", "G0008"]},
+    "diagnosis.code": {"type": "string", "choices": ["E11.9", "I10", "J45.909", "M54.5", "Z00.00"]},
+    "diagnosis.is_primary": {"type": "bool", "p": 0.3},
+}
+# Item name -> collection path and size range.
+COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    "line_item": {"path": "claim.line_items", "low": 1, "high": 5},
+    "diagnosis": {"path": "claim.diagnoses", "low": 1, "high": 4},
+}
+# Fields SET actions assign.
+OUTPUT_FIELDS = ("claim.copay_percentage", "claim.allowed_amount", "claim.review_priority")
+MESSAGES = ("Amount exceeds limit", "Provider not in network", "Requires prior authorization",
+            "Duplicate service", "Coverage inactive", "Manual review required")
+
+_TOKEN_RE = re.compile(r"'(?:[^'\\]|\\.)*'|[A-Za-z_][A-Za-z0-9_]*|[()|?*+]")
+# Productions that add a level of nesting.
+NESTING = frozenset({"compoundCondition", "existsCondition", "forEachCondition", "ifAction"})
+_NEAR_VALID_SALT = 0x5DEECE66D
+_FORMAT = {("rule", "END"): "\nEND", ("whenClause", "WHEN"): "\nWHEN", ("thenClause", "THEN"): "\nTHEN",
+           ("elseClause", "ELSE"): "\nELSE"}
+
+
+class FieldSpec:
+    """A field's type and the distribution its values are drawn from."""
+    __slots__ = ("path", "type", "config", "_start")
+
+    def __init__(self, path: str, config: Dict[str, Any]):
+        self.path = path
+        self.type = config["type"]
+        self.config = config
+        self._start = datetime.date.fromisoformat(config["start"]) if self.type == "date" else None
+
+    def sample(self, rng: random.Random) -> Any:
+        c = self.config
+        if self.type == "bool":
+            return rng.random() < c.get("p", 0.5)
+        if self.type == "date":
+            return (self._start + datetime.timedelta(days=rng.randrange(c.get("days", 365)))).isoformat()
+        if "choices" in c:
+            return rng.choices(c["choices"], c.get("weights"))[0]
+        dist = c.get("dist")
+        if dist == "int":
+            return rng.randint(c.get("low", 0), c.get("high", 100))
+        if dist == "lognormal":
+            return round(rng.lognormvariate(c.get("mu", 0.0), c.get("sigma", 1.0)), 2)
+        if dist == "normal":
+            return round(rng.gauss(c.get("mean", 0.0), c.get("std", 1.0)), 2)
+        if dist == "uniform":
+            return round(rng.uniform(c.get("low", 0.0), c.get("high", 1.0)), 2)
+        if dist == "digits":
+            return "".join(rng.choices("0123456789", k=c.get("length", 10)))
+        raise ValueError(f"Unknown distribution for {self.path}: {dist}")
+
+    def literal(self, rng: random.Random) -> str:
+        """DSL literal of a sampled value."""
+        value = self.sample(rng)
+        if self.type == "bool":
+            return "true" if value else "false"
+        if self.type in ("number", "date"):
+            return str(value)
+        return json.dumps(value)
+
+
+def load_fields(spec_path: Optional[str] = None) -> Dict[str, FieldSpec]:
+    """DEFAULT_FIELDS, overridden/extended by a YAML or JSON spec of the same shape."""
+    config = dict(DEFAULT_FIELDS)
+    if spec_path:
+        with open(spec_path, "r", encoding="utf-8") as f:
+            config.update(yaml.safe_load(f) or {})
+    return {path: FieldSpec(path, c) for path, c in config.items()}
+
+
+# ---- Grammar model ----
+# A body is ("alt", [sequence, ...]); a sequence is [(atom, suffix), ...]; an
+# atom is ("ref", name), ("lit", text) or a nested ("alt", ...).
+
+def _parse_body(body: str):
+    tokens = _TOKEN_RE.findall(body)
+    pos = 0
+
+    def alt():
+        nonlocal pos
+        sequences = [seq()]
+        while pos < len(tokens) and tokens[pos] == "|":
+            pos += 1
+            sequences.append(seq())
+        return ("alt", sequences)
+
+    def seq():
+        nonlocal pos
+        items = []
+        while pos < len(tokens) and tokens[pos] not in ("|", ")"):
+            token = tokens[pos]
+            pos += 1
+            if token == "(":
+                atom = alt()
+                pos += 1  # ")"
+            elif token.startswith("'"):
+                atom = ("lit", token[1:-1])
+            else:
+                atom = ("ref", token)
+            suffix = ""
+            if pos < len(tokens) and tokens[pos] in ("?", "*", "+"):
+                suffix = tokens[pos]
+                pos += 1
+            items.append((atom, suffix))
+        return items
+
+    return alt()
+
+
+class Grammar:
+    """Parser productions of a .g4 grammar plus the literal text of its keyword tokens."""
+
+    def __init__(self, grammar_text: str):
+        from app.utils.grammar_index import GrammarIndex
+        index = GrammarIndex(grammar_text)
+        self.productions = {}
+        self.literals = {}
+        for name, rule in index.rules.items():
+            body = rule.text.split(":", 1)[1].rsplit(";", 1)[0]
+            if rule.is_lexer:
+                literal = re.fullmatch(r"\s*'([^']*)'\s*", body)
+                if literal:
+                    self.literals[name] = literal.group(1)
+            else:
+                self.productions[name] = _parse_body(body)
+        self.min_depth = self._min_depths()
+        # Costs of every sequence and atom, keyed by id(), so the walk does not recompute them.
+        self.cost: Dict[int, float] = {}
+        for body in self.productions.values():
+            self._index_costs(body)
+
+    @classmethod
+    def load(cls, version: str = "1.0") -> "Grammar":
+        from app.utils.grammar_loader import GrammarLoader
+        text = GrammarLoader().get_grammar(version)
+        if not text:
+            raise FileNotFoundError(f"No grammar for version {version}")
+        return cls(text)
+
+    def _atom_depth(self, atom, depths) -> float:
+        if atom[0] == "alt":
+            return min(self._seq_depth(s, depths) for s in atom[1])
+        if atom[0] == "lit" or atom[1] not in self.productions:
+            return 0
+        return depths[atom[1]]
+
+    def _seq_depth(self, sequence, depths) -> float:
+        return max((self._atom_depth(a, depths) for a, suffix in sequence if suffix not in ("?", "*")), default=0)
+
+    def _index_costs(self, body):
+        for sequence in body[1]:
+            self.cost[id(sequence)] = self._seq_depth(sequence, self.min_depth)
+            for atom, suffix in sequence:
+                self.cost[id(atom)] = self._atom_depth(atom, self.min_depth)
+                if atom[0] == "alt":
+                    self._index_costs(atom)
+
+    def _min_depths(self) -> Dict[str, float]:
+        """Fewest NESTING levels needed to finish each production (fixpoint)."""
+        depths = {name: math.inf for name in self.productions}
+        changed = True
+        while changed:
+            changed = False
+            for name, body in self.productions.items():
+                depth = (name in NESTING) + min(self._seq_depth(s, depths) for s in body[1])
+                if depth < depths[name]:
+                    depths[name] = depth
+                    changed = True
+        return depths
+
+
+# ---- Rules ----
+
+def _grows(sequence) -> bool:
+    """Whether a sequence adds conditions: it is or contains `condition (AND | OR) condition`."""
+    refs = [atom[1] for atom, suffix in sequence if atom[0] == "ref" and not suffix]
+    return "compoundCondition" in refs or refs.count("condition") > 1
+
+
+class _Walk:
+    """State of one rule's generation."""
+    __slots__ = ("rng", "out", "budget", "scope", "conditions", "depth")
+
+    def __init__(self, rng: random.Random, budget: int):
+        self.rng = rng
+        self.out: List[str] = []
+        self.budget = budget
+        self.scope: Tuple[str, ...] = ()
+        self.conditions = 0
+        self.depth = 0
+
+
+class RuleGenerator:
+    """Grammar walk with schema-typed leaves (see module docstring)."""
+
+    def __init__(self, grammar: Optional[Grammar] = None, fields: Optional[Dict[str, FieldSpec]] = None,
+                 max_depth: int = 3, max_conditions: int = 8, repeat: float = 0.35, seed: int = 0):
+        self.grammar = grammar or Grammar.load()
+        self.fields = fields or load_fields()
+        self.max_depth = max_depth
+        self.max_conditions = max_conditions
+        self.repeat = repeat
+        self.seed = seed
+        self._by_scope: Dict[Tuple[str, ...], List[FieldSpec]] = {}
+        self._hooks: Dict[str, Callable[[_Walk, int], None]] = {
+            "ruleName": self._rule_name,
+            "simpleCondition": self._simple_condition,
+            "existsCondition": self._scoped_condition,
+            "forEachCondition": self._scoped_condition,
+            "assignment": self._assignment,
+            "stringValue": self._message,
+            "fieldPath": self._field_path,
+        }
+
+    def _rng(self, index: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def generate(self, index: int = 0) -> Tuple[str, int, int]:
+        """The index-th rule of the corpus, with its number of simple conditions and nesting depth."""
+        rng = self._rng(index)
+        walk = _Walk(rng, rng.randint(1, self.max_conditions))
+        walk.out.append(f"#{index}")  # consumed by _rule_name
+        self._production(walk, "rule", 0)
+        return " ".join(walk.out[1:]).replace(" \n", "\n"), walk.conditions, walk.depth
+
+    def rule(self, index: int = 0) -> str:
+        return self.generate(index)[0]
+
+    # -- grammar walk --
+
+    def _production(self, walk: _Walk, name: str, depth: int):
+        walk.depth = max(walk.depth, depth)
+        hook = self._hooks.get(name)
+        if hook is not None:
+            hook(walk, depth)
+            return
+        self._alt(walk, self.grammar.productions[name], name, depth)
+
+    def _alt(self, walk: _Walk, body, name: str, depth: int):
+        sequences = body[1]
+        if len(sequences) > 1:
+            costs = [self.grammar.cost[id(s)] for s in sequences]
+            if walk.budget <= 0:
+                sequences = [s for s, c in zip(sequences, costs) if c == min(costs)]
+            else:
+                allowed = [(s, c) for s, c in zip(sequences, costs) if depth + c <= self.max_depth]
+                sequences = [s for s, c in allowed] or sequences
+                if walk.budget > 1 and len(sequences) > 1:
+                    # Favour AND/OR conditions while the rule is under its condition budget.
+                    weights = [walk.budget - 1 if _grows(s) else 1 for s in sequences]
+                    sequences = [walk.rng.choices(sequences, weights)[0]]
+        self._seq(walk, walk.rng.choice(sequences), name, depth)
+
+    def _seq(self, walk: _Walk, sequence, name: str, depth: int):
+        for atom, suffix in sequence:
+            limited = walk.budget <= 0 or depth + self.grammar.cost[id(atom)] > self.max_depth
+            if suffix == "?":
+                count = 0 if limited else walk.rng.random() < 0.5
+            elif suffix in ("*", "+"):
+                count = 1 if suffix == "+" else 0
+                while not limited and count < 8 and walk.rng.random() < self.repeat:
+                    count += 1
+            else:
+                count = 1
+            for _ in range(count):
+                self._atom(walk, atom, name, depth)
+
+    def _atom(self, walk: _Walk, atom, name: str, depth: int):
+        kind, value = atom
+        if kind == "alt":
+            self._alt(walk, atom, name, depth)
+        elif kind == "lit":
+            walk.out.append(value)
+        elif value in self.grammar.productions:
+            self._production(walk, value, depth + (value in NESTING))
+        else:
+            token = self.grammar.literals.get(value)
+            if token is None:
+                raise ValueError(f"No generator for token {value}")
+            walk.out.append(_FORMAT.get((name, value), token))
+
+    # -- typed leaves --
+
+    def _scope_fields(self, scope: Tuple[str, ...]) -> List[FieldSpec]:
+        fields = self._by_scope.get(scope)
+        if fields is None:
+            allowed = set(scope)
+            fields = [f for f in self.fields.values()
+                      if f.path.split(".", 1)[0] not in COLLECTIONS or f.path.split(".", 1)[0] in allowed]
+            self._by_scope[scope] = fields
+        return fields
+
+    def _rule_name(self, walk: _Walk, depth: int):
+        walk.out.append(f"synthetic_rule_{walk.out[0][1:]}")
+
+    def _simple_condition(self, walk: _Walk, depth: int):
+        walk.budget -= 1
+        walk.conditions += 1
+        rng = walk.rng
+        fields = self._scope_fields(walk.scope)
+        # Item fields are preferred inside EXISTS / FOR EACH.
+        scoped = [f for f in fields if f.path.split(".", 1)[0] in walk.scope]
+        field = rng.choice(scoped if scoped and rng.random() < 0.8 else fields)
+        form = rng.random()
+        if field.type == "string" and "choices" in field.config and form < 0.3:
+            values = sorted({field.literal(rng) for _ in range(rng.randint(1, 4))})
+            walk.out.append(f"{field.path} IN [{', '.join(values)}]")
+        elif field.type == "string" and "pattern" in field.config and form < 0.5:
+            walk.out.append(f"{field.path} MATCHES {json.dumps(field.config['pattern'])}")
+        elif form > 0.9 and field.type in ("number", "date"):
+            others = [f for f in fields if f.type == field.type and f is not field]
+            op = rng.choice(("==", "!=", ">", "<", ">=", "<="))
+            walk.out.append(f"{field.path} {op} {rng.choice(others).path}" if others else
+                            f"{field.path} {op} {field.literal(rng)}")
+        else:
+            ops = ("==", "!=", ">", "<", ">=", "<=") if field.type in ("number", "date") else ("==", "!=")
+            walk.out.append(f"{field.path} {rng.choice(ops)} {field.literal(rng)}")
+
+    def _scoped_condition(self, walk: _Walk, depth: int):
+        free = [item for item in COLLECTIONS if item not in walk.scope]
+        if not free:
+            self._simple_condition(walk, depth)
+            return
+        item = walk.rng.choice(free)
+        if walk.rng.random() < 0.5:
+            walk.out.append(f"EXISTS {item} WHERE")
+        else:
+            walk.out.append(f"FOR EACH {item} IN {COLLECTIONS[item]['path']}")
+        outer = walk.scope
+        walk.scope = outer + (item,)
+        self._production(walk, "condition", depth)
+        walk.scope = outer
+
+    def _assignment(self, walk: _Walk, depth: int):
+        rng = walk.rng
+        target = rng.choice(OUTPUT_FIELDS)
+        numbers = [f for f in self._scope_fields(()) if f.type == "number"]
+        if rng.random() < 0.3 and numbers:
+            walk.out.append(f"{target} = {rng.choice(numbers).path}")
+        else:
+            walk.out.append(f"{target} = {round(rng.random(), 2)}")
+
+    def _message(self, walk: _Walk, depth: int):
+        walk.out.append(json.dumps(walk.rng.choice(MESSAGES)))
+
+    def _field_path(self, walk: _Walk, depth: int):
+        walk.out.append(walk.rng.choice(self._scope_fields(walk.scope)).path)
+
+    # -- near-valid rules --
+
+    def near_valid(self, index: int = 0, attempts: int = 8) -> Tuple[str, str]:
+        """A corrupted variant of rule(index) that no longer parses, and the corruption applied."""
+        text = self.rule(index)
+        rng = self._rng(~index)
+        names = list(MUTATIONS)
+        for _ in range(attempts):
+            kind = rng.choice(names)
+            mutated = MUTATIONS[kind](text, rng)
+            if mutated is None or mutated == text:
+                continue
+            try:
+                parse_rule(mutated)
+            except DSLSyntaxError:
+                return mutated, kind
+        return text.rsplit("END", 1)[0].rstrip(), "missing_end"
+
+
+def _replace_one(pattern: str, replacement, text: str, rng: random.Random) -> Optional[str]:
+    matches = list(re.finditer(pattern, text))
+    if not matches:
+        return None
+    m = rng.choice(matches)
+    new = replacement(m) if callable(replacement) else replacement
+    return text[:m.start()] + new + text[m.end():]
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+MUTATIONS: Dict[str, Callable[[str, random.Random], Optional[str]]] = {
+    "missing_end": lambda t, rng: t.rsplit("END", 1)[0].rstrip(),
+    "missing_then": lambda t, rng: _replace_one(r"\bTHEN\b ?", "", t, rng),
+    "keyword_typo": lambda t, rng: _replace_one(r"\b(WHEN|THEN|ELSE|REJECT|APPROVE|FLAG|WHERE)\b",
+                                                lambda m: _typo(m.group(), rng), t, rng),
+    "lowercase_keyword": lambda t, rng: _replace_one(r"\b(WHEN|THEN|END)\b", lambda m: m.group().lower(), t, rng),
+    "assign_for_compare": lambda t, rng: _replace_one(r" == ", " = ", t, rng),
+    "unbalanced_paren": lambda t, rng: _replace_one(r"\)", "", t, rng),
+    "unterminated_string": lambda t, rng: _replace_one(r'"([^"\n]*)"', lambda m: '"' + m.group(1), t, rng),
+    "missing_operand": lambda t, rng: _replace_one(r" (==|!=|>=|<=|>|<) [^\s\]]+", lambda m: f" {m.group(1)}", t, rng),
+    "dangling_and": lambda t, rng: _replace_one(r"\nTHEN", " AND\nTHEN", t, rng),
+}
+
+
+def iter_rules(generator: RuleGenerator, count: int, start: int = 0,
+               near_valid: float = 0.0) -> Iterator[Dict[str, Any]]:
+    """Corpus records; a near_valid fraction of them are corrupted."""
+    for index in range(start, start + count):
+        if near_valid and random.Random((generator.seed * 1_000_003 + index) ^ _NEAR_VALID_SALT).random() < near_valid:
+            text, mutation = generator.near_valid(index)
+            yield {"id": index, "rule": text, "valid": False, "mutation": mutation}
+        else:
+            text, conditions, depth = generator.generate(index)
+            yield {"id": index, "rule": text, "valid": True, "mutation": None, "conditions": conditions,
+                   "depth": depth}
+
+
+# ---- Claims ----
+
+class ClaimGenerator:
+    """Nested claim records with the schema's fields and collections."""
+
+    def __init__(self, fields: Optional[Dict[str, FieldSpec]] = None, missing: float = 0.0, seed: int = 0):
+        self.fields = fields or load_fields()
+        self.missing = missing
+        self.seed = seed
+        self._scalars = [(f.path.split("."), f) for f in self.fields.values()
+                         if f.path.split(".", 1)[0] not in COLLECTIONS]
+        self._items = {item: [(f.path.split(".", 1)[1], f) for f in self.fields.values()
+                              if f.path.split(".", 1)[0] == item] for item in COLLECTIONS}
+
+    def claim(self, index: int = 0) -> Dict[str, Any]:
+        rng = random.Random(self.seed * 1_000_003 + index)
+        record: Dict[str, Any] = {"claim": {"id": f"C{index:09d}"}}
+        for path, field in self._scalars:
+            if self.missing and rng.random() < self.missing:
+                continue
+            node = record
+            for part in path[:-1]:
+                node = node.setdefault(part, {})
+            node[path[-1]] = field.sample(rng)
+        for item, item_fields in self._items.items():
+            config = COLLECTIONS[item]
+            entries = [{name: f.sample(rng) for name, f in item_fields}
+                       for _ in range(rng.randint(config["low"], config["high"]))]
+            node = record
+            parts = config["path"].split(".")
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = entries
+        return record
+
+
+# ---- Streaming output ----
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(kind: str, options: Dict[str, Any]):
+    fields = load_fields(options["spec"])
+    if kind == "claims":
+        _worker["claims"] = ClaimGenerator(fields, options["missing"], options["seed"])
+    else:
+        _worker["rules"] = RuleGenerator(Grammar.load(options["version"]), fields, options["max_depth"],
+                                         options["max_conditions"], seed=options["seed"])
+        _worker["near_valid"] = options["near_valid"]
+
+
+def _chunk(args: Tuple[str, int, int]) -> List[Dict[str, Any]]:
+    kind, start, count = args
+    if kind == "claims":
+        return [_worker["claims"].claim(i) for i in range(start, start + count)]
+    return list(iter_rules(_worker["rules"], count, start, _worker["near_valid"]))
+
+
+def generate_records(kind: str, count: int, start: int = 0, workers: int = 1, chunk_size: int = 1000,
+                     **options) -> Iterator[Dict[str, Any]]:
+    """Records in index order, generated by `workers` processes (items only depend on their index)."""
+    chunks = ((kind, i, min(chunk_size, start + count - i)) for i in range(start, start + count, chunk_size))
+    if workers <= 1:
+        _init_worker(kind, options)
+        for chunk in chunks:
+            yield from _chunk(chunk)
+        return
+    with multiprocessing.Pool(workers, _init_worker, (kind, options)) as pool:
+        for records in pool.imap(_chunk, chunks):
+            yield from records
+
+def write_jsonl(path: str, records: Iterator[Dict[str, Any]], report_every: int = 100000) -> int:
+    """Stream records to a JSONL file; return the count."""
+    encode = json.JSONEncoder(separators=(",", ":")).encode
+    count = 0
+    started = time.perf_counter()
+    with open(path, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+        for record in records:
+            f.write(encode(record))
+            f.write("\n")
+            count += 1
+            if report_every and count % report_every == 0:
+                print(f"{count} records, {count / (time.perf_counter() - started):.0f}/s", file=sys.stderr)
+    return count
+
+
+def write_dsl(path: str, rules: Iterator[Dict[str, Any]]) -> int:
+    """Stream rule texts to a .dsl file (blank line between rules), e.g. for engine.stream."""
+    count = 0
+    with open(path, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+        for record in rules:
+            f.write(record["rule"])
+            f.write("\n\n")
+            count += 1
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.dsl.synth", description="Generate synthetic rules or claims.")
+    parser.add_argument("kind", choices=("rules", "claims"))
+    parser.add_argument("output", help=".jsonl (or .dsl for valid rules only)")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--start", type=int, default=0, help="Index of the first item (for shards)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spec", help="YAML/JSON field distributions overriding the defaults")
+    parser.add_argument("--version", default="1.0", help="Grammar version")
+    parser.add_argument("--max-depth", type=int, default=3, help="Max condition/IF nesting")
+    parser.add_argument("--max-conditions", type=int, default=8, help="Max simple conditions per rule")
+    parser.add_argument("--near-valid", type=float, default=0.0, help="Fraction of corrupted rules")
+    parser.add_argument("--missing", type=float, default=0.0, help="Probability a claim field is absent")
+    parser.add_argument("--workers", type=int, default=1, help="Generator processes")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    records = generate_records(args.kind, args.count, args.start, args.workers, spec=args.spec,
+                               seed=args.seed, version=args.version, max_depth=args.max_depth,
+                               max_conditions=args.max_conditions, near_valid=args.near_valid,
+                               missing=args.missing)
+    if args.kind == "rules" and args.output.endswith(".dsl"):
+        count = write_dsl(args.output, (r for r in records if r["valid"]))
+    else:
+        count = write_jsonl(args.output, records)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({"kind": args.kind, "count": count, "seconds": round(elapsed, 2),
+                      "per_second": round(count / elapsed) if elapsed else None}), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.dsl.nodes import Exists, Field, Flag, ForEach, Matches, Node, Reject, Rule
+from app.dsl.parser import DSLSyntaxError, parse_rule
+
+# Entity prefixes from the variable naming conventions in the generator prompt.
+KNOWN_ENTITIES = {
+    "patient", "claim", "provider", "procedure", "diagnosis", "line_item",
+    "preauth", "attachment", "guideline", "current",
+}
+
+_DSL_BLOCK_RE = re.compile(r"```dsl\s*\n(.*?)\n```", re.DOTALL)
+_RULE_NAME_RE = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+class ValidationResult:
+    """
+    Outcome of a local rule check.
+    valid is True when the text parses against the grammar; score is the
+    fraction of structural checks that passed (0.0 when parsing fails).
+    """
+    def __init__(self, valid: bool, score: float, errors: Optional[List[str]] = None,
+                 warnings: Optional[List[str]] = None, rule: Optional[Rule] = None):
+        self.valid = valid
+        self.score = score
+        self.errors = errors or []
+        self.warnings = warnings or []
+        self.rule = rule
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "valid": self.valid,
+            "score": self.score,
+            "errors": self.errors,
+            "warnings": self.warnings,
+        }
+
+
+def extract_rule_text(text: str) -> str:
+    """Return the rule from a ```dsl fenced block if present, else the stripped text."""
+    match = _DSL_BLOCK_RE.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+def generation_error(text: Optional[str]) -> Optional[str]:
+    """
+    The message when generated text is a failure rather than output: the agent
+    returns "[Error] ..." and workflow nodes "Error: ..." instead of raising.
+    """
+    text = (text or "").strip()
+    if not text:
+        return "No rule generated"
+    if text.startswith(("[Error]", "Error:")):
+        return text
+    return None
+
+
+def iter_nodes(node) -> Iterable[Node]:
+    """Depth-first walk over a node and all nodes nested in its fields."""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, tuple):
+            stack.extend(reversed(current))
+            continue
+        if not isinstance(current, Node):
+            continue
+        yield current
+        stack.extend(reversed([getattr(current, f) for f in current._fields]))
+
+
+def _bound_names(rule: Rule) -> set:
+    names = set()
+    for node in iter_nodes(rule):
+        if isinstance(node, Exists):
+            names.add(node.entity)
+        elif isinstance(node, ForEach):
+            names.add(node.item)
+    return names
+
+
+def validate_rule(text: str, known_entities: Optional[set] = None) -> ValidationResult:
+    """
+    Check generated rule text locally: a grammar parse followed by structural
+    checks (naming, known entity prefixes, non-empty messages, compilable regexes).
+    """
+    rule_text = extract_rule_text(text or "")
+    if not rule_text:
+        return ValidationResult(False, 0.0, errors=["Empty rule text"])
+    try:
+        rule = parse_rule(rule_text)
+    except DSLSyntaxError as e:
+        return ValidationResult(False, 0.0, errors=[f"Syntax error: {e}"])
+
+    entities = (known_entities or KNOWN_ENTITIES) | _bound_names(rule)
+    checks = []
+    warnings = []
+
+    checks.append(("rule name is snake_case", bool(_RULE_NAME_RE.match(rule.name))))
+
+    unknown = sorted({
+        node.dotted for node in iter_nodes(rule)
+        if isinstance(node, Field) and len(node.path) > 1 and node.path[0] not in entities
+    })
+    if unknown:
+        warnings.append(f"Unknown entity prefixes: {', '.join(unknown)}")
+    checks.append(("field paths use known entities", not unknown))
+
+    messages_ok = all(
+        node.message.strip() for node in iter_nodes(rule) if isinstance(node, (Reject, Flag))
+    )
+    checks.append(("REJECT/FLAG messages are non-empty", messages_ok))
+
+    regex_ok = True
+    for node in iter_nodes(rule):
+        if isinstance(node, Matches) and not isinstance(node.pattern, Field):
+            try:
+                re.compile(node.pattern.value)
+            except re.error as e:
+                regex_ok = False
+                warnings.append(f"Invalid MATCHES pattern {node.pattern.value!r}: {e}")
+    checks.append(("MATCHES patterns compile", regex_ok))
+
+    errors = [f"Failed check: {name}" for name, ok in checks if not ok]
+    score = sum(1 for _, ok in checks if ok) / len(checks)
+    return ValidationResult(True, score, errors=errors, warnings=warnings, rule=rule)
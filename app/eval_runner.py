@@ -0,0 +1,270 @@
+"""
+Evaluation runner for the generation workflow.
+
+Runs the test examples (examples/test_examples/example_<version>.yaml)
+concurrently under a requests-per-minute limit and scores each generated rule
+against the expected one with app.dsl.compare.rule_similarity.
+
+Results are cached by a fingerprint of everything that determines them: the
+example's prompt and expected response, the system prompt, the core examples
+of the version and the model configuration. A re-run only calls the LLM for
+examples whose fingerprint changed (or all of them with --force). The cache
+is JSONL: each result is appended as it completes, and the file is compacted
+once at the end of a run, dropping the entries of the run's examples (by
+version and prompt) whose fingerprint changed; results for examples outside
+the run, e.g. with --limit or another --version, are kept. Failed generations,
+including rules that came back as an error message, are not cached.
+
+    python -m app.eval_runner --concurrency 4 --rpm 20 --report data/eval_report.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+from app.dsl.compare import parses, rule_similarity
+from app.dsl.validator import extract_rule_text, generation_error
+from app.ratelimit import RateLimiter
+
+logger = logging.getLogger("eval_runner")
+
+TEST_EXAMPLES_DIR = "examples/test_examples"
+CORE_EXAMPLES_DIR = "examples/core_examples"
+PROMPT_PATH = "agents/prompts/default_prompt.txt"
+DEFAULT_CACHE = "data/eval_cache.jsonl"
+DEFAULT_REPORT = "data/eval_report.json"
+
+Generate = Callable[[str], str]
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _load_yaml_examples(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return (yaml.safe_load(f) or {}).get("examples", [])
+
+
+def load_test_examples(version: str = "1.0", directory: str = TEST_EXAMPLES_DIR) -> List[Dict[str, Any]]:
+    return _load_yaml_examples(os.path.join(directory, f"example_{version}.yaml"))
+
+
+def run_context(version: str = "1.0") -> Dict[str, Any]:
+    """Inputs shared by every example: prompt, core examples and model configuration."""
+    from config.settings import get_settings
+    settings = get_settings()
+    prompt = ""
+    if os.path.exists(PROMPT_PATH):
+        with open(PROMPT_PATH, "r", encoding="utf-8") as f:
+            prompt = f.read()
+    core = _load_yaml_examples(os.path.join(CORE_EXAMPLES_DIR, f"example_{version}.yaml"))
+    return {
+        "version": version,
+        "prompt": _digest(prompt),
+        "core_examples": _digest(core),
+        "model": {
+            "llm_model": settings.LLM_MODEL,
+            "cascade_enabled": settings.CASCADE_ENABLED,
+            "cascade_tiers": settings.CASCADE_TIERS if settings.CASCADE_ENABLED else None,
+            "router_enabled": settings.ROUTER_ENABLED,
+            "router_profiles": settings.ROUTER_PROFILES if settings.ROUTER_ENABLED else None,
+        },
+    }
+
+
+def example_id(example: Dict[str, Any], context: Dict[str, Any]) -> str:
+    """Identity of an example within its version, across edits to its expected response or the model."""
+    return _digest({"prompt": example.get("prompt", ""), "version": context.get("version")})
+
+
+def fingerprint(example: Dict[str, Any], context: Dict[str, Any]) -> str:
+    return _digest({"prompt": example.get("prompt", ""), "expected": example.get("response", ""), "context": context})
+
+
+def workflow_generate(prompt: str) -> str:
+    """Default generator: the full LangGraph workflow."""
+    from app.main_workflow import run_workflow
+    return run_workflow(prompt).get("codegen_result") or ""
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _group_stats(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    scored = [r for r in results if r["error"] is None]
+    latencies = [r["latency"] for r in scored]
+    return {
+        "count": len(results),
+        "errors": len(results) - len(scored),
+        "mean_score": round(sum(r["score"] for r in scored) / len(scored), 4) if scored else None,
+        "exact": sum(r["score"] == 1.0 for r in scored),
+        "valid": sum(r["valid"] for r in scored),
+        "latency_mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p95": _percentile(latencies, 0.95),
+    }
+
+
+class EvalRunner:
+    """Runs, caches and reports the evaluation of a set of test examples."""
+
+    def __init__(self, generate: Generate = workflow_generate, context: Optional[Dict[str, Any]] = None,
+                 cache_path: str = DEFAULT_CACHE, concurrency: int = 4, rpm: float = 20.0):
+        self.generate = generate
+        self.context = context if context is not None else run_context()
+        self.cache_path = cache_path
+        self.concurrency = max(1, concurrency)
+        self.limiter = RateLimiter(rpm)
+        self._cache = self._load_cache()
+        self._lock = threading.Lock()
+
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        """Cached results by fingerprint; later lines win and unreadable (e.g. torn) lines are skipped."""
+        cache: Dict[str, Dict[str, Any]] = {}
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return cache
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        cache[entry["key"]] = entry["result"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except OSError as e:
+            logger.warning(f"Ignoring unreadable eval cache {self.cache_path}: {e}")
+        return cache
+
+    def _open_cache(self, path: str, mode: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, mode, encoding="utf-8")
+
+    def _append_cache(self, key: str, result: Dict[str, Any]):
+        if not self.cache_path:
+            return
+        with self._open_cache(self.cache_path, "a") as f:
+            f.write(json.dumps({"key": key, "result": result}) + "\n")
+
+    def _save_cache(self):
+        """Rewrite the cache with one line per entry."""
+        if not self.cache_path:
+            return
+        tmp = f"{self.cache_path}.tmp"
+        with self._open_cache(tmp, "w") as f:
+            f.writelines(json.dumps({"key": key, "result": result}) + "\n" for key, result in self._cache.items())
+        os.replace(tmp, self.cache_path)
+
+    def _evaluate(self, index: int, example: Dict[str, Any], key: str) -> Dict[str, Any]:
+        self.limiter.wait()
+        expected = example.get("response", "")
+        start = time.perf_counter()
+        try:
+            generated = self.generate(example.get("prompt", ""))
+            error = generation_error(generated)
+        except Exception as e:
+            generated, error = "", str(e)
+        latency = time.perf_counter() - start
+        result = {
+            "index": index,
+            "prompt": example.get("prompt", ""),
+            "category": example.get("category") or "uncategorized",
+            "complexity": example.get("complexity") or "unknown",
+            "example": example_id(example, self.context),
+            "fingerprint": key,
+            "latency": round(latency, 3),
+            "score": round(rule_similarity(generated, expected), 4) if error is None else 0.0,
+            "valid": error is None and parses(generated),
+            "generated": extract_rule_text(generated) if error is None else "",
+            "error": error,
+        }
+        logger.info(f"[{index}] {result['category']}: score {result['score']:.2f} in {latency:.2f}s")
+        if error is None:
+            # Failed calls are retried on the next run rather than cached.
+            with self._lock:
+                self._cache[key] = result
+                self._append_cache(key, result)
+        return result
+
+    def run(self, examples: List[Dict[str, Any]], force: bool = False) -> Dict[str, Any]:
+        started = time.perf_counter()
+        keys = [fingerprint(e, self.context) for e in examples]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(examples)
+        pending = []
+        for i, key in enumerate(keys):
+            cached = None if force else self._cache.get(key)
+            if cached is not None:
+                results[i] = dict(cached, index=i, cached=True)
+            else:
+                pending.append(i)
+        logger.info(f"{len(examples)} examples: {len(examples) - len(pending)} cached, {len(pending)} to run.")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {i: pool.submit(self._evaluate, i, examples[i], keys[i]) for i in pending}
+            for i, future in futures.items():
+                results[i] = dict(future.result(), cached=False)
+        with self._lock:
+            # Drop superseded entries of this run's examples (changed prompt, core examples or
+            # model); other examples' results may belong to a run with --limit or another version.
+            current, ran = set(keys), {example_id(e, self.context) for e in examples}
+            self._cache = {k: v for k, v in self._cache.items() if k in current or v.get("example") not in ran}
+            self._save_cache()
+        return self.report(results, time.perf_counter() - started)
+
+    def report(self, results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        summary = _group_stats(results)
+        summary.update(evaluated=sum(not r["cached"] for r in results), cached=sum(r["cached"] for r in results),
+                       elapsed=round(elapsed, 3))
+        by = {}
+        for field in ("category", "complexity"):
+            groups: Dict[str, List[Dict[str, Any]]] = {}
+            for r in results:
+                groups.setdefault(r[field], []).append(r)
+            by[field] = {name: _group_stats(group) for name, group in sorted(groups.items())}
+        return {"context": self.context, "summary": summary, "by_category": by["category"],
+                "by_complexity": by["complexity"], "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.eval_runner", description="Evaluate rule generation on the test examples.")
+    parser.add_argument("--version", default="1.0", help="Example version")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=20.0, help="Max LLM requests per minute (0 for no limit)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Result cache file")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help="JSON report file")
+    parser.add_argument("--limit", type=int, help="Only the first N examples")
+    parser.add_argument("--force", action="store_true", help="Re-run examples even if cached")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    examples = load_test_examples(args.version)[:args.limit]
+    if not examples:
+        print(f"No test examples for version {args.version}", file=sys.stderr)
+        return 1
+    runner = EvalRunner(context=run_context(args.version), cache_path=args.cache,
+                        concurrency=args.concurrency, rpm=args.rpm)
+    report = runner.run(examples, force=args.force)
+    if os.path.dirname(args.report):
+        os.makedirs(os.path.dirname(args.report), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({"summary": report["summary"], "by_category": report["by_category"]}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
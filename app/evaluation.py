@@ -0,0 +1,210 @@
+"""
+Online rule evaluation behind POST /evaluate.
+
+A request names its rules either as DSL text or as a rule-set id, which is
+read from <RULE_SETS_DIR>/<id>.dsl. Parsed rule sets are cached by their
+text. Compiled rules are cached by rule hash in engine.compiler's LRU, so a
+hot rule set is never re-parsed or recompiled.
+
+Single-claim requests are micro-batched. The first request for a rule set
+opens a window of window_ms. Every claim that arrives for the same rule set
+before the window closes joins it, and the batch flushes early once
+max_batch claims are waiting. The batch is evaluated as one columnar batch
+on a worker thread, and each request gets its own row back. A request
+therefore waits at most window_ms plus one batch evaluation. If the batch
+raises, its claims are re-evaluated one by one so that only the requests
+with a claim that cannot be evaluated fail (ClaimEvaluationError, served as
+400).
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.dsl.parser import parse_rules
+from app.metrics import metrics
+from config.settings import get_settings
+from engine.columnar import ColumnarBatch, evaluate_batch
+from engine.compiler import CompiledRule, compile_rule, rule_hash
+
+logger = logging.getLogger("evaluation")
+
+_RULE_SET_ID = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+class RuleSetNotFound(LookupError):
+    pass
+
+
+class ClaimEvaluationError(ValueError):
+    """A claim could not be evaluated against the rule set."""
+
+
+class RuleSet:
+    """Compiled rules plus a hash of the whole set (the micro-batching key)."""
+    __slots__ = ("rules", "hash")
+
+    def __init__(self, rules: Sequence[CompiledRule]):
+        self.rules: Tuple[CompiledRule, ...] = tuple(rules)
+        self.hash = rule_hash(tuple(r.rule for r in self.rules))
+
+    @property
+    def names(self) -> List[str]:
+        return [r.name for r in self.rules]
+
+
+@lru_cache(maxsize=256)
+def compile_rule_set(text: str) -> RuleSet:
+    """Parse and compile DSL text holding one or more rules (cached by text)."""
+    return RuleSet([compile_rule(rule) for rule in parse_rules(text)])
+
+
+class RuleSetRegistry:
+    """Rule sets stored as <directory>/<id>.dsl, reloaded when the file changes."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._loaded: Dict[str, Tuple[float, RuleSet]] = {}
+
+    def get(self, rule_set_id: str) -> RuleSet:
+        if not _RULE_SET_ID.match(rule_set_id):
+            raise RuleSetNotFound(rule_set_id)
+        path = os.path.join(self.directory, f"{rule_set_id}.dsl")
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            raise RuleSetNotFound(rule_set_id) from None
+        loaded = self._loaded.get(rule_set_id)
+        if loaded is not None and loaded[0] == mtime:
+            return loaded[1]
+        with open(path, "r", encoding="utf-8") as f:
+            rule_set = compile_rule_set(f.read())
+        self._loaded[rule_set_id] = (mtime, rule_set)
+        return rule_set
+
+
+def evaluate_claims(rule_set: RuleSet, claims: List[Dict[str, Any]]) -> List[Dict[str, List[tuple]]]:
+    """Evaluate claims as one columnar batch; per claim, actions keyed by rule name."""
+    batch = ColumnarBatch.from_records(claims)
+    results = [(rule.name, evaluate_batch(rule, batch)) for rule in rule_set.rules]
+    return [{name: result.actions(row) for name, result in results} for row in range(len(claims))]
+
+
+def _evaluate_isolated(rule_set: RuleSet, claims: List[Dict[str, Any]]) -> List[Any]:
+    """evaluate_claims, falling back to one claim at a time; failing claims get a ClaimEvaluationError."""
+    try:
+        return evaluate_claims(rule_set, claims)
+    except Exception as e:
+        logger.warning(f"Batch of {len(claims)} claims failed ({e!r}); evaluating claims one by one.")
+        metrics.inc("evaluate_batch_fallbacks_total")
+    results: List[Any] = []
+    for claim in claims:
+        try:
+            results.append(evaluate_claims(rule_set, [claim])[0])
+        except Exception as e:
+            results.append(ClaimEvaluationError(f"Claim could not be evaluated: {e}"))
+    return results
+
+
+class _PendingBatch:
+    __slots__ = ("rule_set", "claims", "futures", "timer")
+
+    def __init__(self, rule_set: RuleSet):
+        self.rule_set = rule_set
+        self.claims: List[Dict[str, Any]] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatcher:
+    """Groups concurrent single-claim evaluations for the same rule set into one batch."""
+
+    def __init__(self, executor: ThreadPoolExecutor, window_ms: float = 2.0, max_batch: int = 256):
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: Dict[str, _PendingBatch] = {}
+
+    async def submit(self, rule_set: RuleSet, claim: Dict[str, Any]) -> Dict[str, List[tuple]]:
+        loop = asyncio.get_running_loop()
+        pending = self._pending.get(rule_set.hash)
+        if pending is None:
+            pending = self._pending[rule_set.hash] = _PendingBatch(rule_set)
+            pending.timer = loop.call_later(self.window, self._flush, rule_set.hash)
+        future = loop.create_future()
+        pending.claims.append(claim)
+        pending.futures.append(future)
+        if len(pending.claims) >= self.max_batch:
+            self._flush(rule_set.hash)
+        return await future
+
+    def _flush(self, key: str):
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        task = loop.run_in_executor(self.executor, _evaluate_isolated, pending.rule_set, pending.claims)
+
+        def done(task: asyncio.Future):
+            metrics.inc("evaluate_batches_total")
+            metrics.observe("evaluate_batch_size", len(pending.claims))
+            metrics.observe("evaluate_batch_seconds", time.perf_counter() - started)
+            error = task.exception()
+            for i, future in enumerate(pending.futures):
+                if future.done():
+                    continue
+                result = error if error is not None else task.result()[i]
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+        task.add_done_callback(done)
+
+
+class EvaluationService:
+    def __init__(self, registry: RuleSetRegistry, workers: int = 2, window_ms: float = 2.0, max_batch: int = 256):
+        self.registry = registry
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="evaluate")
+        self.batcher = MicroBatcher(self.executor, window_ms, max_batch)
+
+    def resolve(self, rule: Optional[str] = None, rule_set_id: Optional[str] = None) -> RuleSet:
+        """The rule set for a request: DSL text or a registered rule-set id (exactly one)."""
+        if (rule is None) == (rule_set_id is None):
+            raise ValueError("Provide exactly one of 'rule' or 'rule_set'")
+        if rule is not None:
+            return compile_rule_set(rule.strip())
+        return self.registry.get(rule_set_id)
+
+    async def evaluate(self, rule_set: RuleSet, claims: List[Dict[str, Any]]) -> List[Dict[str, List[tuple]]]:
+        started = time.perf_counter()
+        if len(claims) == 1:
+            results = [await self.batcher.submit(rule_set, claims[0])]
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                results = await loop.run_in_executor(self.executor, evaluate_claims, rule_set, claims)
+            except Exception as e:
+                raise ClaimEvaluationError(f"Claims could not be evaluated: {e}") from e
+        metrics.inc("evaluate_requests_total")
+        metrics.inc("evaluate_claims_total", len(claims))
+        metrics.observe("evaluate_request_seconds", time.perf_counter() - started)
+        return results
+
+
+@lru_cache
+def get_evaluation_service() -> EvaluationService:
+    settings = get_settings()
+    return EvaluationService(
+        RuleSetRegistry(settings.RULE_SETS_DIR),
+        workers=settings.EVALUATE_WORKERS,
+        window_ms=settings.EVALUATE_BATCH_WINDOW_MS,
+        max_batch=settings.EVALUATE_MAX_BATCH,
+    )
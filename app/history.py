@@ -0,0 +1,283 @@
+"""
+Generation history and audit store.
+
+Request handlers hand a record to HistoryWriter.record(), which only puts it
+on a bounded queue (records are dropped and counted if the queue is full,
+never blocking the request). A background thread derives the expensive
+fields (prompt hash, rule hash, and token counts where the provider did not
+report usage) and writes records in batches to HistoryStore.
+
+HistoryStore is append-only SQLite in WAL mode with synchronous=NORMAL:
+commits survive a process crash, and a checkpoint every fsync_interval
+seconds syncs them to disk. The store is split into segments named by the
+time of their first record (history-<epoch ms>.db). A batch goes to a new
+segment once the current one exceeds segment_bytes, and the oldest segments
+beyond max_segments are deleted. Each segment is indexed by time and by
+(rule_hash, time); time-range queries skip segments outside the range.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.dsl.parser import DSLSyntaxError, parse_rule
+from app.dsl.validator import extract_rule_text
+from app.metrics import metrics
+from app.utils.token_util import count_tokens
+from config.settings import get_settings
+from engine.compiler import rule_hash
+
+logger = logging.getLogger("history")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    ts REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    query TEXT NOT NULL,
+    prompt_hash TEXT,
+    model TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    latency REAL,
+    status TEXT NOT NULL,
+    rule_hash TEXT,
+    rule TEXT,
+    valid INTEGER,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS history_by_ts ON history (ts);
+CREATE INDEX IF NOT EXISTS history_by_rule ON history (rule_hash, ts);
+"""
+# Records are timestamped when enqueued, so a segment may hold a few slightly
+# older than its name; time-range pruning allows for that.
+_SEGMENT_SLACK = 60.0
+_COLUMNS = ("ts", "endpoint", "query", "prompt_hash", "model", "prompt_tokens", "completion_tokens",
+            "latency", "status", "rule_hash", "rule", "valid", "extra")
+
+
+def text_rule_hash(text: str) -> Optional[str]:
+    """rule_hash of the rule in text, or a hash of the text when it does not parse."""
+    if not text:
+        return None
+    rule_text = extract_rule_text(text)
+    try:
+        return rule_hash(parse_rule(rule_text))
+    except DSLSyntaxError:
+        return hashlib.sha256(rule_text.encode("utf-8")).hexdigest()[:16]
+
+
+def _row(record: Dict[str, Any]) -> tuple:
+    """Derive the stored columns from a raw record (runs on the writer thread)."""
+    prompt = record.pop("prompt", None)
+    rule = record.get("rule") or ""
+    if prompt is not None and not isinstance(prompt, str):
+        prompt = json.dumps(prompt, sort_keys=True, default=str)
+    record.setdefault("prompt_hash", hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16] if prompt else None)
+    record.setdefault("prompt_tokens", count_tokens(prompt or "") + count_tokens(record.get("query", "")))
+    record.setdefault("completion_tokens", count_tokens(rule))
+    record.setdefault("rule_hash", text_rule_hash(rule))
+    extra = {k: v for k, v in record.items() if k not in _COLUMNS}
+    record["extra"] = json.dumps(extra, default=str) if extra else None
+    record.setdefault("status", "ok")
+    return tuple(record.get(c) for c in _COLUMNS)
+
+
+class HistoryStore:
+    """Segmented append-only SQLite store (see module docstring)."""
+
+    def __init__(self, directory: str = "logs/history", segment_bytes: int = 64 * 1024 * 1024,
+                 max_segments: int = 20):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        segments = self.segments()
+        self._path = segments[-1] if segments else self._segment_path(int(time.time() * 1000))
+        self._db = self._open(self._path)
+
+    def _segment_path(self, ms: int) -> str:
+        return os.path.join(self.directory, f"history-{ms:013d}.db")
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        return db
+
+    def segments(self) -> List[str]:
+        """Segment files, oldest first."""
+        return sorted(glob.glob(os.path.join(self.directory, "history-*.db")))
+
+    @staticmethod
+    def _created(path: str) -> float:
+        return int(os.path.basename(path)[8:-3]) / 1000.0
+
+    def write(self, rows: List[tuple]):
+        if rows and self._size() >= self.segment_bytes:
+            self.rotate(min(r[0] for r in rows))
+        with self._db:
+            self._db.executemany(
+                f"INSERT INTO history ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", rows)
+
+    def _size(self) -> int:
+        return sum(os.path.getsize(p) for p in (self._path, f"{self._path}-wal") if os.path.exists(p))
+
+    def sync(self):
+        """Checkpoint the WAL into the segment, syncing committed records to disk."""
+        self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def rotate(self, first_ts: float):
+        """Start a new segment for records from first_ts on."""
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._db.close()
+        # Segment names must keep increasing, even for records older than the current segment's name.
+        self._path = self._segment_path(max(int(first_ts * 1000), int(os.path.basename(self._path)[8:-3]) + 1))
+        self._db = self._open(self._path)
+        metrics.inc("history_rotations_total")
+        for old in self.segments()[:-self.max_segments]:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(old + suffix):
+                    os.remove(old + suffix)
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None, rule_hash: Optional[str] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        """Records in [start, end) (and with rule_hash, if given), newest first."""
+        clauses, params = [], []
+        if rule_hash is not None:
+            clauses.append("rule_hash = ?")
+            params.append(rule_hash)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        sql = (f"SELECT {', '.join(_COLUMNS)} FROM history {'WHERE ' + ' AND '.join(clauses) if clauses else ''} "
+               f"ORDER BY ts DESC LIMIT ?")
+        segments = self.segments()
+        results: List[Dict[str, Any]] = []
+        for i in range(len(segments) - 1, -1, -1):
+            path = segments[i]
+            # A segment holds records from its creation until the next segment's.
+            if end is not None and self._created(path) - _SEGMENT_SLACK >= end:
+                continue
+            if start is not None and i + 1 < len(segments) and self._created(segments[i + 1]) + _SEGMENT_SLACK < start:
+                break
+            db = self._db if path == self._path else sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                rows = db.execute(sql, (*params, limit - len(results))).fetchall()
+            finally:
+                if db is not self._db:
+                    db.close()
+            for row in rows:
+                item = dict(zip(_COLUMNS, row))
+                item["valid"] = None if item["valid"] is None else bool(item["valid"])
+                item.update(json.loads(item.pop("extra") or "{}"))
+                results.append(item)
+            if len(results) >= limit:
+                break
+        return results
+
+    def close(self):
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._db.close()
+
+
+class HistoryWriter:
+    """Queue plus background thread that batches records into a HistoryStore."""
+
+    def __init__(self, store: HistoryStore, batch_size: int = 256, flush_interval: float = 1.0,
+                 fsync_interval: float = 5.0, max_queue: int = 10000):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()  # serializes store access between the writer and queries
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def record(self, **fields):
+        """Enqueue a record; never blocks."""
+        fields.setdefault("ts", time.time())
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            metrics.inc("history_dropped_total")
+
+    def _run(self):
+        last_sync = time.monotonic()
+        done = False
+        while not done:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            try:
+                with self._lock:
+                    if batch:
+                        self.store.write([_row(r) for r in batch])
+                        metrics.inc("history_records_total", len(batch))
+                    if time.monotonic() - last_sync >= self.fsync_interval or done:
+                        self.store.sync()
+                        last_sync = time.monotonic()
+            except Exception as e:
+                metrics.inc("history_write_errors_total")
+                logger.error(f"History write of {len(batch)} records failed: {e}")
+
+    def query(self, **kwargs) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.store.query(**kwargs)
+
+    def close(self, timeout: float = 10.0):
+        """Flush pending records and stop the writer."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+        with self._lock:
+            self.store.close()
+
+
+def record_generation(endpoint: str, query: str, result: Optional[Dict[str, Any]], latency: float,
+                      status: str = "ok", **extra):
+    """Enqueue the audit record of a generation request (no-op when history is disabled)."""
+    writer = get_history_writer()
+    if writer is None:
+        return
+    result = result or {}
+    validation = result.get("validation") or {}
+    usage = result.get("usage") or {}
+    if result.get("codegen_tier"):
+        extra.setdefault("tier", result["codegen_tier"])
+    # Provider-reported token counts; the writer estimates any the provider did not report.
+    for key in ("prompt_tokens", "completion_tokens"):
+        if usage.get(key) is not None:
+            extra[key] = usage[key]
+    writer.record(endpoint=endpoint, query=query, prompt=result.get("context") or result.get("prompt"),
+                  model=result.get("codegen_model"), latency=latency, status=status,
+                  rule=result.get("codegen_result"), valid=validation.get("valid"), **extra)
+
+
+@lru_cache
+def get_history_writer() -> Optional[HistoryWriter]:
+    settings = get_settings()
+    if not settings.HISTORY_ENABLED:
+        return None
+    store = HistoryStore(settings.HISTORY_DIR, settings.HISTORY_SEGMENT_BYTES, settings.HISTORY_MAX_SEGMENTS)
+    return HistoryWriter(store, settings.HISTORY_BATCH_SIZE, settings.HISTORY_FLUSH_INTERVAL,
+                         settings.HISTORY_FSYNC_INTERVAL, settings.HISTORY_QUEUE_SIZE)
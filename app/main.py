@@ -1,6 +1,20 @@
-from fastapi import FastAPI
+from typing import Any, Dict, List, Optional
+import secrets
+import time
+from fastapi import FastAPI, Header, HTTPException, Response
 from pydantic import BaseModel
-from app.main_workflow import run_workflow
+from app.main_workflow import run_refinement, run_workflow
+from app.admission import Overloaded, get_admission_controller
+from app.deadline import DeadlineExceeded, request_deadline
+from app.profiling import get_profile_store, start_profile
+from app.history import get_history_writer, record_generation
+from app.metrics import metrics
+from app.cascade import cascade_stats
+from app.evaluation import ClaimEvaluationError, RuleSetNotFound, get_evaluation_service
+from app.sessions import get_session_store
+from app.ratelimit import get_llm_limiter
+from app.utils.token_util import count_tokens
+from config.settings import get_settings
 
 app = FastAPI(title="DSL Code Generator API")
 
@@ -10,28 +24,224 @@ class QueryRequest(BaseModel):
 class QueryResponse(BaseModel):
     result: str
 
+class SessionRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None  # omit (or unknown/evicted) to start a new session
+
+class SessionResponse(BaseModel):
+    session_id: str
+    result: str
+    turn: int
+    mode: str  # "full" for first turns, "delta" for refinements
+    prompt_tokens: Optional[int] = None
+    validation: Optional[Dict[str, Any]] = None
+
+class EvaluateRequest(BaseModel):
+    rule: Optional[str] = None  # DSL text with one or more rules
+    rule_set: Optional[str] = None  # id of a stored rule set
+    claim: Optional[Dict[str, Any]] = None
+    claims: Optional[List[Dict[str, Any]]] = None
+
+class EvaluateResponse(BaseModel):
+    rule_set_hash: str
+    rules: List[str]
+    results: List[Dict[str, List[List[Any]]]]
+
 @app.post("/generate", response_model=QueryResponse)
-async def generate_dsl(request: QueryRequest):
-    """Generate DSL code based on user query"""
-    result = run_workflow(request.query)
+async def generate_dsl(request: QueryRequest, response: Response, x_deadline_ms: Optional[float] = Header(None),
+                       x_profile: Optional[str] = Header(None), x_admin_token: Optional[str] = Header(None)):
+    """Generate DSL code based on user query, within the X-Deadline-Ms budget (or the default)"""
+    settings = get_settings()
+    deadline = request_deadline(x_deadline_ms, settings.GENERATE_DEFAULT_DEADLINE_S, settings.GENERATE_MAX_DEADLINE_S)
+    profile = start_profile(x_profile, label=request.query[:80], admin_token=x_admin_token)
+    started = time.perf_counter()
+    try:
+        result = await get_admission_controller().run(deadline, run_workflow, request.query, deadline, profile)
+    except Overloaded as e:
+        record_generation("generate", request.query, None, time.perf_counter() - started, status="shed")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    except DeadlineExceeded as e:
+        record_generation("generate", request.query, None, time.perf_counter() - started, status="timeout")
+        if profile is not None:
+            get_profile_store().add(profile.finish(e))
+        raise HTTPException(status_code=504, detail=str(e))
+    record_generation("generate", request.query, result, time.perf_counter() - started)
+    if profile is not None:
+        get_profile_store().add(profile.finish())
+        response.headers["X-Profile-Id"] = profile.profile_id
     return QueryResponse(result=result.get("codegen_result", "Error: No result generated"))
 
 @app.get("/test")
 async def test_workflow():
     """Test endpoint with hardcoded query"""
+    settings = get_settings()
     hardcoded_query = "Create a DSL rule to validate that a patient has active insurance coverage"
-    result = run_workflow(hardcoded_query)
+    deadline = request_deadline(None, settings.GENERATE_DEFAULT_DEADLINE_S, settings.GENERATE_MAX_DEADLINE_S)
+    try:
+        result = await get_admission_controller().run(deadline, run_workflow, hardcoded_query, deadline)
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     return {
         "query": hardcoded_query,
         "result": result.get("codegen_result", "Error: No result generated"),
         "full_response": result
     }
 
+def _session_turn(session_id: Optional[str], query: str, deadline) -> tuple:
+    """Run one session turn (blocking; called on the admission pool)"""
+    store = get_session_store()
+    session = store.get(session_id)
+    if session is None or not session.rule_text:
+        # A session whose turns all failed so far keeps its id and generates from scratch
+        session = session or store.create()
+        result = run_workflow(query, deadline)
+        outcome = {
+            "codegen_result": result.get("codegen_result", "Error: No result generated"),
+            "validation": result.get("validation"),
+            "codegen_model": result.get("codegen_model"),
+            "usage": result.get("usage"),
+            "mode": "full",
+            "prompt_tokens": count_tokens(str(result.get("context", {}))) + count_tokens(query),
+        }
+        # A turn cut short by the deadline must not become the session's state
+        deadline.check("sessions")
+        session.record(query, outcome["codegen_result"], examples=result.get("examples", []))
+    else:
+        outcome = run_refinement(session, query, deadline)
+        deadline.check("sessions")
+        session.record(query, outcome["codegen_result"])
+    store.put(session)
+    return session, outcome
+
+@app.post("/sessions", response_model=SessionResponse)
+async def refine_in_session(request: SessionRequest, x_deadline_ms: Optional[float] = Header(None)):
+    """Generate a rule in a session; follow-up turns refine the session's current rule"""
+    settings = get_settings()
+    deadline = request_deadline(x_deadline_ms, settings.GENERATE_DEFAULT_DEADLINE_S, settings.GENERATE_MAX_DEADLINE_S)
+    started = time.perf_counter()
+    try:
+        session, outcome = await get_admission_controller().run(
+            deadline, _session_turn, request.session_id, request.query, deadline)
+    except Overloaded as e:
+        record_generation("sessions", request.query, None, time.perf_counter() - started, status="shed")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
+    except DeadlineExceeded as e:
+        record_generation("sessions", request.query, None, time.perf_counter() - started, status="timeout")
+        raise HTTPException(status_code=504, detail=str(e))
+    record_generation("sessions", request.query, outcome, time.perf_counter() - started,
+                      session_id=session.session_id, turn=session.turns, mode=outcome["mode"])
+    return SessionResponse(
+        session_id=session.session_id,
+        result=outcome["codegen_result"],
+        turn=session.turns,
+        mode=outcome["mode"],
+        prompt_tokens=outcome.get("prompt_tokens"),
+        validation=outcome.get("validation"),
+    )
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """Current rule and recent history of a session"""
+    session = get_session_store().get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return session.as_dict()
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Drop a session"""
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return {"deleted": session_id}
+
+@app.post("/evaluate", response_model=EvaluateResponse)
+async def evaluate_claims(request: EvaluateRequest):
+    """Evaluate one or many claims against a rule or a stored rule set"""
+    service = get_evaluation_service()
+    if (request.claim is None) == (request.claims is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'claim' or 'claims'")
+    try:
+        rule_set = service.resolve(request.rule, request.rule_set)
+    except RuleSetNotFound:
+        raise HTTPException(status_code=404, detail=f"Unknown rule set: {request.rule_set}")
+    except ValueError as e:  # syntax/compile errors or neither rule nor rule_set
+        raise HTTPException(status_code=400, detail=str(e))
+    claims = [request.claim] if request.claim is not None else request.claims
+    try:
+        results = await service.evaluate(rule_set, claims)
+    except ClaimEvaluationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return EvaluateResponse(
+        rule_set_hash=rule_set.hash,
+        rules=rule_set.names,
+        results=[{name: [list(a) for a in actions] for name, actions in row.items()} for row in results],
+    )
+
+def _check_admin_token(token: Optional[str]):
+    """Admin routes require X-Admin-Token; without a configured ADMIN_TOKEN they do not exist"""
+    expected = get_settings().ADMIN_TOKEN
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(token or "", expected):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _get_profile(profile_id: str):
+    profile = get_profile_store().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {profile_id}")
+    return profile
+
+@app.get("/admin/profiles")
+async def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Recently captured request profiles, newest first"""
+    _check_admin_token(x_admin_token)
+    return {"profiles": get_profile_store().list()}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Per-node wall/CPU/allocation figures and the hottest functions of a profile"""
+    _check_admin_token(x_admin_token)
+    profile = _get_profile(profile_id)
+    return {**profile.as_dict(), "report": profile.report()}
+
+@app.get("/admin/profiles/{profile_id}/download")
+async def download_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """The profile as a pstats file"""
+    _check_admin_token(x_admin_token)
+    profile = _get_profile(profile_id)
+    return Response(content=profile.pstats_bytes(), media_type="application/octet-stream",
+                    headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'})
+
+@app.get("/admin/history")
+async def get_history(start: Optional[float] = None, end: Optional[float] = None, rule_hash: Optional[str] = None,
+                      limit: int = 100, x_admin_token: Optional[str] = Header(None)):
+    """Audit records of generation requests by time range (epoch seconds) and/or rule hash, newest first"""
+    _check_admin_token(x_admin_token)
+    writer = get_history_writer()
+    if writer is None:
+        raise HTTPException(status_code=404, detail="History is disabled")
+    return {"records": writer.query(start=start, end=end, rule_hash=rule_hash, limit=min(limit, 1000))}
+
+@app.on_event("shutdown")
+def flush_history():
+    """Write out queued history records before exiting"""
+    writer = get_history_writer()
+    if writer is not None:
+        writer.close()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "DSL Code Generator"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Process metrics, including the model cascade escalation rate"""
+    return {**metrics.snapshot(), "cascade": cascade_stats(), "sessions": get_session_store().stats(),
+            "llm_concurrency": get_llm_limiter().stats(), "admission": get_admission_controller().stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
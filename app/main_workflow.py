@@ -2,14 +2,29 @@ import logging
 from typing import Dict, Any, List, Optional, Annotated
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
+try:
+    from langgraph.types import Send
+except ImportError:  # older langgraph releases
+    from langgraph.constants import Send
 
 from app.context.context import Context
-from app.state import WorkflowState
-from app.utils.example_loader import ExampleLoader
+from app.state import WorkflowState, GraphState
+from app.planner import plan_subrules, merge_subrule_results
+from app.utils.example_loader import ExampleLoader, get_example_loader
 from app.utils.prompt_util import load_prompt_from_file
+from app.utils.grammar_index import get_grammar_index
 from agents.langchain.simple_llm_agent import SimpleLLMAgent
+from agents.langchain.generation_profile import get_generation_profile
 from agents.langchain.code_validator_agent import CodeValidatorAgent
-from app.openrouter_client import get_openrouter_api_key
+from app.openrouter_client import get_http_client, get_openrouter_api_key
+from app.cascade import CascadeTier, get_model_cascade
+from app.router import get_router
+from app.rag.index import get_rag_index
+from app.sessions import REFINE_PROMPT, Session, delta_query
+from app.deadline import Deadline, DeadlineExceeded
+from app.profiling import Profile
+from app.utils.token_util import add_usage, count_tokens
+from config.settings import get_settings
 from langchain_openai import ChatOpenAI
 from langchain.agents import AgentType
 
@@ -20,16 +35,44 @@ logger = logging.getLogger("main_workflow")
 # ---- Node 1: Build Context ----
 def build_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
     logger.info("Building context: loading examples and prompt.")
+    settings = get_settings()
+    _check_deadline(state, "build_context")
     try:
-        example_loader = ExampleLoader()
+        example_loader = get_example_loader()
         version = "1.0"  # You can make this dynamic
         core_examples = example_loader.get_core_examples(version)
+
+        # Route before any LLM call: pick tier, example count and budgets
+        route = None
+        if settings.ROUTER_ENABLED:
+            router = get_router(version)
+            route = router.route(state.get("user_query", ""))
+            core_examples = router.select_examples(state.get("user_query", ""), route)
+            logger.info(f"Routed query as '{route.complexity}' -> tier '{route.tier}' with {len(core_examples)} examples.")
         
         # Create context
         context = Context()
         for example in core_examples:
             context.add_local_example(example)  # Pass as dict, not string
 
+        # Retrieve similar historical rules from the persistent RAG index
+        rag_examples = []
+        if settings.RAG_ENABLED:
+            try:
+                rag_examples = get_rag_index(version).search(
+                    state.get("user_query", ""), k=settings.RAG_TOP_K, min_score=settings.RAG_MIN_SCORE
+                )
+            except Exception as e:
+                logger.warning(f"RAG retrieval unavailable: {e}")
+            for example in rag_examples:
+                context.add_rag_example(example)
+
+        # Only the grammar productions the request and its examples need
+        if settings.GRAMMAR_SLICES_ENABLED:
+            grammar_index = get_grammar_index(version)
+            if grammar_index:
+                context.set_docs(grammar_index.slice_for(state.get("user_query", ""), core_examples + rag_examples))
+
         prompt_path = "agents/prompts/default_prompt.txt"
         prompt = load_prompt_from_file(prompt_path)
         if prompt:
@@ -42,9 +85,11 @@ def build_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "user_query": state.get("user_query", ""),
             "context": context.as_dict(),
-            "examples": core_examples,
+            "examples": core_examples + rag_examples,
             "prompt": context.prompt,
-            "codegen_result": state.get("codegen_result")
+            "route": route.as_dict() if route else None,
+            "codegen_result": state.get("codegen_result"),
+            "deadline": state.get("deadline")
         }
     except Exception as e:
         logger.error(f"Error in build_context_node: {e}", exc_info=True)
@@ -53,36 +98,94 @@ def build_context_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "context": {},
             "examples": [],
             "prompt": f"Error: {e}",
-            "codegen_result": state.get("codegen_result")
+            "codegen_result": state.get("codegen_result"),
+            "deadline": state.get("deadline")
         }
 
+def _check_deadline(state: Dict[str, Any], stage: str):
+    deadline = state.get("deadline")
+    if deadline is not None:
+        deadline.check(stage)
+
 # ---- Node 2: Code Generator Agent ----
-def code_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    logger.info("Initializing SimpleLLMAgent for code generation.")
-    try:
-        llm = ChatOpenAI(
-            model="deepseek/deepseek-r1:free",  # Updated to use the correct model
-            temperature=0.7,
-            openai_api_key=get_openrouter_api_key(),
-            openai_api_base="https://openrouter.ai/api/v1"
+def _with_grammar(prompt: str, docs: Optional[str]) -> str:
+    """Append the relevant grammar slice to the system prompt."""
+    if not docs:
+        return prompt
+    return f"{prompt}\n\n## Grammar Reference (relevant productions)\n```antlr\n{docs}\n```"
+
+def _single_model_tier(route: Dict[str, Any]) -> CascadeTier:
+    """Model for generation without the cascade: the routed tier's model, else LLM_MODEL."""
+    settings = get_settings()
+    for config in settings.CASCADE_TIERS:
+        if config["name"] == route.get("tier"):
+            return CascadeTier.from_config(config)
+    return CascadeTier(name=None, model=settings.LLM_MODEL or "deepseek/deepseek-r1:free")
+
+def _generate_rule(query: str, prompt: str, examples: List[Dict[str, Any]], route: Dict[str, Any],
+                   deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """Run one generation (cascade or single model) and return result, tier and validation."""
+    settings = get_settings()
+    if settings.CASCADE_ENABLED:
+        logger.info("Running model cascade for code generation.")
+        cascade = get_model_cascade()
+        start_tier = cascade.tier_index(route["tier"]) if route.get("tier") else 0
+        outcome = cascade.run(
+            query=query,
+            prompt=prompt,
+            context=examples,
+            start_tier=start_tier,
+            max_tokens=route.get("max_output_tokens"),
+            deadline=deadline
         )
-        tools = []  # No tools needed
-        memory = None
-        agent_type = None  # Not used for SimpleLLMAgent
-        verbose = True
+        return {
+            "codegen_result": outcome["codegen_result"],
+            "codegen_tier": outcome["tier"],
+            "codegen_model": outcome["model"],
+            "usage": outcome["usage"],
+            "validation": outcome["validation"]
+        }
 
-        agent = SimpleLLMAgent(llm=llm, tools=tools, memory=memory, agent_type=agent_type, verbose=verbose)
-        logger.info("Calling agent.query with user_query, prompt, and context.")
-        
+    tier = _single_model_tier(route)
+    logger.info(f"Initializing SimpleLLMAgent for code generation with {tier.model}.")
+    llm = ChatOpenAI(
+        model=tier.model,
+        temperature=tier.temperature,
+        openai_api_key=get_openrouter_api_key(),
+        openai_api_base="https://openrouter.ai/api/v1",
+        http_client=get_http_client()
+    )
+    tools = []  # No tools needed
+    memory = None
+    agent_type = None  # Not used for SimpleLLMAgent
+    verbose = True
+
+    agent = SimpleLLMAgent(llm=llm, tools=tools, memory=memory, agent_type=agent_type, verbose=verbose,
+                           generation_profile=get_generation_profile(llm.model_name))
+    logger.info("Calling agent.query with user_query, prompt, and context.")
+    reply = agent.generate(
+        query=query,
+        prompt=prompt,
+        context=examples,  # Pass examples as context
+        max_tokens=route.get("max_output_tokens"),
+        timeout=deadline.remaining() if deadline is not None else None
+    )
+    return {"codegen_result": reply["code"], "codegen_tier": tier.name, "codegen_model": reply["model"],
+            "usage": reply["usage"], "validation": None}
+
+def code_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    try:
         context_data = state.get("context", {})
-        prompt = context_data.get("prompt", "")
-        examples = context_data.get("local_examples", [])
-        
-        result = agent.query(
+        _check_deadline(state, "code_generator")
+        outcome = _generate_rule(
             query=state.get("user_query", ""),
-            prompt=prompt,
-            context=examples  # Pass examples as context
+            prompt=_with_grammar(context_data.get("prompt", ""), context_data.get("docs")),
+            examples=state.get("examples", []),
+            route=state.get("route") or {},
+            deadline=state.get("deadline")
         )
+        # A call cut short by its timeout is a deadline failure, not a result
+        _check_deadline(state, "code_generator")
         logger.info("Code generation successful.")
         
         return {
@@ -90,8 +193,11 @@ def code_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "context": state.get("context", {}),
             "examples": state.get("examples", []),
             "prompt": state.get("prompt", ""),
-            "codegen_result": result
+            "route": state.get("route"),
+            **outcome
         }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error in code_generator_node: {e}", exc_info=True)
         return {
@@ -102,6 +208,61 @@ def code_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "codegen_result": f"Error: {e}"
         }
 
+# ---- Node 3: Planner (compound request decomposition) ----
+def planner_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    settings = get_settings()
+    _check_deadline(state, "planner")
+    query = state.get("user_query", "")
+    subrules = [query]
+    if settings.DECOMPOSITION_ENABLED:
+        subrules = plan_subrules(query, max_subrules=settings.DECOMPOSITION_MAX_SUBRULES)
+    if len(subrules) > 1:
+        logger.info(f"Decomposed request into {len(subrules)} sub-rules.")
+    return {"subrules": subrules}
+
+def route_after_planning(state: Dict[str, Any]):
+    """Single requests go to the generator; compound ones fan out one branch per sub-rule."""
+    subrules = state.get("subrules") or []
+    if len(subrules) <= 1:
+        return "code_generator"
+    return [
+        Send("subrule_generator", {"intent": intent, "index": i, "prompt": state.get("prompt", ""),
+                                   "deadline": state.get("deadline")})
+        for i, intent in enumerate(subrules)
+    ]
+
+def subrule_generator_node(branch: Dict[str, Any]) -> Dict[str, Any]:
+    """Generate one sub-rule; runs concurrently with its sibling branches."""
+    intent = branch["intent"]
+    deadline = branch.get("deadline")
+    try:
+        _check_deadline(branch, "subrule_generator")
+        examples = get_example_loader().get_core_examples("1.0")
+        route = {}
+        if get_settings().ROUTER_ENABLED:
+            router = get_router("1.0")
+            sub_route = router.route(intent)
+            examples = router.select_examples(intent, sub_route)
+            route = sub_route.as_dict()
+        prompt = branch.get("prompt", "")
+        grammar_index = get_grammar_index("1.0") if get_settings().GRAMMAR_SLICES_ENABLED else None
+        if grammar_index:
+            prompt = _with_grammar(prompt, grammar_index.slice_for(intent, examples))
+        outcome = _generate_rule(intent, prompt, examples, route, deadline)
+        _check_deadline(branch, "subrule_generator")
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating sub-rule '{intent}': {e}", exc_info=True)
+        outcome = {"codegen_result": f"Error: {e}", "codegen_tier": None, "validation": None}
+    return {"subrule_results": [{"index": branch["index"], "intent": intent, **outcome}]}
+
+def merge_rules_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    merged = merge_subrule_results(state.get("subrule_results", []))
+    logger.info(f"Merged {merged['valid_rules']}/{len(merged['rule_set'])} valid sub-rules.")
+    return {"codegen_result": merged["codegen_result"], "rule_set": merged["rule_set"],
+            "codegen_model": merged["model"], "usage": merged["usage"]}
+
 # ---- (Future) Node: Validator Agent ----
 # def code_validator_node(state: WorkflowState) -> WorkflowState:
 #     logger.info("Initializing LangChainAgent for code validation.")
@@ -129,19 +290,27 @@ def code_generator_node(state: Dict[str, Any]) -> Dict[str, Any]:
 #     return state
 
 # ---- Workflow Definition ----
-def create_workflow() -> StateGraph:
-    # Create the workflow with dictionary state
-    workflow = StateGraph(dict)
+def create_workflow(profile: Optional[Profile] = None) -> StateGraph:
+    # Typed state so parallel sub-rule branches can append to subrule_results
+    workflow = StateGraph(GraphState)
+    # Profiled runs get instrumented nodes; others run the plain functions
+    node = profile.wrap if profile is not None else (lambda name, fn: fn)
     
     # Add nodes
-    workflow.add_node("build_context", build_context_node)
-    workflow.add_node("code_generator", code_generator_node)
+    workflow.add_node("build_context", node("build_context", build_context_node))
+    workflow.add_node("planner", node("planner", planner_node))
+    workflow.add_node("code_generator", node("code_generator", code_generator_node))
+    workflow.add_node("subrule_generator", node("subrule_generator", subrule_generator_node))
+    workflow.add_node("merge_rules", node("merge_rules", merge_rules_node))
     # workflow.add_node("code_validator", code_validator_node)  # for future
 
     # Define the flow
     workflow.set_entry_point("build_context")
-    workflow.add_edge("build_context", "code_generator")
+    workflow.add_edge("build_context", "planner")
+    workflow.add_conditional_edges("planner", route_after_planning, ["code_generator", "subrule_generator"])
+    workflow.add_edge("subrule_generator", "merge_rules")
     workflow.add_edge("code_generator", END)
+    workflow.add_edge("merge_rules", END)
     # workflow.add_edge("code_validator", END)  # for future
 
     # Compile without checkpointer for now to avoid configuration issues
@@ -149,12 +318,42 @@ def create_workflow() -> StateGraph:
     return app
 
 # ---- Convenience Runner ----
-def run_workflow(user_query: str) -> Dict[str, Any]:
-    app = create_workflow()
-    initial_state = {"user_query": user_query}
+def run_workflow(user_query: str, deadline: Optional[Deadline] = None,
+                 profile: Optional[Profile] = None) -> Dict[str, Any]:
+    """
+    Run the generation graph; with a deadline, raises DeadlineExceeded once it passes.
+    With a profile, per-node timings and a cProfile of the run are recorded into it.
+    """
+    app = create_workflow(profile)
+    initial_state = {"user_query": user_query, "deadline": deadline}
     result = app.invoke(initial_state)
     return result
 
+def run_refinement(session: Session, instruction: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+    """
+    Follow-up turn of a session: send only the current rule and the edit.
+    Falls back to the session's stored few-shot examples when the delta result does not validate.
+    Raises DeadlineExceeded when the deadline passes before a result is produced.
+    """
+    query = delta_query(session.rule_text, instruction)
+    route = get_router("1.0").route(instruction).as_dict() if get_settings().ROUTER_ENABLED else {}
+    outcome = _generate_rule(query, REFINE_PROMPT, [], route, deadline)
+    if deadline is not None:
+        deadline.check("refinement")
+    mode = "delta"
+    validation = outcome.get("validation")
+    if validation is not None and not validation.get("valid") and session.examples:
+        logger.info(f"Delta refinement for session {session.session_id} did not validate; retrying with examples.")
+        usage = outcome.get("usage")
+        outcome = _generate_rule(query, REFINE_PROMPT, session.examples, route, deadline)
+        if deadline is not None:
+            deadline.check("refinement")
+        outcome["usage"] = add_usage(usage, outcome.get("usage"))
+        mode = "delta+examples"
+    outcome["mode"] = mode
+    outcome["prompt_tokens"] = count_tokens(REFINE_PROMPT) + count_tokens(query)
+    return outcome
+
 # ---- Example Usage ----
 if __name__ == "__main__":
     user_query = "Generate a Python function to add two numbers."
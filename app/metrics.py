@@ -0,0 +1,59 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics store.
+    Counters are monotonically increasing floats; timings keep count/sum/min/max
+    per series. Series are identified by name plus optional labels.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            stats = self._timings.get(key)
+            if stats is None:
+                self._timings[key] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                stats["count"] += 1
+                stats["sum"] += value
+                stats["min"] = min(stats["min"], value)
+                stats["max"] = max(stats["max"], value)
+
+    def get(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            timings = {}
+            for key, stats in self._timings.items():
+                timings[key] = dict(stats, avg=stats["sum"] / stats["count"])
+            return {"counters": dict(self._counters), "timings": timings}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+# Process-wide registry used by the workflow and exposed on /metrics.
+metrics = MetricsRegistry()
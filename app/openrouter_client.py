@@ -1,12 +1,36 @@
+from functools import lru_cache
+from typing import Optional
+
+import httpx
 from openai import OpenAI
 from config.settings import get_settings
 from langchain_openai import ChatOpenAI
+from app.cassette import Cassette, CassetteTransport
+from app.ratelimit import RateLimitedTransport, get_llm_limiter
+
+@lru_cache
+def get_http_client() -> Optional[httpx.Client]:
+    """
+    Shared HTTP client for LLM calls: rate limiting under an optional record/replay cassette.
+    None (the OpenAI client's own default) when both are off.
+    """
+    settings = get_settings()
+    transport = httpx.HTTPTransport()
+    if settings.LLM_RATE_LIMIT_ENABLED:
+        transport = RateLimitedTransport(get_llm_limiter(), transport)
+    if settings.LLM_CASSETTE_MODE != "passthrough":
+        transport = CassetteTransport(Cassette(settings.LLM_CASSETTE_PATH), settings.LLM_CASSETTE_MODE,
+                                      settings.LLM_CASSETTE_LATENCY_SCALE, transport)
+    elif not settings.LLM_RATE_LIMIT_ENABLED:
+        return None
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(600.0, connect=5.0))
 
 def get_openrouter_client():
     settings = get_settings()
     return OpenAI(
         base_url="https://openrouter.ai/api/v1",
         api_key=settings.OPENROUTER_API_KEY,
+        http_client=get_http_client(),
     )
 
 def get_openrouter_api_key():
@@ -19,5 +43,6 @@ def get_openrouter_llm(model: str = "deepseek/deepseek-r1:free", temperature: fl
         model=model,
         temperature=temperature,
         openai_api_key=settings.OPENROUTER_API_KEY,
-        openai_api_base="https://openrouter.ai/api/v1"
+        openai_api_base="https://openrouter.ai/api/v1",
+        http_client=get_http_client()
     )
\ No newline at end of file
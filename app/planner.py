@@ -0,0 +1,92 @@
+"""
+Compound-request planning.
+
+plan_subrules splits requests such as "validate amount, coverage, ICD-10 code
+and provider network" into one intent per enumerated item so each sub-rule can
+be generated in its own parallel branch. Only comma-separated lists of short
+noun phrases are split: an "and" inside a condition ("flag claims where amount
+> 5000 and provider is out of network") is a conjunction within one rule, and
+splitting it would change the rule's meaning. merge_subrule_results validates the
+branch outputs and assembles them into a rule set.
+"""
+import re
+from typing import Any, Dict, List
+
+from app.dsl.validator import extract_rule_text, validate_rule
+from app.utils.token_util import add_usage
+
+_LEAD_RE = re.compile(
+    r"^(?P<lead>.*?\b(?:validate|validates|check|checks|verify|verifies|ensure|ensures|flag|detect|enforce)\b)"
+    r"\s+(?P<rest>.+)$",
+    re.IGNORECASE | re.DOTALL,
+)
+# A clause or a comparison means the items share a subject or operator: not an enumeration.
+_CLAUSE_RE = re.compile(
+    r"\b(?:where|that|when|whenever|if|unless|whose|which|who|with|without|is|are|was|were|has|have|had|"
+    r"over|under|above|below|exceeds?|greater|less|more|fewer|than|between|least|most|equals?|not|no)\b"
+    r"|[<>=!]",
+    re.IGNORECASE,
+)
+_SPLIT_RE = re.compile(r"\s*,\s*(?:and\s+)?|\s+and\s+", re.IGNORECASE)
+_ALPHA_RE = re.compile(r"[A-Za-z]{2,}")
+_RULE_NAME_RE = re.compile(r"^(\s*RULE\s+)(\w+)", re.MULTILINE)
+
+
+def plan_subrules(query: str, max_subrules: int = 6, max_part_words: int = 6) -> List[str]:
+    """
+    Split a compound request into independent sub-rule intents.
+    Returns [query] unchanged when the request is not an enumeration of short,
+    independent checks.
+    """
+    text = query.strip().rstrip(".")
+    match = _LEAD_RE.match(text)
+    if not match or "," not in match.group("rest"):
+        return [query]
+    parts = [p.strip() for p in _SPLIT_RE.split(match.group("rest")) if p and p.strip()]
+    if not 2 <= len(parts) <= max_subrules:
+        return [query]
+    if any(len(p.split()) > max_part_words or not _ALPHA_RE.search(p) or _CLAUSE_RE.search(p) for p in parts):
+        return [query]
+    lead = match.group("lead")
+    return [f"{lead} {part}" for part in parts]
+
+
+def merge_subrule_results(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-branch generation results (each with index, intent and
+    codegen_result) into an ordered, validated rule set. Duplicate rule
+    names get a numeric suffix so the set can be loaded as a whole.
+    """
+    rule_set = []
+    seen_names = set()
+    usage = None
+    for result in sorted(results, key=lambda r: r.get("index", 0)):
+        rule_text = extract_rule_text(result.get("codegen_result") or "")
+        validation = validate_rule(rule_text)
+        if validation.valid:
+            name = validation.rule.name
+            suffix = 2
+            unique = name
+            while unique in seen_names:
+                unique = f"{name}_{suffix}"
+                suffix += 1
+            if unique != name:
+                rule_text = _RULE_NAME_RE.sub(lambda m: m.group(1) + unique, rule_text, count=1)
+            seen_names.add(unique)
+        rule_set.append({
+            "intent": result.get("intent", ""),
+            "rule": rule_text,
+            "tier": result.get("codegen_tier"),
+            "model": result.get("codegen_model"),
+            "validation": validation.as_dict(),
+        })
+        usage = add_usage(usage, result.get("usage"))
+    valid_rules = [item["rule"] for item in rule_set if item["validation"]["valid"]]
+    combined = "\n\n".join(valid_rules or [item["rule"] for item in rule_set if item["rule"]])
+    return {
+        "rule_set": rule_set,
+        "codegen_result": combined,
+        "valid_rules": len(valid_rules),
+        "model": ",".join(sorted({item["model"] for item in rule_set if item["model"]})) or None,
+        "usage": usage,
+    }
@@ -0,0 +1,177 @@
+"""
+On-demand profiling of single workflow runs.
+
+A run is profiled when the request carries X-Profile: 1 together with the
+admin token (X-Admin-Token matching ADMIN_TOKEN) or is picked by
+PROFILE_SAMPLE_RATE. For a profiled run, every LangGraph node is wrapped to
+record its wall time, CPU time (of the thread running it), the change in the
+process's allocated memory blocks, and a cProfile of its call. The block count
+is process-wide: under concurrent requests it includes their allocations too,
+so it is only indicative of a node's own memory use on an otherwise idle
+process. Nodes run on worker threads, so each call gets its own profiler;
+they are merged into one pstats profile when the run finishes. Unprofiled
+runs are not wrapped at all.
+
+Finished profiles are kept in a bounded ring buffer and served by the
+/admin/profiles endpoints; the download is a standard pstats file
+(python -m pstats, snakeviz, ...).
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from functools import lru_cache, wraps
+from typing import Any, Callable, Dict, List, Optional
+
+from config.settings import get_settings
+
+TOP_FUNCTIONS = 25
+
+
+class NodeTiming:
+    """Accumulated cost of one graph node within a run."""
+    __slots__ = ("calls", "wall", "cpu", "process_blocks")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.process_blocks = 0  # change in sys.getallocatedblocks(), all threads included
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "wall_seconds": round(self.wall, 6), "cpu_seconds": round(self.cpu, 6),
+                "process_allocated_blocks_delta": self.process_blocks}
+
+
+class Profile:
+    """Profile of one workflow run."""
+
+    def __init__(self, label: str = "", trigger: str = "header"):
+        self.profile_id = uuid.uuid4().hex[:16]
+        self.label = label
+        self.trigger = trigger
+        self.created = time.time()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.nodes: Dict[str, NodeTiming] = OrderedDict()
+        self.stats: Optional[pstats.Stats] = None
+        self._started = time.perf_counter()
+        self._profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def wrap(self, name: str, fn: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+        """Instrumented version of a graph node."""
+        @wraps(fn)
+        def node(state):
+            profiler = cProfile.Profile()
+            blocks = sys.getallocatedblocks()
+            cpu = time.thread_time()
+            wall = time.perf_counter()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is active on this thread
+                profiler = None
+            try:
+                return fn(state)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                wall = time.perf_counter() - wall
+                cpu = time.thread_time() - cpu
+                blocks = sys.getallocatedblocks() - blocks
+                with self._lock:
+                    timing = self.nodes.setdefault(name, NodeTiming())
+                    timing.calls += 1
+                    timing.wall += wall
+                    timing.cpu += cpu
+                    timing.process_blocks += blocks
+                    if profiler is not None:
+                        self._profilers.append(profiler)
+        return node
+
+    def finish(self, error: Optional[BaseException] = None) -> "Profile":
+        self.duration = time.perf_counter() - self._started
+        self.error = repr(error) if error is not None else None
+        with self._lock:
+            profilers, self._profilers = self._profilers, []
+        for profiler in profilers:
+            profiler.create_stats()
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+        return self
+
+    def top_functions(self, limit: int = TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+        if self.stats is None:
+            return []
+        rows = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in self.stats.stats.items():
+            rows.append({"function": f"{filename}:{line}({function})", "calls": calls,
+                         "total_seconds": round(total, 6), "cumulative_seconds": round(cumulative, 6)})
+        rows.sort(key=lambda r: r["cumulative_seconds"], reverse=True)
+        return rows[:limit]
+
+    def report(self, limit: int = TOP_FUNCTIONS) -> str:
+        """pstats text report sorted by cumulative time."""
+        if self.stats is None:
+            return ""
+        out = io.StringIO()
+        self.stats.stream = out
+        self.stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+    def pstats_bytes(self) -> bytes:
+        """The merged profile in pstats' dump_stats format."""
+        return marshal.dumps(self.stats.stats if self.stats is not None else {})
+
+    def summary(self) -> Dict[str, Any]:
+        return {"profile_id": self.profile_id, "label": self.label, "trigger": self.trigger,
+                "created": self.created, "duration_seconds": self.duration, "error": self.error}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**self.summary(), "nodes": {name: t.as_dict() for name, t in self.nodes.items()},
+                "top_functions": self.top_functions()}
+
+
+class ProfileStore:
+    """Ring buffer of the most recent profiles."""
+
+    def __init__(self, capacity: int = 50):
+        self._profiles: "deque[Profile]" = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [p.summary() for p in reversed(self._profiles)]
+
+    def get(self, profile_id: str) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._profiles if p.profile_id == profile_id), None)
+
+
+def start_profile(header: Optional[str], label: str = "", admin_token: Optional[str] = None) -> Optional[Profile]:
+    """A Profile when an admin asked for one (X-Profile plus the admin token) or the run was sampled, else None."""
+    settings = get_settings()
+    if header and settings.PROFILE_HEADER_ENABLED and header.strip().lower() in ("1", "true", "yes") \
+            and settings.ADMIN_TOKEN and secrets.compare_digest(admin_token or "", settings.ADMIN_TOKEN):
+        return Profile(label, "header")
+    if settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE:
+        return Profile(label, "sample")
+    return None
+
+
+@lru_cache
+def get_profile_store() -> ProfileStore:
+    return ProfileStore(get_settings().PROFILE_BUFFER_SIZE)
@@ -0,0 +1,40 @@
+import re
+import zlib
+from typing import List
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9_]+")
+
+
+class HashingEmbedder:
+    """
+    Local, dependency-free text embedding.
+    Words, word bigrams and character trigrams are hashed (crc32, stable
+    across processes) into a fixed number of signed buckets and the vector is
+    L2-normalized, so inner product equals cosine similarity.
+    """
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD_RE.findall(text.lower())
+        features = list(words)
+        features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
@@ -0,0 +1,264 @@
+"""
+Persistent vector index over the RAG example corpus.
+
+Vectors live in a FAISS index wrapped in an IndexIDMap2 so items can be added
+and removed by id without rebuilding; example payloads live next to it in a
+SQLite table keyed by the same id and by a content hash. Small corpora use an
+exact flat index; once the corpus reaches ivf_threshold items it is converted
+once to an IVF index (searching nprobe of ~sqrt(n) lists), which keeps query
+time in the low milliseconds at 100k+ items. The index file is opened
+memory-mapped when the FAISS build supports it.
+
+Every add/delete is persisted as one step: SQLite and a generation counter
+are changed in a transaction, the FAISS index for the next generation is
+written to its own file (temp file + rename), and only then is the
+transaction committed and the old generation's file removed. On open, the
+FAISS file for the committed generation is loaded; if it is missing (a crash
+before the commit leaves the previous one in place, so this only happens
+with an index from before generations were recorded), it is rebuilt from the
+SQLite payloads.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.rag.embeddings import HashingEmbedder
+from app.utils.example_loader import get_example_loader
+from config.settings import get_settings
+
+logger = logging.getLogger("rag_index")
+
+INDEX_FILE = "vectors.{generation}.faiss"
+META_FILE = "meta.sqlite"
+
+
+def example_text(example: Dict[str, Any]) -> str:
+    """Text that is embedded for an example: its prompt and description."""
+    return f"{example.get('prompt', '')} {example.get('description', '')}".strip()
+
+
+def content_hash(example: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(example, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class RagIndex:
+    def __init__(self, index_dir: str, embedder: Optional[HashingEmbedder] = None, mmap: bool = True,
+                 ivf_threshold: int = 20000, nprobe: int = 16):
+        import faiss
+        self._faiss = faiss
+        self.index_dir = index_dir
+        self.embedder = embedder or HashingEmbedder()
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        os.makedirs(index_dir, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(index_dir, META_FILE), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " content_hash TEXT UNIQUE NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO state (key, value) VALUES ('generation', 0)")
+        self._db.commit()
+        self.generation = self._db.execute("SELECT value FROM state WHERE key = 'generation'").fetchone()[0]
+        self._mapped = False
+        self.index = self._load_index(mmap)
+        self._set_nprobe()
+        self._remove_stale_files()
+
+    def _index_path(self, generation: int) -> str:
+        return os.path.join(self.index_dir, INDEX_FILE.format(generation=generation))
+
+    def _remove_stale_files(self):
+        """Index files of other generations: left behind by a crash before or after a commit."""
+        current = os.path.basename(self._index_path(self.generation))
+        for name in os.listdir(self.index_dir):
+            if name.startswith("vectors.") and ".faiss" in name and name != current:
+                os.remove(os.path.join(self.index_dir, name))
+
+    def _load_index(self, mmap: bool):
+        faiss = self._faiss
+        path = self._index_path(self.generation)
+        if not os.path.exists(path):
+            return self._rebuild()
+        if mmap:
+            try:
+                index = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                self._mapped = True
+                return index
+            except RuntimeError:
+                logger.info("Memory-mapped load not supported for this index; reading into memory.")
+        return faiss.read_index(path)
+
+    def _rebuild(self, batch_size: int = 1000):
+        """Re-embed every stored example into a fresh index and persist it for the current generation."""
+        faiss = self._faiss
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.embedder.dim))
+        rows = self._db.execute("SELECT id, payload FROM items ORDER BY id").fetchall()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            vectors = self.embedder.embed([example_text(json.loads(payload)) for _, payload in batch])
+            self.index.add_with_ids(vectors, np.asarray([i for i, _ in batch], dtype=np.int64))
+        self._maybe_convert_to_ivf()
+        self._write_index(self.generation)
+        if rows:
+            logger.info(f"Rebuilt RAG index in {self.index_dir} from {len(rows)} stored items.")
+        return self.index
+
+    def _write_index(self, generation: int):
+        path = self._index_path(generation)
+        tmp_path = path + ".tmp"
+        self._faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _commit(self):
+        """Persist the pending SQLite changes and the in-memory FAISS index as the next generation."""
+        generation = self.generation + 1
+        try:
+            self._db.execute("UPDATE state SET value = ? WHERE key = 'generation'", (generation,))
+            self._write_index(generation)
+        except BaseException:
+            # Drop both halves of the change: the in-memory index goes back to the committed file.
+            self._db.rollback()
+            self.index = self._faiss.read_index(self._index_path(self.generation))
+            self._mapped = False
+            self._set_nprobe()
+            raise
+        self._db.commit()
+        previous, self.generation = self._index_path(self.generation), generation
+        if os.path.exists(previous):
+            os.remove(previous)
+
+    def _writable(self):
+        # A memory-mapped index is read-only; load it into memory before the first mutation.
+        if self._mapped:
+            self.index = self._faiss.read_index(self._index_path(self.generation))
+            self._mapped = False
+        return self.index
+
+    def _set_nprobe(self):
+        try:
+            self._faiss.extract_index_ivf(self.index).nprobe = self.nprobe
+        except RuntimeError:
+            pass  # flat index
+
+    def _maybe_convert_to_ivf(self):
+        """Switch from the exact flat index to IVF once the corpus is large enough."""
+        faiss = self._faiss
+        inner = faiss.downcast_index(self.index.index)
+        if not isinstance(inner, faiss.IndexFlat) or self.index.ntotal < self.ivf_threshold:
+            return
+        dim = self.embedder.dim
+        vectors = faiss.vector_to_array(inner.codes).view(np.float32).reshape(-1, dim)
+        ids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+        nlist = int(np.sqrt(len(ids)))
+        sample = vectors[np.random.default_rng(0).permutation(len(ids))[:nlist * 40]]
+        ivf = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        ivf.train(sample)
+        index = faiss.IndexIDMap2(ivf)
+        index.add_with_ids(vectors, ids)
+        self.index = index
+        self._set_nprobe()
+        logger.info(f"Converted RAG index to IVF with {nlist} lists ({len(ids)} items).")
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def add(self, examples: Iterable[Dict[str, Any]]) -> int:
+        """Add examples that are not yet indexed and persist the change. Returns the number added."""
+        with self._lock:
+            new_ids, texts = [], []
+            for example in examples:
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO items (content_hash, payload) VALUES (?, ?)",
+                    (content_hash(example), json.dumps(example, default=str)),
+                )
+                if cursor.rowcount:
+                    new_ids.append(cursor.lastrowid)
+                    texts.append(example_text(example))
+            if new_ids:
+                vectors = self.embedder.embed(texts)
+                self._writable().add_with_ids(vectors, np.asarray(new_ids, dtype=np.int64))
+                self._maybe_convert_to_ivf()
+                self._commit()
+            else:
+                self._db.commit()
+            return len(new_ids)
+
+    def delete(self, hashes: Iterable[str], batch_size: int = 500) -> int:
+        """Remove examples by content hash and persist the change. Returns the number removed."""
+        with self._lock:
+            hashes = list(hashes)
+            ids = []
+            for start in range(0, len(hashes), batch_size):
+                batch = hashes[start:start + batch_size]
+                placeholders = ",".join("?" * len(batch))
+                ids.extend(row[0] for row in self._db.execute(
+                    f"SELECT id FROM items WHERE content_hash IN ({placeholders})", batch))
+                self._db.execute(f"DELETE FROM items WHERE content_hash IN ({placeholders})", batch)
+            if ids:
+                self._writable().remove_ids(np.asarray(ids, dtype=np.int64))
+                self._commit()
+            else:
+                self._db.commit()
+            return len(ids)
+
+    def sync(self, examples: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Bring the index in line with an example list, touching only changed items."""
+        wanted = {content_hash(e): e for e in examples}
+        with self._lock:
+            existing = {row[0] for row in self._db.execute("SELECT content_hash FROM items")}
+        removed = self.delete(existing - wanted.keys())
+        added = self.add(e for h, e in wanted.items() if h not in existing)
+        return {"added": added, "removed": removed}
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.0) -> List[Dict[str, Any]]:
+        """Return up to k examples most similar to the query, each with a 'score' key."""
+        if k <= 0:
+            return []
+        vector = self.embedder.embed([query])
+        # FAISS indexes are not safe to search while add/remove_ids (or the IVF switch) runs.
+        with self._lock:
+            if self.index.ntotal == 0:
+                return []
+            scores, ids = self.index.search(vector, k)
+            hits = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1 and s >= min_score]
+            if not hits:
+                return []
+            placeholders = ",".join("?" * len(hits))
+            payloads = dict(self._db.execute(
+                f"SELECT id, payload FROM items WHERE id IN ({placeholders})", [i for i, _ in hits]))
+        results = []
+        for item_id, score in hits:
+            if item_id in payloads:
+                results.append(dict(json.loads(payloads[item_id]), score=score))
+        return results
+
+    def close(self):
+        self._db.close()
+
+
+@lru_cache
+def get_rag_index(version: str = "1.0") -> RagIndex:
+    """Open the persistent index for a version and sync it with examples/rag_examples."""
+    settings = get_settings()
+    index = RagIndex(
+        os.path.join(settings.RAG_INDEX_DIR, version),
+        embedder=HashingEmbedder(settings.RAG_EMBEDDING_DIM),
+        ivf_threshold=settings.RAG_IVF_THRESHOLD,
+        nprobe=settings.RAG_NPROBE,
+    )
+    changes = index.sync(get_example_loader().get_rag_examples(version))
+    if changes["added"] or changes["removed"]:
+        logger.info(f"RAG index {version}: +{changes['added']} -{changes['removed']} ({len(index)} items).")
+    return index
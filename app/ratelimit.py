@@ -0,0 +1,272 @@
+"""
+Client-side flow control for LLM provider calls.
+
+Every LLM request passes through one process-wide LLMRateLimiter:
+  - two token buckets cap requests per minute and tokens per minute. A
+    request's tokens are estimated from its prompt and max_tokens up front
+    and corrected from the response's usage;
+  - an AIMD controller caps the number of requests in flight. The cap grows
+    by about one per round of successful requests and halves on a 429 or 5xx
+    (once per round: failures of requests sent before the last decrease are
+    ignored). While a Retry-After is pending, no new request is sent.
+Time spent waiting for a bucket or a slot is observed as llm_queue_wait_seconds.
+A caller that passes a timeout gets RateLimitTimeout instead of waiting longer.
+
+RateLimiter is the plain requests-per-minute pacing used by the batch and
+evaluation runners, which start whole generations rather than single calls.
+
+RateLimitedTransport applies the limiter to an httpx transport, bounding the
+wait by the request's pool timeout (raised as httpx.PoolTimeout). It does not
+retry by itself; the OpenAI client's retries go back through the limiter.
+"""
+import json
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.metrics import metrics
+from app.utils.token_util import count_tokens
+
+logger = logging.getLogger("ratelimit")
+
+
+class RateLimitTimeout(TimeoutError):
+    """The wait for a bucket or a concurrency slot would exceed the caller's timeout."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate_per_minute up to capacity. reserve() may
+    drive the level negative: callers are served in order, each sleeping
+    until its own tokens have been refilled.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take amount tokens (at most capacity); return the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._level -= min(amount, self.capacity)
+            return -self._level / self.rate if self._level < 0 else 0.0
+
+    def adjust(self, amount: float):
+        """Return (positive) or take (negative) tokens after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+
+class RateLimiter:
+    """Spaces calls at least 60/rpm seconds apart across threads (no limit when rpm <= 0)."""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class AIMDController:
+    """Concurrency cap with additive increase and multiplicative decrease."""
+
+    def __init__(self, initial: float = 2, minimum: float = 1, maximum: float = 16,
+                 decrease: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.limit = min(maximum, max(minimum, initial))
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._decreased = float("-inf")
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Take a slot; return the time it was granted (pass it to on_overload), or None on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now >= self.blocked_until and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return now
+                wait = self.blocked_until - now if now < self.blocked_until else None
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    wait = min(wait, deadline - now) if wait is not None else deadline - now
+                self._cond.wait(wait)
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def on_success(self):
+        with self._cond:
+            previous = int(self.limit)
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            if int(self.limit) > previous:
+                self._cond.notify()
+
+    def on_overload(self, sent: float, retry_after: Optional[float] = None):
+        with self._cond:
+            now = time.monotonic()
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            # Responses to requests sent before the last decrease say nothing new.
+            if sent >= self._decreased:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._decreased = now
+                logger.info(f"LLM provider overloaded; concurrency limit now {self.limit:.1f}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight,
+                    "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 3)}
+
+
+class LLMRateLimiter:
+    """Request and token buckets plus AIMD concurrency for one provider."""
+
+    def __init__(self, rpm: float = 20, tpm: float = 0, max_concurrency: int = 8,
+                 initial_concurrency: int = 2, burst_seconds: float = 10.0):
+        self.requests = TokenBucket(rpm, max(1.0, rpm * burst_seconds / 60)) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, max(1.0, tpm * burst_seconds / 60)) if tpm > 0 else None
+        self.concurrency = AIMDController(initial_concurrency, 1, max_concurrency)
+
+    def acquire(self, tokens: int = 0, timeout: Optional[float] = None) -> float:
+        """
+        Block until the request may be sent; pass the returned send time to release().
+        Raises RateLimitTimeout (handing the reserved tokens back) if that takes longer than timeout.
+        """
+        started = time.perf_counter()
+        wait = self.requests.reserve(1) if self.requests else 0.0
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        if timeout is not None and wait > timeout:
+            self._give_back(tokens)
+            raise RateLimitTimeout(f"Rate limit wait of {wait:.1f}s exceeds the {timeout:.1f}s timeout")
+        if wait > 0:
+            time.sleep(wait)
+        remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - started))
+        sent = self.concurrency.acquire(remaining)
+        metrics.observe("llm_queue_wait_seconds", time.perf_counter() - started)
+        if sent is None:
+            self._give_back(tokens)
+            raise RateLimitTimeout(f"No LLM concurrency slot within the {timeout:.1f}s timeout")
+        return sent
+
+    def _give_back(self, tokens: int):
+        metrics.inc("llm_queue_timeouts_total")
+        if self.requests:
+            self.requests.adjust(1)
+        if self.tokens and tokens:
+            self.tokens.adjust(tokens)
+
+    def release(self, sent: float, status: Optional[int] = None, retry_after: Optional[float] = None):
+        self.concurrency.release()
+        if status is None:
+            return
+        if status == 429 or status >= 500:
+            metrics.inc("llm_overload_responses_total", status=status)
+            self.concurrency.on_overload(sent, retry_after)
+        elif status < 400:
+            self.concurrency.on_success()
+
+    def correct_tokens(self, estimated: int, actual: int):
+        if self.tokens and actual:
+            self.tokens.adjust(estimated - actual)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.concurrency.stats()
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_request_tokens(body: bytes) -> int:
+    """Prompt tokens plus the requested output cap of a chat completion body."""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return 0
+    prompt = "".join(str(m.get("content") or "") for m in payload.get("messages") or ())
+    return count_tokens(prompt) + int(payload.get("max_tokens") or payload.get("max_completion_tokens") or 0)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that sends requests through an LLMRateLimiter."""
+
+    def __init__(self, limiter: LLMRateLimiter, transport: Optional[httpx.BaseTransport] = None):
+        self.limiter = limiter
+        self._transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        estimated = estimate_request_tokens(request.read())
+        timeout = (request.extensions.get("timeout") or {}).get("pool")
+        try:
+            sent = self.limiter.acquire(estimated, timeout)
+        except RateLimitTimeout as e:
+            raise httpx.PoolTimeout(str(e), request=request) from e
+        status = retry_after = None
+        try:
+            response = self._transport.handle_request(request)
+            status = response.status_code
+            retry_after = retry_after_seconds(response.headers.get("retry-after"))
+        finally:
+            self.limiter.release(sent, status, retry_after)
+        if status < 400 and self.limiter.tokens and response.headers.get("content-type", "").startswith("application/json"):
+            body = response.read()
+            try:
+                usage = json.loads(body).get("usage") or {}
+                self.limiter.correct_tokens(estimated, int(usage.get("total_tokens") or 0))
+            except (ValueError, AttributeError):
+                pass
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+@lru_cache
+def get_llm_limiter() -> LLMRateLimiter:
+    from config.settings import get_settings  # keeps RateLimiter importable by the CLI runners
+    settings = get_settings()
+    return LLMRateLimiter(settings.LLM_RPM, settings.LLM_TPM, settings.LLM_MAX_CONCURRENCY,
+                          settings.LLM_INITIAL_CONCURRENCY, settings.LLM_BURST_SECONDS)
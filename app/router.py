@@ -0,0 +1,157 @@
+"""
+Upfront query-complexity router.
+
+A multinomial Naive Bayes classifier over word and bigram features is trained
+from the `complexity` labels of the core examples when the router is built.
+Routing a query is a few dictionary lookups, so it runs before any LLM call and
+picks the model tier, how many examples to include, the example token budget
+and the max output tokens for the request.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from app.utils.example_loader import get_example_loader
+from app.utils.token_util import count_tokens
+from config.settings import get_settings
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = {"a", "an", "the", "to", "for", "of", "dsl", "rule", "create", "generate", "that", "is", "if"}
+
+
+def featurize(text: str) -> Counter:
+    """Bag of lowercased words and adjacent-word bigrams."""
+    words = [w for w in _WORD_RE.findall(text.lower()) if w not in _STOP_WORDS]
+    features = Counter(words)
+    features.update(f"{a}_{b}" for a, b in zip(words, words[1:]))
+    return features
+
+
+def _cosine(a: Counter, b: Counter, norm_b: float) -> float:
+    if not a or not norm_b:
+        return 0.0
+    dot = sum(v * b.get(k, 0) for k, v in a.items())
+    norm_a = math.sqrt(sum(v * v for v in a.values()))
+    return dot / (norm_a * norm_b)
+
+
+class Route:
+    """Routing decision for a single query."""
+    def __init__(self, complexity: str, tier: str, max_examples: int,
+                 example_token_budget: int, max_output_tokens: int, confidence: float):
+        self.complexity = complexity
+        self.tier = tier
+        self.max_examples = max_examples
+        self.example_token_budget = example_token_budget
+        self.max_output_tokens = max_output_tokens
+        self.confidence = confidence
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "complexity": self.complexity,
+            "tier": self.tier,
+            "max_examples": self.max_examples,
+            "example_token_budget": self.example_token_budget,
+            "max_output_tokens": self.max_output_tokens,
+            "confidence": self.confidence,
+        }
+
+
+class ComplexityRouter:
+    def __init__(self, examples: List[Dict[str, Any]], profiles: Dict[str, Dict[str, Any]],
+                 default_complexity: str = "advanced", alpha: float = 1.0):
+        self.examples = examples
+        self.profiles = profiles
+        self.default_complexity = default_complexity
+        self.alpha = alpha
+        self._example_features = []
+        self._example_norms = []
+        self._example_tokens = []
+        self._train()
+
+    def _train(self):
+        class_counts = Counter()
+        feature_counts = defaultdict(Counter)
+        vocabulary = set()
+        for example in self.examples:
+            text = f"{example.get('prompt', '')} {example.get('description', '')}"
+            features = featurize(text)
+            self._example_features.append(features)
+            self._example_norms.append(math.sqrt(sum(v * v for v in features.values())))
+            self._example_tokens.append(count_tokens(example.get("dsl_pattern", "")) + count_tokens(example.get("prompt", "")))
+            label = str(example.get("complexity", "")).strip()
+            if not label:
+                continue
+            class_counts[label] += 1
+            feature_counts[label].update(features)
+            vocabulary.update(features)
+
+        total = sum(class_counts.values())
+        vocab_size = len(vocabulary) or 1
+        self._log_priors = {c: math.log(n / total) for c, n in class_counts.items()}
+        self._log_likelihoods = {}
+        self._log_unseen = {}
+        for label, counts in feature_counts.items():
+            denominator = sum(counts.values()) + self.alpha * vocab_size
+            self._log_likelihoods[label] = {f: math.log((n + self.alpha) / denominator) for f, n in counts.items()}
+            self._log_unseen[label] = math.log(self.alpha / denominator)
+        self._vocabulary = vocabulary
+
+    def classify(self, query: str):
+        """Return (complexity_label, posterior probability) for a query."""
+        if not self._log_priors:
+            return self.default_complexity, 0.0
+        features = featurize(query)
+        scores = {}
+        for label, prior in self._log_priors.items():
+            likelihoods = self._log_likelihoods[label]
+            unseen = self._log_unseen[label]
+            score = prior
+            for feature, count in features.items():
+                if feature in self._vocabulary:
+                    score += count * likelihoods.get(feature, unseen)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        peak = scores[best]
+        normalizer = sum(math.exp(s - peak) for s in scores.values())
+        return best, 1.0 / normalizer
+
+    def route(self, query: str) -> Route:
+        complexity, confidence = self.classify(query)
+        profile = self.profiles.get(complexity) or self.profiles[self.default_complexity]
+        return Route(
+            complexity=complexity,
+            tier=profile["tier"],
+            max_examples=profile["max_examples"],
+            example_token_budget=profile["example_token_budget"],
+            max_output_tokens=profile["max_output_tokens"],
+            confidence=confidence,
+        )
+
+    def select_examples(self, query: str, route: Route) -> List[Dict[str, Any]]:
+        """Pick the examples most similar to the query within the route's count and token budget."""
+        features = featurize(query)
+        ranked = sorted(
+            range(len(self.examples)),
+            key=lambda i: _cosine(features, self._example_features[i], self._example_norms[i]),
+            reverse=True,
+        )
+        selected = []
+        used_tokens = 0
+        for i in ranked:
+            if len(selected) >= route.max_examples:
+                break
+            if selected and used_tokens + self._example_tokens[i] > route.example_token_budget:
+                continue
+            selected.append(self.examples[i])
+            used_tokens += self._example_tokens[i]
+        return selected
+
+
+@lru_cache
+def get_router(version: str = "1.0") -> ComplexityRouter:
+    settings = get_settings()
+    examples = get_example_loader().get_core_examples(version)
+    return ComplexityRouter(examples, settings.ROUTER_PROFILES)
@@ -0,0 +1,155 @@
+"""
+Per-session state for iterative rule refinement.
+
+A session remembers the last generated rule (text and parsed AST), the
+examples selected for its first turn and a token-windowed memory of the
+conversation. Sessions live in an in-process LRU store capped both by count
+and by an estimate of their size in bytes; the least recently used sessions
+are evicted first.
+
+Follow-up turns build a delta prompt holding only the current rule and the
+edit instruction, so a refinement costs a fraction of a first-turn
+generation. The stored examples are only re-sent if the delta result fails
+validation.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from app.dsl.nodes import Rule
+from app.dsl.validator import extract_rule_text, generation_error
+from app.dsl.parser import DSLSyntaxError, parse_rule
+from app.metrics import metrics
+from config.settings import get_settings
+from memory.custom.windowed_memory import WindowedMemory
+
+REFINE_PROMPT = (
+    "You edit MedicalClaimsDSL rules. Apply the requested change to the current rule and return "
+    "the complete updated rule. Keep the rule name, field names and syntax of the current rule "
+    "unless the change requires otherwise."
+)
+
+
+def delta_query(rule_text: str, instruction: str) -> str:
+    """The user request of a refinement turn: current rule plus the edit."""
+    return f"## Current Rule\n```dsl\n{rule_text}\n```\n\n## Requested Change\n{instruction}"
+
+
+class Session:
+    """State of one refinement conversation."""
+    __slots__ = ("session_id", "rule_text", "rule", "examples", "memory", "turns", "created", "updated", "size")
+
+    def __init__(self, session_id: str, memory_tokens: int = 1000):
+        self.session_id = session_id
+        self.rule_text = ""
+        self.rule: Optional[Rule] = None
+        self.examples: List[Dict[str, Any]] = []
+        self.memory = WindowedMemory(max_tokens=memory_tokens)
+        self.turns = 0
+        self.created = self.updated = time.time()
+        self.size = 0
+
+    def record(self, instruction: str, rule_text: str, examples: Optional[List[Dict[str, Any]]] = None):
+        """
+        Store the outcome of a turn. A failed generation is kept in the history only:
+        the current rule stays as it was, so the next turn does not refine an error message.
+        """
+        if generation_error(rule_text) is None:
+            self.rule_text = rule_text
+            try:
+                self.rule = parse_rule(extract_rule_text(rule_text))
+            except DSLSyntaxError:
+                self.rule = None
+        if examples is not None:
+            self.examples = examples
+        self.memory.save(instruction, role="user")
+        self.memory.save(rule_text, role="assistant")
+        self.turns += 1
+        self.updated = time.time()
+        self.size = self._estimate_size()
+
+    def _estimate_size(self) -> int:
+        examples = sum(len(json.dumps(e, default=str)) for e in self.examples)
+        turns = sum(len(t.content) for t in self.memory.turns)
+        # The AST is roughly proportional to the rule text; count it twice over.
+        return 512 + 3 * len(self.rule_text) + examples + turns
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "rule": self.rule_text,
+            "valid": self.rule is not None,
+            "turns": self.turns,
+            "examples": len(self.examples),
+            "history": self.memory.load(),
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class SessionStore:
+    """LRU session store capped by session count and estimated total bytes."""
+
+    def __init__(self, max_sessions: int = 1000, max_bytes: int = 64 * 1024 * 1024, memory_tokens: int = 1000):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.memory_tokens = memory_tokens
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # Size each session was counted with; a session is mutated in place between puts.
+        self._accounted: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def get(self, session_id: Optional[str]) -> Optional[Session]:
+        if not session_id:
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def create(self) -> Session:
+        return Session(uuid.uuid4().hex, self.memory_tokens)
+
+    def put(self, session: Session):
+        """Insert or re-account a session after a turn, evicting least recently used ones."""
+        with self._lock:
+            self._sessions.pop(session.session_id, None)
+            self._bytes -= self._accounted.pop(session.session_id, 0)
+            self._sessions[session.session_id] = session
+            self._accounted[session.session_id] = session.size
+            self._bytes += session.size
+            # The session just written is never evicted, even if it alone exceeds the cap.
+            while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                evicted_id, _ = self._sessions.popitem(last=False)
+                self._bytes -= self._accounted.pop(evicted_id)
+                metrics.inc("session_evictions_total")
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if self._sessions.pop(session_id, None) is None:
+                return False
+            self._bytes -= self._accounted.pop(session_id)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self._sessions), "bytes": self._bytes,
+                "max_sessions": self.max_sessions, "max_bytes": self.max_bytes}
+
+
+@lru_cache
+def get_session_store() -> SessionStore:
+    settings = get_settings()
+    return SessionStore(settings.SESSION_MAX_SESSIONS, settings.SESSION_MAX_BYTES, settings.SESSION_MEMORY_TOKENS)
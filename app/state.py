@@ -1,5 +1,31 @@
-from typing import Dict, Any, List, Optional
+import operator
+from typing import Dict, Any, List, Optional, Annotated, TypedDict
 from app.context.context import Context
+from app.deadline import Deadline
+
+
+class GraphState(TypedDict, total=False):
+    """
+    LangGraph state schema for the generation workflow.
+    subrule_results uses an additive reducer so parallel sub-rule branches
+    can each append their result within the same step.
+    deadline, when set, bounds every node and LLM call of the run.
+    """
+    user_query: str
+    context: Dict[str, Any]
+    examples: List[Dict[str, Any]]
+    prompt: str
+    route: Optional[Dict[str, Any]]
+    codegen_result: Optional[str]
+    codegen_tier: Optional[str]
+    codegen_model: Optional[str]
+    usage: Optional[Dict[str, int]]
+    validation: Optional[Dict[str, Any]]
+    subrules: List[str]
+    subrule_results: Annotated[List[Dict[str, Any]], operator.add]
+    rule_set: List[Dict[str, Any]]
+    deadline: Optional[Deadline]
+
 
 class WorkflowState:
     def __init__(
@@ -2,6 +2,7 @@ import os
 import re
 import yaml
 import json
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 from app.context.context import Context
 
@@ -55,9 +56,9 @@ class ExampleLoader:
         """Return all core examples for a given version."""
         return self._cache.get((version, 'core'), [])
 
-    # def get_rag_examples(self, version: str) -> List[Dict[str, Any]]:
-    #     """Return all RAG examples for a given version."""
-    #     return self._cache.get((version, 'rag'), [])
+    def get_rag_examples(self, version: str) -> List[Dict[str, Any]]:
+        """Return all RAG examples for a given version."""
+        return self._cache.get((version, 'rag'), [])
 
     def search_core_examples(self, version: str, keyword: str) -> List[Dict[str, Any]]:
         """Return core examples for a version where the prompt contains the keyword."""
@@ -65,16 +66,22 @@ class ExampleLoader:
         keyword_lower = keyword.lower()
         return [ex for ex in examples if keyword_lower in ex.get('prompt', '').lower()]
 
-    # def search_rag_examples(self, version: str, keyword: str) -> List[Dict[str, Any]]:
-    #     """Return RAG examples for a version where the prompt contains the keyword."""
-    #     examples = self.get_rag_examples(version)
-    #     keyword_lower = keyword.lower()
-    #     return [ex for ex in examples if keyword_lower in ex.get('prompt', '').lower()]
+    def search_rag_examples(self, version: str, keyword: str) -> List[Dict[str, Any]]:
+        """Return RAG examples for a version where the prompt contains the keyword."""
+        examples = self.get_rag_examples(version)
+        keyword_lower = keyword.lower()
+        return [ex for ex in examples if keyword_lower in ex.get('prompt', '').lower()]
 
     def get_all_core_versions(self) -> List[str]:
         """Return a list of all available core example versions."""
         return [ver for (ver, typ) in self._cache.keys() if typ == 'core']
 
-    # def get_all_rag_versions(self) -> List[str]:
-    #     """Return a list of all available RAG example versions."""
-    #     return [ver for (ver, typ) in self._cache.keys() if typ == 'rag'] 
\ No newline at end of file
+    def get_all_rag_versions(self) -> List[str]:
+        """Return a list of all available RAG example versions."""
+        return [ver for (ver, typ) in self._cache.keys() if typ == 'rag']
+
+
+@lru_cache
+def get_example_loader() -> ExampleLoader:
+    """Shared ExampleLoader so example files are read once per process."""
+    return ExampleLoader()
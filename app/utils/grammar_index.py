@@ -0,0 +1,152 @@
+"""
+Production-level index over an ANTLR grammar.
+
+The grammar is split once per version into parser productions and lexer rules
+with their symbol dependencies. A slice for a request is the dependency closure
+of the productions its intent and retrieved examples need (e.g. forEachCondition
+pulls in FOR, EACH, itemName, IN and collectionPath), so prompts carry only the
+relevant part of the grammar instead of the whole file.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from app.utils.grammar_loader import GrammarLoader
+
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_QUOTED_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_CHARSET_RE = re.compile(r"\[(?:[^\]\\]|\\.)*\]")
+_SYMBOL_RE = re.compile(r"\b[A-Za-z_][A-Za-z0-9_]*\b")
+_RULE_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*:(.*)$", re.DOTALL)
+_UPPER_WORD_RE = re.compile(r"\b[A-Z]{2,}\b")
+
+# Productions every rule needs: the RULE ... WHEN ... THEN ... [ELSE] ... END skeleton.
+SKELETON = ("rule", "simpleCondition")
+
+# Request wording -> productions it implies.
+INTENT_KEYWORDS = {
+    "forEachCondition": ("each", "every", "all line", "line item", "line items", "iterate"),
+    "existsCondition": ("exists", "any ", "duplicate", "at least one", "where"),
+    "compoundCondition": (" and ", " or ", "both", "either", "combination"),
+    "ifAction": ("if ", "otherwise", "nested", "depending", "based on"),
+    "setAction": ("set ", "calculate", "compute", "assign", "deductible", "copay", "co-pay", "payment"),
+    "flagAction": ("flag", "review", "fraud", "suspicious", "anomal", "unusual"),
+    "rejectAction": ("reject", "deny", "invalid", "exceed", "validate", "not covered"),
+    "approveAction": ("approve", "accept", "valid"),
+    "continueAction": ("continue", "skip"),
+}
+DEFAULT_ACTIONS = ("approveAction", "rejectAction")
+
+
+class GrammarRule:
+    __slots__ = ("name", "text", "position", "is_lexer", "is_skip", "refs", "is_choice", "is_dispatch")
+
+    def __init__(self, name: str, text: str, body: str, position: int):
+        self.name = name
+        self.text = text
+        self.position = position
+        self.is_lexer = name[0].isupper()
+        self.is_skip = "-> skip" in body
+        stripped = _CHARSET_RE.sub(" ", _QUOTED_RE.sub(" ", body))
+        self.refs = [s for s in dict.fromkeys(_SYMBOL_RE.findall(stripped)) if s != "skip"]
+        alternatives = [a.strip() for a in body.split("|")]
+        self.is_choice = len(alternatives) > 1 and all(_SYMBOL_RE.fullmatch(a) for a in alternatives)
+        self.is_dispatch = False
+
+
+class GrammarIndex:
+    def __init__(self, grammar_text: str):
+        self.header = ""
+        self.rules: Dict[str, GrammarRule] = {}
+        self._token_users: Dict[str, List[str]] = {}
+        self._parse(grammar_text)
+
+    def _parse(self, grammar_text: str):
+        text = _COMMENT_RE.sub("", grammar_text)
+        position = 0
+        for statement in re.split(r";\s*(?:\n|$)", text):
+            statement = statement.strip()
+            if not statement:
+                continue
+            if statement.startswith("grammar "):
+                self.header = statement + ";"
+                continue
+            match = _RULE_RE.match(statement)
+            if not match or match.group(1) in self.rules:
+                continue
+            name, body = match.group(1), match.group(2).strip()
+            self.rules[name] = GrammarRule(name, f"{statement};", body, position)
+            position += 1
+        # Recursive choice productions (condition, action) are dispatch points: a
+        # slice includes them but does not expand every alternative they list.
+        for rule in self.rules.values():
+            if rule.is_choice:
+                rule.is_dispatch = rule.name in self._reachable(rule.refs)
+        for rule in self.rules.values():
+            if rule.is_lexer:
+                continue
+            for ref in rule.refs:
+                if ref in self.rules and self.rules[ref].is_lexer:
+                    self._token_users.setdefault(ref, []).append(rule.name)
+
+    def _reachable(self, names: Iterable[str], expand_dispatch: bool = True,
+                   roots: FrozenSet[str] = frozenset()) -> Set[str]:
+        result: Set[str] = set()
+        stack = [n for n in names if n in self.rules]
+        while stack:
+            name = stack.pop()
+            if name in result:
+                continue
+            result.add(name)
+            rule = self.rules[name]
+            if not expand_dispatch and rule.is_dispatch and name not in roots:
+                continue
+            stack.extend(ref for ref in rule.refs if ref in self.rules and ref not in result)
+        return result
+
+    def closure(self, names: Iterable[str]) -> Set[str]:
+        """All rules reachable from names, without expanding dispatch productions."""
+        names = frozenset(names)
+        return self._reachable(names, expand_dispatch=False, roots=names)
+
+    def seeds_for(self, query: str, examples: Optional[List[Dict]] = None) -> FrozenSet[str]:
+        """Productions implied by the request wording and by keywords used in the examples."""
+        seeds = set(SKELETON)
+        lowered = f" {query.lower()} "
+        for production, words in INTENT_KEYWORDS.items():
+            if any(word in lowered for word in words):
+                seeds.add(production)
+        for example in examples or []:
+            if not isinstance(example, dict):
+                continue
+            dsl = example.get("dsl_pattern") or example.get("response") or ""
+            for token in set(_UPPER_WORD_RE.findall(dsl)):
+                seeds.update(self._token_users.get(token, ()))
+        if not seeds & set(DEFAULT_ACTIONS + ("setAction", "flagAction", "continueAction", "ifAction")):
+            seeds.update(DEFAULT_ACTIONS)
+        return frozenset(s for s in seeds if s in self.rules)
+
+    def render(self, names: Iterable[str]) -> str:
+        selected = sorted((self.rules[n] for n in names if not self.rules[n].is_skip), key=lambda r: r.position)
+        parser_rules = [r.text for r in selected if not r.is_lexer]
+        lexer_rules = [r.text for r in selected if r.is_lexer]
+        parts = [self.header] if self.header else []
+        parts.extend(parser_rules)
+        if lexer_rules:
+            parts.append("")
+            parts.extend(lexer_rules)
+        return "\n".join(parts)
+
+    def slice_for(self, query: str, examples: Optional[List[Dict]] = None) -> str:
+        return self._slice(self.seeds_for(query, examples))
+
+    @lru_cache(maxsize=256)
+    def _slice(self, seeds: FrozenSet[str]) -> str:
+        return self.render(self.closure(seeds))
+
+
+@lru_cache
+def get_grammar_index(version: str = "1.0") -> Optional[GrammarIndex]:
+    """Precomputed grammar index for a version (None if the grammar is missing)."""
+    grammar = GrammarLoader().get_grammar(version)
+    return GrammarIndex(grammar) if grammar else None
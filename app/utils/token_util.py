@@ -0,0 +1,33 @@
+from functools import lru_cache
+from typing import Dict, Optional
+
+
+@lru_cache
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Return the token count for text.
+    Uses tiktoken when it is installed, otherwise a ~4 characters per token estimate.
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def add_usage(total: Optional[Dict[str, int]], usage: Optional[Dict[str, int]]) -> Optional[Dict[str, int]]:
+    """Sum provider-reported usage (prompt_tokens/completion_tokens); None means not reported."""
+    if not usage:
+        return total
+    if not total:
+        return dict(usage)
+    return {key: (total.get(key) or 0) + (usage.get(key) or 0) for key in ("prompt_tokens", "completion_tokens")}
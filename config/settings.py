@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Any, Dict, List
 from dotenv import load_dotenv
 import os
 
@@ -13,6 +14,87 @@ class Settings(BaseSettings):
     DEBUG: bool = False
     APP_NAME: str = "DSL LangChain API"
     API_PORT: int = 8000  # Port for FastAPI app
+    # Model cascade for the generator stage. Tiers are tried in order; a tier's
+    # output is accepted when it parses and its structural score >= min_score.
+    # Override with a JSON list in the CASCADE_TIERS environment variable.
+    CASCADE_ENABLED: bool = True
+    CASCADE_TIERS: List[Dict[str, Any]] = [
+        {"name": "fast", "model": "mistralai/mistral-7b-instruct:free", "temperature": 0.2, "min_score": 1.0},
+        {"name": "reasoning", "model": "deepseek/deepseek-r1:free", "temperature": 0.7, "min_score": 0.0},
+    ]
+    # Complexity router: per predicted complexity, the cascade tier to start at,
+    # example count/token budget for the prompt and the max output tokens.
+    ROUTER_ENABLED: bool = True
+    ROUTER_PROFILES: Dict[str, Dict[str, Any]] = {
+        "basic": {"tier": "fast", "max_examples": 3, "example_token_budget": 600, "max_output_tokens": 400},
+        "intermediate": {"tier": "fast", "max_examples": 5, "example_token_budget": 1200, "max_output_tokens": 800},
+        "advanced": {"tier": "reasoning", "max_examples": 8, "example_token_budget": 3000, "max_output_tokens": 2048},
+    }
+    # Per-model generation profiles, matched by model-name prefix ("default" otherwise).
+    # Generation stops at the closing "END" of the rule block; max_tokens caps the
+    # answer and reasoning_max_tokens/reasoning_effort bound reasoning traces.
+    GENERATION_PROFILES: Dict[str, Dict[str, Any]] = {
+        "default": {"stop": ["END\n```"], "max_tokens": 1024},
+        "deepseek/deepseek-r1": {"stop": ["END\n```"], "max_tokens": 1024, "reasoning_max_tokens": 1024},
+    }
+    # Split compound requests into sub-rules generated in parallel graph branches
+    DECOMPOSITION_ENABLED: bool = True
+    DECOMPOSITION_MAX_SUBRULES: int = 6
+    # RAG retrieval over examples/rag_examples (persistent FAISS index + SQLite payloads)
+    RAG_ENABLED: bool = True
+    RAG_INDEX_DIR: str = "data/rag_index"
+    RAG_TOP_K: int = 3
+    RAG_MIN_SCORE: float = 0.2
+    RAG_EMBEDDING_DIM: int = 256
+    RAG_IVF_THRESHOLD: int = 20000
+    RAG_NPROBE: int = 16
+    # Send only the grammar productions relevant to the request (see app/utils/grammar_index.py)
+    GRAMMAR_SLICES_ENABLED: bool = True
+    # POST /evaluate: rule sets live in RULE_SETS_DIR/<id>.dsl; concurrent
+    # single-claim requests are batched within EVALUATE_BATCH_WINDOW_MS.
+    RULE_SETS_DIR: str = "rules"
+    EVALUATE_WORKERS: int = 2
+    EVALUATE_BATCH_WINDOW_MS: float = 2.0
+    EVALUATE_MAX_BATCH: int = 256
+    # Refinement sessions (POST /sessions): LRU store capped by count and estimated bytes
+    SESSION_MAX_SESSIONS: int = 1000
+    SESSION_MAX_BYTES: int = 64 * 1024 * 1024
+    SESSION_MEMORY_TOKENS: int = 1000
+    # Record/replay of LLM HTTP calls (see app/cassette.py): record, replay or passthrough.
+    # Replay sleeps for the recorded latency times LLM_CASSETTE_LATENCY_SCALE.
+    LLM_CASSETTE_MODE: str = "passthrough"
+    LLM_CASSETTE_PATH: str = "data/llm_cassette.db"
+    LLM_CASSETTE_LATENCY_SCALE: float = 0.0
+    # Client-side flow control for LLM calls (see app/ratelimit.py). LLM_TPM=0 disables
+    # the token budget; concurrency adapts between 1 and LLM_MAX_CONCURRENCY.
+    LLM_RATE_LIMIT_ENABLED: bool = True
+    LLM_RPM: float = 20
+    LLM_TPM: float = 0
+    LLM_BURST_SECONDS: float = 10.0
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_INITIAL_CONCURRENCY: int = 2
+    # /generate deadlines and admission control (see app/admission.py). Clients may send
+    # X-Deadline-Ms; requests whose estimated queue wait exceeds it get a 503.
+    GENERATE_DEFAULT_DEADLINE_S: float = 60.0
+    GENERATE_MAX_DEADLINE_S: float = 300.0
+    GENERATE_CONCURRENCY: int = 4
+    GENERATE_MAX_QUEUE: int = 32
+    # Required as X-Admin-Token on the /admin routes (profiles, history), which answer 404 while it is unset.
+    ADMIN_TOKEN: str = ""
+    # On-demand profiling of /generate runs (see app/profiling.py): X-Profile: 1 with the admin token, or sampling.
+    PROFILE_HEADER_ENABLED: bool = True
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_BUFFER_SIZE: int = 50
+    # Generation history/audit store (see app/history.py): segmented SQLite under ./logs,
+    # written in batches by a background thread.
+    HISTORY_ENABLED: bool = True
+    HISTORY_DIR: str = "logs/history"
+    HISTORY_SEGMENT_BYTES: int = 64 * 1024 * 1024
+    HISTORY_MAX_SEGMENTS: int = 20
+    HISTORY_BATCH_SIZE: int = 256
+    HISTORY_FLUSH_INTERVAL: float = 1.0
+    HISTORY_FSYNC_INTERVAL: float = 5.0
+    HISTORY_QUEUE_SIZE: int = 10000
     # Add DB config fields here later (e.g., DATABASE_URL)
 
     class Config:
@@ -0,0 +1,3 @@
+from .compiler import CompiledRule, RuleCompileError, compile_rule, evaluate, rule_hash
+
+__all__ = ['CompiledRule', 'RuleCompileError', 'compile_rule', 'evaluate', 'rule_hash']
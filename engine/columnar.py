@@ -0,0 +1,660 @@
+"""
+Vectorized batch evaluation of rules over columnar claim data.
+
+A ColumnarBatch holds one column per field path (claim.amount,
+patient.insurance_status, ...). Conditions are evaluated as boolean masks over
+the whole batch:
+  - ordering comparisons against a number use a float64 view of the column
+    (NaN for anything that is not an int/float, so it compares False). When
+    a column or literal holds an integer beyond 2**53, where float64 is no
+    longer exact, the comparison is decided per distinct value in Python;
+  - equality, IN and MATCHES against literals are decided once per distinct
+    value of a dictionary-encoded column and broadcast through the codes, so
+    they follow Python semantics exactly;
+  - field-vs-field ordering is vectorized where both sides are numbers;
+  - FOR EACH / EXISTS evaluate their condition once over the flattened items
+    of a ragged collection (see engine.ragged) and reduce per row;
+  - AND/OR combine masks; anything else (date arithmetic, current_date)
+    falls back to the compiled row predicate for that sub-condition only.
+Masks are cached per batch, so a predicate shared by several rules runs once.
+THEN/ELSE branches become a per-row branch index and action code; IF actions
+and arithmetic SET values are resolved with masks and value arrays too.
+Actions are identical to CompiledRule.evaluate on each row.
+"""
+import operator
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.dsl.nodes import (
+    And, Approve, BinOp, Compare, Continue, Exists, Field, Flag, ForEach, IfAction, In, ListValue,
+    Literal, Matches, Or, Reject, Rule, SetAction,
+)
+from engine import runtime
+from engine.compiler import CompiledRule, compile_condition, compile_rule
+from engine.ragged import RaggedArray
+
+_OPS = {"<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge,
+        "==": operator.eq, "!=": operator.ne}
+_FLIPPED = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "==": "==", "!=": "!="}
+
+# Per-row action codes (first action of the selected branch); 0 means no action.
+ACTION_CODES = {runtime.APPROVE: 1, runtime.REJECT: 2, runtime.SET: 3, runtime.FLAG: 4, runtime.CONTINUE: 5}
+NO_ACTION = 0
+_EXACT_INT = 2 ** 53
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except OverflowError:
+        return np.nan
+
+
+def _inexact_literal(value) -> bool:
+    return value.__class__ is int and abs(value) >= _EXACT_INT
+
+
+def _path(path: Union[str, Sequence[str]]) -> tuple:
+    return tuple(path.split(".")) if isinstance(path, str) else tuple(path)
+
+
+class Column:
+    """One field path across a batch, with lazily built numeric and dictionary-encoded views."""
+    __slots__ = ("values", "_numeric", "_is_int", "_booleans", "_codes", "_uniques", "_exact")
+
+    def __init__(self, values: np.ndarray, numeric: Optional[np.ndarray] = None):
+        self.values = values
+        self._numeric = numeric
+        self._exact = None
+        self._is_int = None
+        self._booleans = None
+        self._codes = None
+        self._uniques = None
+
+    @classmethod
+    def from_array(cls, array, missing: Optional[np.ndarray] = None) -> "Column":
+        """
+        Wrap a typed array. NaN in a float column reads as a missing value, as
+        do rows flagged in the optional missing mask (for int/bool/string columns).
+        """
+        array = np.asarray(array)
+        size = len(array)
+        kind = array.dtype.kind
+        if kind == "f":
+            numeric = array.astype(np.float64, copy=False)
+            absent = np.isnan(numeric) if missing is None else np.isnan(numeric) | missing
+            column = cls(numeric.astype(object), numeric)
+            column._is_int = np.zeros(size, dtype=bool)
+        elif kind in "iu":
+            absent = missing
+            column = cls(array.astype(object), array.astype(np.float64))
+            column._is_int = np.ones(size, dtype=bool) if missing is None else ~missing
+        elif kind == "b":
+            absent = missing
+            column = cls(array.astype(object), np.full(size, np.nan))
+            column._is_int = np.zeros(size, dtype=bool)
+            is_true = array if missing is None else array & ~missing
+            column._booleans = (is_true, ~array if missing is None else ~array & ~missing)
+            if missing is not None:
+                column.values[missing] = None
+            return column
+        else:
+            column = cls(array.astype(object))
+            if missing is not None:
+                column.values[missing] = None
+            return column
+        if absent is not None and absent.any():
+            column.values[absent] = None
+            if column._numeric is array:
+                column._numeric = column._numeric.copy()
+            column._numeric[absent] = np.nan
+        column._booleans = (np.zeros(size, dtype=bool), np.zeros(size, dtype=bool))
+        return column
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def numeric(self) -> np.ndarray:
+        if self._numeric is None:
+            numeric_types = runtime.NUMERIC
+            try:
+                self._numeric = np.fromiter(
+                    (v if v.__class__ in numeric_types else np.nan for v in self.values),
+                    dtype=np.float64, count=len(self.values))
+            except OverflowError:  # an int beyond float64's range
+                self._exact = False
+                self._numeric = np.fromiter(
+                    (_to_float(v) if v.__class__ in numeric_types else np.nan for v in self.values),
+                    dtype=np.float64, count=len(self.values))
+        return self._numeric
+
+    @property
+    def exact(self) -> bool:
+        """Whether the float64 view holds every int exactly (no int beyond 2**53)."""
+        numeric = self.numeric
+        if self._exact is None:
+            self._exact = not np.any(np.abs(numeric[self.is_int]) >= _EXACT_INT)
+        return self._exact
+
+    @property
+    def is_int(self) -> np.ndarray:
+        """Rows holding a Python int (arithmetic on them stays int, as in row evaluation)."""
+        if self._is_int is None:
+            self._is_int = np.fromiter((v.__class__ is int for v in self.values), dtype=bool,
+                                       count=len(self.values))
+        return self._is_int
+
+    @property
+    def booleans(self):
+        """(is_true, is_false) masks; booleans compare equal to 1 and 0 in Python."""
+        if self._booleans is None:
+            values = self.values
+            self._booleans = (np.fromiter((v is True for v in values), dtype=bool, count=len(values)),
+                              np.fromiter((v is False for v in values), dtype=bool, count=len(values)))
+        return self._booleans
+
+    @property
+    def present(self) -> np.ndarray:
+        """Rows where the field is not None."""
+        return self.values != None  # noqa: E711 (elementwise on object arrays)
+
+    def equals_number(self, value) -> np.ndarray:
+        """Python `v == value` for a number/boolean literal, without per-value calls."""
+        mask = self.numeric == value
+        is_true, is_false = self.booleans
+        if value == 1:
+            mask |= is_true
+        elif value == 0:
+            mask |= is_false
+        return mask
+
+    def warm(self):
+        """Build every derived view up front (e.g. while loading a batch)."""
+        self.numeric, self.is_int, self.booleans
+        if self._codes is None:
+            self._encode()
+        return self
+
+    def _encode(self):
+        # Keyed by class too: True, 1 and 1.0 are equal dict keys but class-sensitive predicates tell them apart.
+        index: Dict[Any, int] = {}
+        uniques: List[Any] = []
+        codes = np.empty(len(self.values), dtype=np.int32)
+        for i, value in enumerate(self.values):
+            try:
+                key = (value.__class__, value)
+                code = index.get(key)
+                if code is None:
+                    code = index[key] = len(uniques)
+                    uniques.append(value)
+            except TypeError:  # unhashable (list/dict): its own entry
+                code = len(uniques)
+                uniques.append(value)
+            codes[i] = code
+        self._codes, self._uniques = codes, uniques
+
+    def take(self, indices: np.ndarray) -> "Column":
+        """Column of the rows at indices (e.g. broadcasting parent fields to collection items)."""
+        column = Column(self.values[indices], None if self._numeric is None else self._numeric[indices])
+        if self._is_int is not None:
+            column._is_int = self._is_int[indices]
+        if self._booleans is not None:
+            column._booleans = (self._booleans[0][indices], self._booleans[1][indices])
+        if self._codes is not None:
+            column._codes, column._uniques = self._codes[indices], self._uniques
+        return column
+
+    def map_values(self, predicate: Callable[[Any], bool]) -> np.ndarray:
+        """predicate(value) for every row, computed once per distinct value."""
+        if self._codes is None:
+            self._encode()
+        table = np.fromiter((bool(predicate(u)) for u in self._uniques), dtype=bool, count=len(self._uniques))
+        return table[self._codes]
+
+
+class ColumnarBatch:
+    """
+    A batch of claims as columns keyed by dotted field path. Columns missing
+    from the batch are extracted from the source records on first use.
+    """
+
+    def __init__(self, size: int, columns: Optional[Dict[str, Column]] = None,
+                 records: Optional[List[Dict[str, Any]]] = None):
+        self.size = size
+        self.columns: Dict[str, Column] = dict(columns or {})
+        self._records = records
+        self._masks: Dict[Any, np.ndarray] = {}
+        self._collections: Dict[Any, RaggedArray] = {}
+        self._children: Dict[Any, "ChildBatch"] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], paths: Iterable[str] = ()) -> "ColumnarBatch":
+        records = records if isinstance(records, list) else list(records)
+        batch = cls(len(records), records=records)
+        for path in paths:
+            batch.column(path)
+        return batch
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any]) -> "ColumnarBatch":
+        """Build a batch from arrays keyed by dotted path (e.g. parsed CSV columns)."""
+        wrapped = {path: c if isinstance(c, Column) else Column.from_array(c) for path, c in columns.items()}
+        sizes = {len(c) for c in wrapped.values()}
+        if len(sizes) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(sizes)}")
+        return cls(sizes.pop() if sizes else 0, wrapped)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def column(self, path: Union[str, Sequence[str]]) -> Column:
+        key = ".".join(_path(path))
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = Column(self._extract(_path(path)))
+        return column
+
+    def _extract(self, path: tuple) -> np.ndarray:
+        values = np.empty(self.size, dtype=object)
+        if self._records is None:
+            return values  # all None: the field is absent from every row
+        root, rest = path[0], path[1:]
+        get = runtime.get
+        for i, record in enumerate(self._records):
+            value = record.get(root)
+            for part in rest:
+                value = get(value, part)
+            values[i] = value
+        return values
+
+    # ---- collections ----
+    def set_collection(self, path: Union[str, Sequence[str]], ragged: RaggedArray):
+        """Provide a prebuilt ragged array for a FOR EACH collection path."""
+        self._collections[".".join(_path(path))] = ragged
+
+    def collection(self, path: Union[str, Sequence[str]]) -> RaggedArray:
+        """Items of a list-valued field for every row (FOR EACH item IN path)."""
+        key = ".".join(_path(path))
+        ragged = self._collections.get(key)
+        if ragged is None:
+            ragged = self._collections[key] = RaggedArray.from_lists(self.column(path).values)
+        return ragged
+
+    def exists_collection(self, entity: str) -> RaggedArray:
+        """Items an `EXISTS entity WHERE ...` iterates over, resolved like runtime.collection."""
+        key = ("exists", entity)
+        ragged = self._collections.get(key)
+        if ragged is None:
+            candidates = [self.column(p).values for p in runtime.collection_paths(entity)]
+            lists = [next((c for c in row if isinstance(c, list)), None) for row in zip(*candidates)]
+            ragged = self._collections[key] = RaggedArray.from_lists(lists)
+        return ragged
+
+    def _child(self, name: str, key, ragged: RaggedArray) -> "ChildBatch":
+        child = self._children.get((name, key))
+        if child is None:
+            child = self._children[(name, key)] = ChildBatch(self, name, ragged)
+        return child
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """Row dicts for row-wise fallbacks (rebuilt from columns when the batch has none)."""
+        if self._records is None:
+            records = [{} for _ in range(self.size)]
+            for key, column in self.columns.items():
+                path = key.split(".")
+                for record, value in zip(records, column.values):
+                    if value is None:
+                        continue
+                    target = record
+                    for part in path[:-1]:
+                        target = target.setdefault(part, {})
+                    target[path[-1]] = value
+            self._records = records
+        return self._records
+
+    # ---- masks ----
+    def mask(self, condition) -> np.ndarray:
+        """Boolean mask of rows matching a condition (cached per batch, so shared predicates run once)."""
+        mask = self._masks.get(condition)
+        if mask is None:
+            mask = self._masks[condition] = self._evaluate(condition)
+        return mask
+
+    def _evaluate(self, node) -> np.ndarray:
+        if isinstance(node, And):
+            mask = self.mask(node.items[0]).copy()
+            for item in node.items[1:]:
+                mask &= self.mask(item)
+            return mask
+        if isinstance(node, Or):
+            mask = self.mask(node.items[0]).copy()
+            for item in node.items[1:]:
+                mask |= self.mask(item)
+            return mask
+        if isinstance(node, Exists):
+            ragged = self.exists_collection(node.entity)
+            child = self._child(node.entity, ("exists", node.entity), ragged)
+            return ragged.any(child.mask(node.condition))
+        if isinstance(node, ForEach):
+            key = node.collection.dotted
+            ragged = self.collection(node.collection.path)
+            return ragged.all(self._child(node.item, key, ragged).mask(node.condition))
+        if isinstance(node, Compare):
+            mask = self._compare(node)
+            if mask is not None:
+                return mask
+        elif isinstance(node, In) and isinstance(node.left, Field) and _is_literal_list(node.container):
+            members = frozenset(i.value for i in node.container.items)
+            return self._column(node.left).map_values(lambda v: runtime.contains(v, members))
+        elif isinstance(node, Matches) and isinstance(node.left, Field) and isinstance(node.pattern, Literal):
+            pattern = runtime.compile_pattern(node.pattern.value)
+            return self._column(node.left).map_values(
+                lambda v: v.__class__ is str and pattern.search(v) is not None)
+        return self._rowwise(node)
+
+    def _column(self, field: Field) -> Column:
+        return self.column(field.path)
+
+    def _compare(self, node: Compare) -> Optional[np.ndarray]:
+        op, left, right = node.op, node.left, node.right
+        if isinstance(left, Literal) and not isinstance(right, Literal):
+            op, left, right = _FLIPPED[op], right, left
+        if _uses_current_date(left) or _uses_current_date(right):
+            return None
+        if isinstance(left, Field) and isinstance(right, Field) and op not in ("==", "!="):
+            a, b = self._column(left), self._column(right)
+            return self._compare_columns(_OPS[op], a, b) if a.exact and b.exact else None
+        if not isinstance(right, Literal):
+            return None
+        fn, value = _OPS[op], right.value
+        if isinstance(left, Field):
+            column = self._column(left)
+            exact = right.kind != "number" or (column.exact and not _inexact_literal(value))
+            if op in ("==", "!=") and right.kind in ("number", "boolean") and exact:
+                mask = column.equals_number(value)
+                return mask if op == "==" else ~mask
+            if op in ("==", "!="):
+                return column.map_values(lambda v: fn(v, value))
+            if right.kind == "number":
+                if not exact:
+                    numeric_types = runtime.NUMERIC
+                    return column.map_values(lambda v: v.__class__ in numeric_types and fn(v, value))
+                with np.errstate(invalid="ignore"):
+                    return fn(column.numeric, value)
+            if right.kind in ("string", "date"):
+                return self._column(left).map_values(lambda v: v.__class__ is str and fn(v, value))
+            return None
+        if isinstance(left, BinOp) and right.kind == "number":
+            numeric = self._numeric_expression(left)
+            if numeric is None or _inexact_literal(value):
+                return None
+            if np.any(np.abs(numeric[self._int_expression(left) & ~np.isnan(numeric)]) >= _EXACT_INT):
+                return None
+            with np.errstate(invalid="ignore"):
+                return fn(numeric, value)
+        return None
+
+    def _compare_columns(self, fn, left: Column, right: Column) -> np.ndarray:
+        """Ordering between two fields: vectorized where both are numbers, Python semantics elsewhere."""
+        a, b = left.numeric, right.numeric
+        both = ~np.isnan(a) & ~np.isnan(b)
+        mask = np.zeros(self.size, dtype=bool)
+        mask[both] = fn(a[both], b[both])
+        # Strings, booleans and NaN against each other: compare the remaining rows one by one.
+        compare = runtime.ordered(fn)
+        residual = np.flatnonzero(~both & left.present & right.present)
+        lv, rv = left.values, right.values
+        for row in residual:
+            mask[row] = compare(lv[row], rv[row])
+        return mask
+
+    def _numeric_expression(self, node) -> Optional[np.ndarray]:
+        """float64 values of an arithmetic expression over numeric fields (NaN where Python gives None)."""
+        if isinstance(node, Field):
+            if _uses_current_date(node) or not self._column(node).exact:
+                return None
+            return self._column(node).numeric
+        if isinstance(node, Literal):
+            return np.float64(node.value) if node.kind == "number" and not _inexact_literal(node.value) else None
+        if isinstance(node, BinOp):
+            left = self._numeric_expression(node.left)
+            right = self._numeric_expression(node.right)
+            if left is None or right is None:
+                return None
+            with np.errstate(all="ignore"):
+                if node.op == "+":
+                    return np.add(left, right)
+                if node.op == "-":
+                    return np.subtract(left, right)
+                if node.op == "*":
+                    return np.multiply(left, right)
+                return np.where(right == 0, np.nan, np.divide(left, right))
+        return None
+
+    def _int_expression(self, node) -> np.ndarray:
+        """Rows where an arithmetic expression stays a Python int in row evaluation."""
+        if isinstance(node, Field):
+            return self._column(node).is_int
+        if isinstance(node, Literal):
+            return np.full(self.size, node.value.__class__ is int)
+        if node.op == "/":
+            return np.zeros(self.size, dtype=bool)
+        return self._int_expression(node.left) & self._int_expression(node.right)
+
+    def values_of(self, node) -> Optional[np.ndarray]:
+        """Per-row Python values of a SET expression, or None if it cannot be vectorized."""
+        if isinstance(node, Field) and not _uses_current_date(node):
+            return self._column(node).values
+        numeric = self._numeric_expression(node) if isinstance(node, BinOp) else None
+        if numeric is None:
+            return None
+        missing = np.isnan(numeric)
+        ints = self._int_expression(node) & ~missing
+        if np.any(np.abs(numeric[ints]) > _EXACT_INT):
+            return None  # beyond float64's exact integer range
+        values = numeric.astype(object)
+        values[missing] = None
+        values[ints] = numeric[ints].astype(np.int64).astype(object)
+        return values
+
+    def _rowwise(self, node) -> np.ndarray:
+        predicate = compile_condition(node)
+        return np.fromiter((predicate(r) for r in self.records), dtype=bool, count=self.size)
+
+
+class ChildBatch(ColumnarBatch):
+    """
+    The items of a collection as rows, for the condition inside FOR EACH / EXISTS.
+    Paths starting with the bound name read the item; any other path is the
+    owning parent row's value, broadcast through the ragged parent index.
+    """
+
+    def __init__(self, parent: ColumnarBatch, name: str, ragged: RaggedArray):
+        super().__init__(len(ragged.values))
+        self.parent = parent
+        self.name = name
+        self.ragged = ragged
+
+    def column(self, path: Union[str, Sequence[str]]) -> Column:
+        path = _path(path)
+        key = ".".join(path)
+        column = self.columns.get(key)
+        if column is None:
+            if path[0] == self.name:
+                column = Column(_follow(self.ragged.values, path[1:]))
+            else:
+                column = self.parent.column(path).take(self.ragged.parent_index)
+            self.columns[key] = column
+        return column
+
+    @property
+    def records(self) -> List[Dict[str, Any]]:
+        """Parent records with the bound name set to the item, for row-wise fallbacks."""
+        if self._records is None:
+            parents = self.parent.records
+            name = self.name
+            self._records = [{**parents[p], name: item}
+                             for p, item in zip(self.ragged.parent_index, self.ragged.values)]
+        return self._records
+
+
+def _follow(values: np.ndarray, parts: tuple) -> np.ndarray:
+    if not parts:
+        return values
+    result = np.empty(len(values), dtype=object)
+    get = runtime.get
+    for i, value in enumerate(values):
+        for part in parts:
+            value = get(value, part)
+        result[i] = value
+    return result
+
+
+def _is_literal_list(node) -> bool:
+    return isinstance(node, ListValue) and all(isinstance(i, Literal) for i in node.items)
+
+
+def _uses_current_date(node) -> bool:
+    if isinstance(node, Field):
+        return node.path == ("current_date",)
+    if isinstance(node, BinOp):
+        return _uses_current_date(node.left) or _uses_current_date(node.right)
+    return False
+
+
+class _RowValues:
+    """A SET value that differs per row: an object array indexed by row."""
+    __slots__ = ("values",)
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+
+class _IfActions:
+    """An IF action: its condition mask and the actions of either side."""
+    __slots__ = ("mask", "then", "otherwise")
+
+    def __init__(self, mask: np.ndarray, then: list, otherwise: list):
+        self.mask = mask
+        self.then = then
+        self.otherwise = otherwise
+
+
+def _branch_actions(actions, batch: ColumnarBatch) -> Optional[list]:
+    """
+    Action tuples for a branch, with per-row SET values as _RowValues and IF
+    actions as _IfActions. Returns None when the branch needs row evaluation
+    (SET expressions that cannot be vectorized).
+    """
+    result = []
+    for action in actions:
+        if isinstance(action, Approve):
+            result.append((runtime.APPROVE, None))
+        elif isinstance(action, Continue):
+            result.append((runtime.CONTINUE, None))
+        elif isinstance(action, Reject):
+            result.append((runtime.REJECT, action.message))
+        elif isinstance(action, Flag):
+            result.append((runtime.FLAG, action.message))
+        elif isinstance(action, SetAction) and isinstance(action.value, Literal):
+            result.append((runtime.SET, action.target.dotted, action.value.value))
+        elif isinstance(action, SetAction):
+            values = batch.values_of(action.value)
+            if values is None:
+                return None
+            result.append((runtime.SET, action.target.dotted, _RowValues(values)))
+        elif isinstance(action, IfAction):
+            then = _branch_actions(action.then, batch)
+            otherwise = _branch_actions(action.otherwise, batch)
+            if then is None or otherwise is None:
+                return None
+            result.append(_IfActions(batch.mask(action.condition), then, otherwise))
+        else:
+            return None
+    return result
+
+
+def _expand(items: list, row: int, out: List[tuple]) -> List[tuple]:
+    for item in items:
+        if item.__class__ is _IfActions:
+            _expand(item.then if item.mask[row] else item.otherwise, row, out)
+        elif len(item) == 3 and item[2].__class__ is _RowValues:
+            out.append((item[0], item[1], item[2].values[row]))
+        else:
+            out.append(item)
+    return out
+
+
+def _first_codes(items: list, size: int) -> np.ndarray:
+    """Per-row code of the first action a branch produces (NO_ACTION if none)."""
+    codes = np.zeros(size, dtype=np.uint8)
+    for item in items:
+        if item.__class__ is _IfActions:
+            sub = np.where(item.mask, _first_codes(item.then, size), _first_codes(item.otherwise, size))
+            codes = np.where(codes == NO_ACTION, sub, codes)
+        else:
+            codes[codes == NO_ACTION] = ACTION_CODES[item[0]]
+            break
+    return codes
+
+
+class BatchResult:
+    """
+    Outcome of one rule over a batch. branch[i] is the index of the clause that
+    fired for row i (len(clauses) for ELSE, -1 for none) and codes[i] the code
+    of its first action. actions(i) returns the same list as row evaluation.
+    """
+
+    def __init__(self, rule: CompiledRule, branch: np.ndarray, codes: np.ndarray,
+                 branch_actions: List[Optional[List[tuple]]], dynamic: Dict[int, List[tuple]]):
+        self.rule = rule
+        self.branch = branch
+        self.codes = codes
+        self._branch_actions = branch_actions
+        self._dynamic = dynamic
+
+    def __len__(self) -> int:
+        return len(self.branch)
+
+    def actions(self, row: int) -> List[tuple]:
+        actions = self._dynamic.get(row)
+        if actions is not None:
+            return list(actions)
+        branch = self.branch[row]
+        if branch < 0:
+            return []
+        return _expand(self._branch_actions[branch], row, [])
+
+    def to_list(self) -> List[List[tuple]]:
+        return [self.actions(i) for i in range(len(self.branch))]
+
+
+def evaluate_batch(rule: Union[str, Rule, CompiledRule], batch: ColumnarBatch) -> BatchResult:
+    """Evaluate one rule over every row of a batch."""
+    compiled = rule if isinstance(rule, CompiledRule) else compile_rule(rule)
+    clauses = compiled.rule.clauses
+    n = len(batch)
+    branch = np.full(n, -1, dtype=np.int16)
+    for index, clause in enumerate(clauses):
+        branch[(branch == -1) & batch.mask(clause.condition)] = index
+    if compiled.rule.otherwise:
+        branch[branch == -1] = len(clauses)
+
+    branch_actions = [_branch_actions(c.actions, batch) for c in clauses]
+    branch_actions.append(_branch_actions(compiled.rule.otherwise, batch))
+    codes = np.zeros(n, dtype=np.uint8)
+    dynamic: Dict[int, List[tuple]] = {}
+    for index, actions in enumerate(branch_actions):
+        selected = branch == index
+        if actions is None:
+            # Non-numeric SET expressions: run the compiled rule on just these rows.
+            records = batch.records
+            for row in np.flatnonzero(selected):
+                result = dynamic[int(row)] = compiled.evaluate(records[row])
+                codes[row] = ACTION_CODES[result[0][0]] if result else NO_ACTION
+        elif actions:
+            codes[selected] = _first_codes(actions, n)[selected]
+    return BatchResult(compiled, branch, codes, branch_actions, dynamic)
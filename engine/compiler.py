@@ -0,0 +1,269 @@
+"""
+Compile parsed MedicalClaimsDSL rules into Python functions.
+
+Each rule is translated once into Python source for a single function
+`_rule(r)` and compiled with compile(): field paths become fixed dict
+accessors, operators are emitted inline, IN lists become frozenset constants
+and MATCHES patterns are precompiled. The function returns a list of action
+tuples, e.g. [("REJECT", "Claim amount exceeds maximum allowed limit")] or
+[("SET", "copay_amount", 120.0)]. Compiled rules are cached by rule hash.
+"""
+import hashlib
+import operator
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Union
+
+from app.dsl.nodes import (
+    And, Approve, BinOp, Compare, Continue, Duration, Exists, Field, Flag, ForEach,
+    IfAction, In, ListValue, Literal, Matches, Or, Reject, Rule, SetAction,
+)
+from app.dsl.parser import parse_rule
+from engine import runtime
+
+_ORDERING = {"<": operator.lt, ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+_FLIPPED = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "==": "==", "!=": "!="}
+_ARITH = {"+": "_add", "-": "_sub", "*": "_mul", "/": "_div"}
+
+
+class RuleCompileError(ValueError):
+    """Raised when a parsed rule cannot be compiled (e.g. an invalid MATCHES pattern)."""
+
+
+def rule_hash(rule: Rule) -> str:
+    """Stable hash of a rule's syntax tree (formatting and comments do not matter)."""
+    return hashlib.sha256(repr(rule).encode("utf-8")).hexdigest()[:16]
+
+
+class _Codegen:
+    def __init__(self):
+        self.namespace: Dict[str, Any] = {
+            "_get": runtime.get,
+            "_NUM": runtime.NUMERIC,
+            "_today": runtime.today,
+            "_add": runtime.add,
+            "_sub": runtime.sub,
+            "_mul": runtime.mul,
+            "_div": runtime.div,
+            "_contains": runtime.contains,
+            "_matches": runtime.matches,
+            "_collection": runtime.collection,
+            "_items": runtime.items,
+        }
+        for op, fn in _ORDERING.items():
+            self.namespace[f"_ord{_op_name(op)}"] = runtime.ordered(fn)
+        self.fields_read = set()
+        # Field path prefixes already held in locals of the generated function.
+        self.paths: Dict[tuple, str] = {}
+        self._counter = 0
+
+    def _name(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+    def const(self, value) -> str:
+        name = self._name("_k")
+        self.namespace[name] = value
+        return name
+
+    # ---- expressions ----
+    def access(self, field: Field, scope: Dict[str, str]) -> str:
+        root, rest = field.path[0], field.path[1:]
+        if root in scope:
+            expr = scope[root]
+        else:
+            self.fields_read.add(field.dotted)
+            if not rest and root == "current_date":
+                return "(r.get('current_date') or _today())"
+            for length in range(len(field.path), 0, -1):
+                local = self.paths.get(field.path[:length])
+                if local is not None:
+                    expr, rest = local, field.path[length:]
+                    break
+            else:
+                expr = f"r.get({root!r})"
+        for part in rest:
+            expr = f"_get({expr}, {part!r})"
+        return expr
+
+    def expr(self, node, scope: Dict[str, str]) -> str:
+        if isinstance(node, Field):
+            return self.access(node, scope)
+        if isinstance(node, Literal):
+            return repr(node.value)
+        if isinstance(node, Duration):
+            return self.const(runtime.Days(node.amount))
+        if isinstance(node, ListValue):
+            return "(" + "".join(f"{self.expr(i, scope)}, " for i in node.items) + ")"
+        if isinstance(node, BinOp):
+            return f"{_ARITH[node.op]}({self.expr(node.left, scope)}, {self.expr(node.right, scope)})"
+        raise RuleCompileError(f"Unsupported expression: {node!r}")
+
+    # ---- conditions ----
+    def cond(self, node, scope: Dict[str, str]) -> str:
+        if isinstance(node, And):
+            return "(" + " and ".join(self.cond(i, scope) for i in node.items) + ")"
+        if isinstance(node, Or):
+            return "(" + " or ".join(self.cond(i, scope) for i in node.items) + ")"
+        if isinstance(node, Compare):
+            return self._compare(node, scope)
+        if isinstance(node, In):
+            left = self.expr(node.left, scope)
+            container = node.container
+            if isinstance(container, ListValue):
+                if all(isinstance(i, Literal) for i in container.items):
+                    return f"_contains({left}, {self.const(frozenset(i.value for i in container.items))})"
+            return f"_contains({left}, {self.expr(container, scope)})"
+        if isinstance(node, Matches):
+            left = self.expr(node.left, scope)
+            if isinstance(node.pattern, Literal):
+                try:
+                    pattern = re.compile(node.pattern.value)
+                except re.error as e:
+                    raise RuleCompileError(f"Invalid MATCHES pattern {node.pattern.value!r}: {e}")
+                t = self._name("_t")
+                return f"(({t} := {left}).__class__ is str and {self.const(pattern)}.search({t}) is not None)"
+            return f"_matches({left}, {self.expr(node.pattern, scope)})"
+        if isinstance(node, Exists):
+            var = self._name("_i")
+            self.fields_read.update(runtime.collection_paths(node.entity))
+            inner = self.cond(node.condition, {**scope, node.entity: var})
+            return f"any({inner} for {var} in _collection(r, {node.entity!r}))"
+        if isinstance(node, ForEach):
+            var = self._name("_i")
+            collection = self.access(node.collection, scope)
+            inner = self.cond(node.condition, {**scope, node.item: var})
+            return f"all({inner} for {var} in _items({collection}))"
+        raise RuleCompileError(f"Unsupported condition: {node!r}")
+
+    def _compare(self, node: Compare, scope: Dict[str, str]) -> str:
+        op, left, right = node.op, node.left, node.right
+        if isinstance(left, Literal) and not isinstance(right, Literal):
+            op, left, right = _FLIPPED[op], right, left
+        lhs = self.expr(left, scope)
+        rhs = self.expr(right, scope)
+        if op in ("==", "!="):
+            return f"({lhs} {op} {rhs})"
+        if isinstance(right, Literal) and right.kind == "number":
+            t = self._name("_t")
+            return f"(({t} := {lhs}).__class__ in _NUM and {t} {op} {rhs})"
+        if isinstance(right, Literal) and right.kind in ("string", "date"):
+            t = self._name("_t")
+            return f"(({t} := {lhs}).__class__ is str and {t} {op} {rhs})"
+        return f"_ord{_op_name(op)}({lhs}, {rhs})"
+
+    # ---- actions ----
+    def actions(self, actions, indent: str, out: str = "_out") -> List[str]:
+        lines = []
+        for action in actions:
+            if isinstance(action, Approve):
+                lines.append(f"{indent}{out}.append({self.const((runtime.APPROVE, None))})")
+            elif isinstance(action, Continue):
+                lines.append(f"{indent}{out}.append({self.const((runtime.CONTINUE, None))})")
+            elif isinstance(action, Reject):
+                lines.append(f"{indent}{out}.append({self.const((runtime.REJECT, action.message))})")
+            elif isinstance(action, Flag):
+                lines.append(f"{indent}{out}.append({self.const((runtime.FLAG, action.message))})")
+            elif isinstance(action, SetAction):
+                target = action.target.dotted
+                if isinstance(action.value, Literal):
+                    lines.append(f"{indent}{out}.append({self.const((runtime.SET, target, action.value.value))})")
+                else:
+                    lines.append(f"{indent}{out}.append(({runtime.SET!r}, {target!r}, {self.expr(action.value, {})}))")
+            elif isinstance(action, IfAction):
+                lines.append(f"{indent}if {self.cond(action.condition, {})}:")
+                lines.extend(self.actions(action.then, indent + "    ", out) or [f"{indent}    pass"])
+                if action.otherwise:
+                    lines.append(f"{indent}else:")
+                    lines.extend(self.actions(action.otherwise, indent + "    ", out))
+            else:
+                raise RuleCompileError(f"Unsupported action: {action!r}")
+        return lines
+
+    def rule(self, rule: Rule) -> str:
+        lines = ["def _rule(r):", "    _out = []"]
+        for i, clause in enumerate(rule.clauses):
+            keyword = "if" if i == 0 else "elif"
+            lines.append(f"    {keyword} {self.cond(clause.condition, {})}:")
+            lines.extend(self.actions(clause.actions, "        ") or ["        pass"])
+        if rule.otherwise:
+            lines.append("    else:")
+            lines.extend(self.actions(rule.otherwise, "        "))
+        lines.append("    return _out")
+        return "\n".join(lines) + "\n"
+
+
+def _op_name(op: str) -> str:
+    return {"<": "_lt", ">": "_gt", "<=": "_le", ">=": "_ge"}[op]
+
+
+class CompiledRule:
+    """A rule compiled to a Python function. Call evaluate(record) to get its actions."""
+    __slots__ = ("name", "hash", "rule", "source", "fields_read", "_fn")
+
+    def __init__(self, rule: Rule):
+        codegen = _Codegen()
+        self.name = rule.name
+        self.hash = rule_hash(rule)
+        self.rule = rule
+        self.source = codegen.rule(rule)
+        self.fields_read: FrozenSet[str] = frozenset(codegen.fields_read)
+        exec(compile(self.source, f"<rule {rule.name}>", "exec"), codegen.namespace)
+        self._fn = codegen.namespace["_rule"]
+
+    def evaluate(self, record: Dict[str, Any]) -> List[tuple]:
+        """Return the action tuples this rule produces for a claim record."""
+        return self._fn(record)
+
+    __call__ = evaluate
+
+    def __reduce__(self):
+        # Ship the syntax tree and recompile on the other side (e.g. in worker processes).
+        return (compile_rule, (self.rule,))
+
+    def __repr__(self):
+        return f"CompiledRule({self.name!r}, hash={self.hash!r})"
+
+
+_cache: "OrderedDict[str, CompiledRule]" = OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_cached(text: str) -> Rule:
+    return parse_rule(text)
+
+
+def compile_rule(rule: Union[str, Rule]) -> CompiledRule:
+    """Compile rule text or a parsed Rule, reusing a cached compilation with the same hash."""
+    if isinstance(rule, str):
+        rule = _parse_cached(rule.strip())
+    key = rule_hash(rule)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            return compiled
+    compiled = CompiledRule(rule)
+    with _cache_lock:
+        _cache[key] = compiled
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return compiled
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_condition(condition) -> Callable[[Dict[str, Any]], bool]:
+    """Compile a single condition node into a predicate over one record."""
+    codegen = _Codegen()
+    source = f"def _cond(r):\n    return bool({codegen.cond(condition, {})})\n"
+    exec(compile(source, "<condition>", "exec"), codegen.namespace)
+    return codegen.namespace["_cond"]
+
+
+def evaluate(rule: Union[str, Rule], record: Dict[str, Any]) -> List[tuple]:
+    """Compile (cached) and evaluate a rule against one claim record."""
+    return compile_rule(rule).evaluate(record)
@@ -0,0 +1,238 @@
+"""
+Incremental rule evaluation over a persisted claim set.
+
+Claims and the last results of every (claim id, rule hash) pair are kept in
+SQLite. Each compiled rule knows the field paths it reads
+(CompiledRule.fields_read), so:
+  - set_rules() evaluates only rules whose hash is new (one columnar pass over
+    the stored claims per new rule) and drops results of removed rules;
+  - upsert_claims() / apply_delta() diff the incoming data against the stored
+    record and re-evaluate only the rules that read a changed path (or any
+    path above or below it). Rules that read current_date are always
+    re-evaluated for an updated claim, since their result depends on the day.
+"""
+import json
+import sqlite3
+import threading
+from itertools import repeat
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+from app.dsl.nodes import Rule
+from engine.columnar import BatchResult, ColumnarBatch, _IfActions, _RowValues, evaluate_batch
+from engine.compiler import CompiledRule, compile_rule
+
+_MISSING = object()
+_encode = json.JSONEncoder(default=str).encode
+
+
+def flatten(record: Any, prefix: str = "") -> Dict[str, Any]:
+    """Leaf values by dotted path; lists are leaves (a change inside a list changes the list's path)."""
+    if not isinstance(record, dict) or (prefix and not record):
+        return {prefix: record}
+    flat = {}
+    for key, value in record.items():
+        path = f"{prefix}.{key}" if prefix else str(key)
+        flat.update(flatten(value, path))
+    return flat
+
+
+def changed_paths(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Set[str]:
+    """Dotted paths whose value differs between two records."""
+    before, after = flatten(old or {}), flatten(new)
+    return {p for p in before.keys() | after.keys() if before.get(p, _MISSING) != after.get(p, _MISSING)}
+
+
+def set_path(record: Dict[str, Any], path: str, value: Any):
+    parts = path.split(".")
+    target = record
+    for part in parts[:-1]:
+        child = target.get(part)
+        if not isinstance(child, dict):
+            child = target[part] = {}
+        target = child
+    target[parts[-1]] = value
+
+
+def _related(a: str, b: str) -> bool:
+    return a == b or a.startswith(b + ".") or b.startswith(a + ".")
+
+
+def _encoded_actions(result: BatchResult) -> List[str]:
+    """JSON actions per row; branches whose actions do not vary by row are encoded once."""
+    static = {}
+    for branch, items in enumerate(result._branch_actions):
+        if items is not None and not any(i.__class__ is _IfActions or (len(i) == 3 and i[2].__class__ is _RowValues)
+                                         for i in items):
+            static[branch] = _encode(items)
+    static[-1] = "[]"
+    dynamic = result._dynamic
+    return [_encode(result.actions(row)) if row in dynamic or branch not in static else static[branch]
+            for row, branch in enumerate(result.branch.tolist())]
+
+
+class IncrementalEvaluator:
+    """
+    Claims, active rule hashes and per-(claim, rule) actions persisted in one
+    SQLite file (":memory:" for a throwaway store). Results survive restarts;
+    pass the same rules again and nothing is re-evaluated.
+    """
+
+    def __init__(self, db_path: str, rules: Iterable[Union[str, Rule, CompiledRule]] = (), page_size: int = 10000):
+        self.page_size = page_size
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS claims (claim_id TEXT PRIMARY KEY, record TEXT NOT NULL) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS rules (rule_hash TEXT PRIMARY KEY, name TEXT NOT NULL) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS results ("
+            " claim_id TEXT NOT NULL, rule_hash TEXT NOT NULL, actions TEXT NOT NULL,"
+            " PRIMARY KEY (claim_id, rule_hash)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS results_by_rule ON results (rule_hash);"
+        )
+        self._db.commit()
+        self.rules: Dict[str, CompiledRule] = {}
+        self._readers: Dict[str, Set[str]] = {}
+        self._volatile: Set[str] = set()
+        if rules:
+            self.set_rules(rules)
+
+    # ---- rules ----
+    def set_rules(self, rules: Iterable[Union[str, Rule, CompiledRule]]) -> Dict[str, int]:
+        """Make rules the active set: evaluate new rules over stored claims, drop removed ones."""
+        compiled = [r if isinstance(r, CompiledRule) else compile_rule(r) for r in rules]
+        with self._lock:
+            stored = {row[0] for row in self._db.execute("SELECT rule_hash FROM rules")}
+            wanted = {c.hash: c for c in compiled}
+            removed = stored - wanted.keys()
+            for rule_hash in removed:
+                self._db.execute("DELETE FROM results WHERE rule_hash = ?", (rule_hash,))
+                self._db.execute("DELETE FROM rules WHERE rule_hash = ?", (rule_hash,))
+            self.rules = wanted
+            self._index_rules()
+            added = [c for h, c in wanted.items() if h not in stored]
+            evaluated = self._evaluate_all(added) if added else 0
+            self._db.executemany("INSERT OR REPLACE INTO rules (rule_hash, name) VALUES (?, ?)",
+                                 [(c.hash, c.name) for c in added])
+            self._db.commit()
+            return {"added": len(added), "removed": len(removed), "evaluated": evaluated}
+
+    def _index_rules(self):
+        self._readers = {}
+        self._volatile = set()
+        for rule_hash, rule in self.rules.items():
+            for path in rule.fields_read:
+                if path == "current_date":
+                    self._volatile.add(rule_hash)
+                else:
+                    self._readers.setdefault(path, set()).add(rule_hash)
+
+    def affected_rules(self, paths: Iterable[str]) -> Set[str]:
+        """Hashes of the active rules that read any of the given paths (or a path above/below them)."""
+        affected = set(self._volatile)
+        for changed in paths:
+            for read, hashes in self._readers.items():
+                if _related(changed, read):
+                    affected |= hashes
+        return affected
+
+    def _evaluate_all(self, rules: List[CompiledRule]) -> int:
+        count = 0
+        for ids, records in self._claim_pages():
+            count += self._evaluate(ids, records, rules)
+        return count
+
+    def _claim_pages(self) -> Iterator[Tuple[List[str], List[Dict[str, Any]]]]:
+        last = ""
+        while True:
+            rows = self._db.execute(
+                "SELECT claim_id, record FROM claims WHERE claim_id > ? ORDER BY claim_id LIMIT ?",
+                (last, self.page_size)).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [r[0] for r in rows], [json.loads(r[1]) for r in rows]
+
+    def _evaluate(self, ids: List[str], records: List[Dict[str, Any]], rules: Iterable[CompiledRule]) -> int:
+        batch = ColumnarBatch.from_records(records)
+        rows = []
+        for rule in rules:
+            encoded = _encoded_actions(evaluate_batch(rule, batch))
+            rows.extend(zip(ids, repeat(rule.hash), encoded))
+        self._db.executemany("INSERT OR REPLACE INTO results (claim_id, rule_hash, actions) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    # ---- claims ----
+    def upsert_claims(self, claims: Mapping[str, Dict[str, Any]]) -> Dict[str, int]:
+        """Store new/updated claims and re-evaluate only the (claim, rule) pairs their changes affect."""
+        with self._lock:
+            stored = self._load(list(claims))
+            changes = {claim_id: (None if claim_id not in stored else changed_paths(stored[claim_id], record))
+                       for claim_id, record in claims.items()}
+            return self._apply(dict(claims), changes)
+
+    def apply_delta(self, deltas: Mapping[str, Dict[str, Any]]) -> Dict[str, int]:
+        """Apply {claim_id: {dotted path: new value}} to stored claims and re-evaluate what they affect."""
+        with self._lock:
+            stored = self._load(list(deltas))
+            records, changes = {}, {}
+            for claim_id, delta in deltas.items():
+                record = stored.get(claim_id)
+                if record is None:
+                    record = {}
+                    for path, value in delta.items():
+                        set_path(record, path, value)
+                    records[claim_id], changes[claim_id] = record, None
+                    continue
+                for path, value in delta.items():
+                    set_path(record, path, value)
+                records[claim_id], changes[claim_id] = record, set(delta)
+            return self._apply(records, changes)
+
+    def _apply(self, records: Dict[str, Dict[str, Any]], changes: Dict[str, Optional[Set[str]]]) -> Dict[str, int]:
+        self._db.executemany("INSERT OR REPLACE INTO claims (claim_id, record) VALUES (?, ?)",
+                             [(claim_id, _encode(record)) for claim_id, record in records.items()])
+        # Group claims by the set of rules to re-run so each group is one columnar batch.
+        groups: Dict[frozenset, List[str]] = {}
+        for claim_id, paths in changes.items():
+            hashes = frozenset(self.rules) if paths is None else frozenset(self.affected_rules(paths))
+            if hashes:
+                groups.setdefault(hashes, []).append(claim_id)
+        evaluated = 0
+        for hashes, ids in groups.items():
+            rules = [self.rules[h] for h in sorted(hashes)]
+            for start in range(0, len(ids), self.page_size):
+                page = ids[start:start + self.page_size]
+                evaluated += self._evaluate(page, [records[i] for i in page], rules)
+        self._db.commit()
+        return {"claims": len(records), "evaluated": evaluated,
+                "skipped": len(records) * len(self.rules) - evaluated}
+
+    def delete_claims(self, claim_ids: Iterable[str]):
+        with self._lock:
+            ids = [(i,) for i in claim_ids]
+            self._db.executemany("DELETE FROM results WHERE claim_id = ?", ids)
+            self._db.executemany("DELETE FROM claims WHERE claim_id = ?", ids)
+            self._db.commit()
+
+    def _load(self, claim_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        loaded = {}
+        for start in range(0, len(claim_ids), 500):
+            batch = claim_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for claim_id, record in self._db.execute(
+                    f"SELECT claim_id, record FROM claims WHERE claim_id IN ({placeholders})", batch):
+                loaded[claim_id] = json.loads(record)
+        return loaded
+
+    # ---- results ----
+    def results(self, claim_id: str) -> Dict[str, List[tuple]]:
+        """Current actions of every active rule for a claim, keyed by rule name."""
+        with self._lock:
+            rows = self._db.execute("SELECT rule_hash, actions FROM results WHERE claim_id = ?", (claim_id,))
+            return {self.rules[h].name: [tuple(a) for a in json.loads(actions)]
+                    for h, actions in rows if h in self.rules}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,283 @@
+"""
+Shared-predicate network for evaluating a whole rule set against one claim.
+
+All rules of a set are compiled into a single Python function:
+  - alpha layer: every field path is read once; identical predicates across
+    rules are deduplicated by syntax tree. Numeric and string/date thresholds
+    on a field are indexed by sorted cut-points, so two bisects per field
+    decide every `field op constant` predicate on it. Equality and IN against
+    literals go through a hash index (value -> code), one lookup per field.
+    Other predicates (MATCHES, quantifiers, field-vs-field) used by more than
+    one rule are computed once into locals.
+  - beta layer: AND/OR subtrees shared by several rules are computed once.
+  - rules without an ELSE only run when one predicate they require (an
+    equality/IN test where possible) holds, so rules for other claim types
+    are skipped by a single check per group.
+Per-claim cost therefore grows with the number of distinct fields and
+predicates plus the rules that are actually activated, not with rule count.
+"""
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from app.dsl.nodes import (
+    And, Compare, Exists, Field, ForEach, IfAction, In, ListValue, Literal, Matches, Or, Rule,
+)
+from engine.compiler import CompiledRule, _Codegen, compile_rule
+
+_FLIPPED = {"<": ">", ">": "<", "<=": ">=", ">=": "<=", "==": "==", "!=": "!="}
+_LEAF_TYPES = (Compare, In, Matches, Exists, ForEach)
+
+
+def _iter_conditions(actions) -> Iterable:
+    for action in actions:
+        if isinstance(action, IfAction):
+            yield action.condition
+            yield from _iter_conditions(action.then)
+            yield from _iter_conditions(action.otherwise)
+
+
+def _rule_conditions(rule: Rule) -> Iterable:
+    for clause in rule.clauses:
+        yield clause.condition
+        yield from _iter_conditions(clause.actions)
+    yield from _iter_conditions(rule.otherwise)
+
+
+def _walk(condition) -> Iterable:
+    yield condition
+    if isinstance(condition, (And, Or)):
+        for item in condition.items:
+            yield from _walk(item)
+
+
+def _required(condition) -> Set:
+    """Leaf predicates that must hold for the condition to be true."""
+    if isinstance(condition, And):
+        return set().union(*(_required(i) for i in condition.items))
+    if isinstance(condition, Or):
+        return set.intersection(*(_required(i) for i in condition.items))
+    return {condition}
+
+
+def _normalize(node: Compare) -> Tuple[str, Any, Any]:
+    """(op, field side, literal side) with the field on the left where possible."""
+    if isinstance(node.left, Literal) and not isinstance(node.right, Literal):
+        return _FLIPPED[node.op], node.right, node.left
+    return node.op, node.left, node.right
+
+
+def _indexable_field(node) -> bool:
+    return isinstance(node, Field) and node.path != ("current_date",)
+
+
+class _NetworkCodegen(_Codegen):
+    """Codegen that resolves indexed predicates and shared subtrees to precomputed expressions."""
+
+    def __init__(self):
+        super().__init__()
+        self.namespace.update({"_bl": bisect_left, "_br": bisect_right})
+        self.resolved: Dict[Any, str] = {}
+
+    def cond(self, node, scope):
+        if not scope:
+            expr = self.resolved.get(node)
+            if expr is not None:
+                return expr
+        return super().cond(node, scope)
+
+
+class RuleNetwork:
+    """
+    A rule set compiled into one shared-predicate function.
+    evaluate(record) returns [(rule_index, actions), ...] for every rule that
+    produced actions, in rule order; actions equal CompiledRule.evaluate.
+    """
+
+    def __init__(self, rules: Iterable[Union[str, Rule, CompiledRule]]):
+        self.rules: List[CompiledRule] = [r if isinstance(r, CompiledRule) else compile_rule(r) for r in rules]
+        self.stats: Dict[str, int] = {}
+        codegen = _NetworkCodegen()
+        self.source = self._generate(codegen)
+        exec(compile(self.source, "<rule network>", "exec"), codegen.namespace)
+        self._fn = codegen.namespace["_network"]
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def evaluate(self, record: Dict[str, Any]) -> List[Tuple[int, List[tuple]]]:
+        return self._fn(record)
+
+    def evaluate_named(self, record: Dict[str, Any]) -> Dict[str, List[tuple]]:
+        """Actions keyed by rule name (later rules win on duplicate names)."""
+        return {self.rules[i].name: actions for i, actions in self._fn(record)}
+
+    # ---- code generation ----
+    def _generate(self, codegen: _NetworkCodegen) -> str:
+        rules = [c.rule for c in self.rules]
+        uses: Counter = Counter()
+        for rule in rules:
+            for condition in _rule_conditions(rule):
+                uses.update(_walk(condition))
+        leaves = [n for n in uses if isinstance(n, _LEAF_TYPES)]
+
+        thresholds: Dict[Tuple[tuple, str], Set] = defaultdict(set)
+        equalities: Dict[tuple, List] = defaultdict(list)
+        for leaf in leaves:
+            if isinstance(leaf, Compare):
+                op, field, literal = _normalize(leaf)
+                if not (_indexable_field(field) and isinstance(literal, Literal)):
+                    continue
+                if op in ("==", "!="):
+                    equalities[field.path].append(literal.value)
+                elif literal.kind == "number":
+                    thresholds[(field.path, "num")].add(literal.value)
+                elif literal.kind in ("string", "date"):
+                    thresholds[(field.path, "str")].add(literal.value)
+            elif (isinstance(leaf, In) and _indexable_field(leaf.left) and isinstance(leaf.container, ListValue)
+                  and all(isinstance(i, Literal) for i in leaf.container.items)):
+                equalities[leaf.left.path].extend(i.value for i in leaf.container.items)
+
+        lines = ["def _network(r):", "    _out = []"]
+        # Field reads, sharing path prefixes (claim.amount and claim.type read `claim` once).
+        indexed_paths = sorted({p for p, _ in thresholds} | set(equalities))
+        for path in indexed_paths:
+            for length in range(1, len(path) + 1):
+                prefix = path[:length]
+                if prefix not in codegen.paths:
+                    expr = codegen.access(Field(prefix), {})
+                    name = codegen._name("_f")
+                    lines.append(f"    {name} = {expr}")
+                    codegen.paths[prefix] = name
+
+        # Sorted cut-points: lo = #thresholds < value, hi = #thresholds <= value.
+        for (path, kind), values in sorted(thresholds.items(), key=lambda item: (item[0][0], item[0][1])):
+            cuts = sorted(values)
+            local = codegen.paths[path]
+            ok, lo, hi = codegen._name("_n"), codegen._name("_lo"), codegen._name("_hi")
+            guard = f"{local}.__class__ in _NUM and {local} == {local}" if kind == "num" else f"{local}.__class__ is str"
+            table = codegen.const(cuts)
+            lines.append(f"    {ok} = {guard}")
+            lines.append(f"    {lo} = _bl({table}, {local}) if {ok} else -1")
+            lines.append(f"    {hi} = _br({table}, {local}) if {ok} else -1")
+            position = {value: i for i, value in enumerate(cuts)}
+            for leaf in leaves:
+                if not isinstance(leaf, Compare):
+                    continue
+                op, field, literal = _normalize(leaf)
+                if (op in ("==", "!=") or not isinstance(field, Field) or field.path != path
+                        or not isinstance(literal, Literal)
+                        or ("num" if literal.kind == "number" else "str") != kind
+                        or literal.kind not in ("number", "string", "date")):
+                    continue
+                i = position[literal.value]
+                codegen.resolved[leaf] = {
+                    ">": f"({i} < {lo})", ">=": f"({i} < {hi})",
+                    "<": f"({ok} and {i} >= {hi})", "<=": f"({ok} and {i} >= {lo})",
+                }[op]
+
+        # Hash index: one lookup per field maps its value to the code of the literal it equals.
+        for path in sorted(equalities):
+            codes: Dict[Any, int] = {}
+            for value in equalities[path]:
+                codes.setdefault(value, len(codes))
+            local = codegen.paths[path]
+            key = codegen._name("_h")
+            lines.append(f"    {key} = {codegen.const(codes)}.get({local}, -1) if {local}.__hash__ else -1")
+            for leaf in leaves:
+                if isinstance(leaf, Compare):
+                    op, field, literal = _normalize(leaf)
+                    if op in ("==", "!=") and isinstance(literal, Literal) and _indexable_field(field) \
+                            and field.path == path:
+                        codegen.resolved[leaf] = f"({key} {op} {codes[literal.value]})"
+                elif isinstance(leaf, In) and _indexable_field(leaf.left) and leaf.left.path == path \
+                        and isinstance(leaf.container, ListValue) \
+                        and all(isinstance(i, Literal) for i in leaf.container.items):
+                    members = frozenset(codes[i.value] for i in leaf.container.items)
+                    codegen.resolved[leaf] = f"({key} in {codegen.const(members)})"
+
+        # Remaining shared predicates and shared AND/OR subtrees: computed once, children first.
+        shared = 0
+        for node in _post_order(uses):
+            if uses[node] > 1 and node not in codegen.resolved:
+                name = codegen._name("_p")
+                lines.append(f"    {name} = {codegen.cond(node, {})}")
+                codegen.resolved[node] = name
+                shared += 1
+
+        # Rules, grouped under the cheapest predicate they require.
+        groups: Dict[Optional[str], List[int]] = defaultdict(list)
+        for index, rule in enumerate(rules):
+            groups[self._watch(rule, codegen)].append(index)
+        for watch, indexes in groups.items():
+            indent = "    "
+            if watch is not None:
+                lines.append(f"    if {watch}:")
+                indent = "        "
+            for index in indexes:
+                lines.extend(self._rule_lines(index, rules[index], codegen, indent))
+        if len(groups) > 1:
+            lines.append("    _out.sort(key=_first)")
+            codegen.namespace["_first"] = itemgetter(0)
+        lines.append("    return _out")
+
+        self.stats = {
+            "rules": len(rules),
+            "predicates": sum(uses[n] for n in leaves),
+            "distinct_predicates": len(leaves),
+            "indexed_fields": len(indexed_paths),
+            "shared_nodes": shared,
+            "guarded_rules": sum(len(v) for k, v in groups.items() if k is not None),
+        }
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _watch(rule: Rule, codegen: _NetworkCodegen) -> Optional[str]:
+        """Expression of a cheap predicate every firing clause requires (None if the rule always runs)."""
+        if rule.otherwise or not rule.clauses:
+            return None
+        required = set.intersection(*(_required(c.condition) for c in rule.clauses))
+        candidates = [codegen.resolved[n] for n in required if n in codegen.resolved]
+        if not candidates:
+            return None
+        # Hash-index tests are the most selective; prefer them over thresholds and locals.
+        return sorted(candidates, key=lambda e: (not e.startswith("(_h"), e))[0]
+
+    @staticmethod
+    def _rule_lines(index: int, rule: Rule, codegen: _NetworkCodegen, indent: str) -> List[str]:
+        inner = indent + "    "
+        lines = []
+        for i, clause in enumerate(rule.clauses):
+            lines.append(f"{indent}{'if' if i == 0 else 'elif'} {codegen.cond(clause.condition, {})}:")
+            lines.extend(_emit(index, clause.actions, codegen, inner))
+        if rule.otherwise:
+            lines.append(f"{indent}else:")
+            lines.extend(_emit(index, rule.otherwise, codegen, inner))
+        return lines
+
+
+def _emit(index: int, actions, codegen: _NetworkCodegen, indent: str) -> List[str]:
+    lines = [f"{indent}_o = []"]
+    lines.extend(codegen.actions(actions, indent, out="_o"))
+    lines.append(f"{indent}if _o:")
+    lines.append(f"{indent}    _out.append(({index}, _o))")
+    return lines
+
+
+def _post_order(uses: Counter) -> List:
+    """Condition nodes ordered so that children come before their parents."""
+    ordered, seen = [], set()
+
+    def visit(node):
+        if node in seen:
+            return
+        seen.add(node)
+        if isinstance(node, (And, Or)):
+            for item in node.items:
+                visit(item)
+        ordered.append(node)
+
+    for node in uses:
+        visit(node)
+    return ordered
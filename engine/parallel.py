@@ -0,0 +1,276 @@
+"""
+Multi-process evaluation of a rule set over a partitioned claim dataset.
+
+The dataset is copied once into shared memory, either as typed columns
+(SharedColumns) or as JSON lines with row offsets (SharedRecords) for nested
+claims. The columns are float/int/bool/fixed-width strings plus an optional
+missing mask. A persistent process pool receives the compiled rule set once,
+through the pool initializer. Each task then names only a buffer and a row
+range, so workers map their partition without pickling or copying the data,
+and evaluate it with the columnar engine. Results come back in partition
+order. At most max_pending partitions are in flight, so a slow consumer
+holds back the workers instead of buffering the whole result set in memory.
+"""
+import json
+import multiprocessing
+import os
+from abc import ABC, abstractmethod
+from collections import deque
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.dsl.nodes import Rule
+from engine.columnar import BatchResult, Column, ColumnarBatch, evaluate_batch
+from engine.compiler import CompiledRule, compile_rule
+
+
+def _create(nbytes: int) -> shared_memory.SharedMemory:
+    return shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block owned (and unlinked) by the parent process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: workers share the parent's resource tracker, so this is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+class _SharedBuffer:
+    """Owner side of a set of shared memory blocks."""
+
+    def __init__(self):
+        self._blocks: List[shared_memory.SharedMemory] = []
+
+    def _share(self, array: np.ndarray) -> tuple:
+        array = np.ascontiguousarray(array)
+        block = _create(array.nbytes)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        self._blocks.append(block)
+        return block.name, array.dtype.str, array.shape
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _typed(values: Sequence[Any]):
+    """Typed array + missing mask for a list of Python values, or None if the column is mixed."""
+    present = [v for v in values if v is not None]
+    missing = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    classes = {v.__class__ for v in present}
+    if classes <= {int}:
+        return np.array([0 if v is None else v for v in values], dtype=np.int64), missing
+    if classes <= {int, float}:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64), missing
+    if classes <= {bool}:
+        return np.array([bool(v) for v in values], dtype=bool), missing
+    if classes <= {str}:
+        return np.array(["" if v is None else v for v in values], dtype=str), missing
+    return None
+
+
+class SharedColumns(_SharedBuffer):
+    """Typed columns (dotted path -> array) copied once into shared memory."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], missing: Optional[Dict[str, np.ndarray]] = None):
+        super().__init__()
+        missing = missing or {}
+        sizes = {len(a) for a in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(sizes)}")
+        self.size = sizes.pop() if sizes else 0
+        shared = {}
+        for path, array in columns.items():
+            array = np.asarray(array)
+            if array.dtype.kind == "O":
+                raise ValueError(f"Column {path!r} has object dtype; shared columns must be typed")
+            mask = missing.get(path)
+            shared[path] = (self._share(array), None if mask is None else self._share(np.asarray(mask, dtype=bool)))
+        self.spec = {"kind": "columns", "size": self.size, "columns": shared}
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]], paths: Iterable[str]) -> "SharedColumns":
+        """Extract typed columns for the given paths; mixed-type fields are rejected."""
+        batch = ColumnarBatch.from_records(list(records))
+        columns, missing = {}, {}
+        for path in paths:
+            typed = _typed(batch.column(path).values)
+            if typed is None:
+                raise ValueError(f"Field {path!r} mixes value types; use SharedRecords for it")
+            columns[path], missing[path] = typed
+        return cls(columns, missing)
+
+
+class SharedRecords(_SharedBuffer):
+    """Claim records serialized once as JSON lines in shared memory, with row offsets."""
+
+    def __init__(self, records: Iterable[Dict[str, Any]]):
+        super().__init__()
+        lines = [json.dumps(r, separators=(",", ":")).encode("utf-8") for r in records]
+        offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+        np.cumsum([len(line) for line in lines], out=offsets[1:])
+        self.size = len(lines)
+        data = np.frombuffer(b"".join(lines), dtype=np.uint8)
+        self.spec = {"kind": "records", "size": self.size,
+                     "data": self._share(data), "offsets": self._share(offsets)}
+
+
+class _Attached(ABC):
+    """Worker side: shared blocks mapped into this process, sliced into batches without copying."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self._blocks: List[shared_memory.SharedMemory] = []
+
+    def _view(self, shared: Optional[tuple]) -> Optional[np.ndarray]:
+        if shared is None:
+            return None
+        name, dtype, shape = shared
+        block = _attach(name)
+        self._blocks.append(block)
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    @abstractmethod
+    def batch(self, start: int, stop: int) -> ColumnarBatch:
+        """Rows [start, stop) of the shared dataset."""
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+        self._blocks = []
+
+
+class _AttachedColumns(_Attached):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.columns = {path: (self._view(data), self._view(mask)) for path, (data, mask) in spec["columns"].items()}
+
+    def batch(self, start: int, stop: int) -> ColumnarBatch:
+        return ColumnarBatch.from_columns({
+            path: Column.from_array(data[start:stop], None if mask is None else mask[start:stop])
+            for path, (data, mask) in self.columns.items()
+        }) if self.columns else ColumnarBatch(stop - start)
+
+
+class _AttachedRecords(_Attached):
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.data = self._view(spec["data"])
+        self.offsets = self._view(spec["offsets"])
+
+    def batch(self, start: int, stop: int) -> ColumnarBatch:
+        offsets = self.offsets
+        raw = self.data[offsets[start]:offsets[stop]].tobytes()
+        base = int(offsets[start])
+        records = [json.loads(raw[int(offsets[i]) - base:int(offsets[i + 1]) - base]) for i in range(start, stop)]
+        return ColumnarBatch.from_records(records)
+
+
+# ---- worker process state ----
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(rules: List[Rule]):
+    _worker["rules"] = [compile_rule(rule) for rule in rules]
+    _worker["data"] = {}
+
+
+def _evaluate_partition(spec_key: str, spec: Dict[str, Any], start: int, stop: int):
+    data = _worker["data"].get(spec_key)
+    if data is None:
+        # A new dataset: release the mappings of the previous one.
+        for previous in _worker["data"].values():
+            previous.close()
+        _worker["data"].clear()
+        data = _worker["data"][spec_key] = (
+            _AttachedColumns(spec) if spec["kind"] == "columns" else _AttachedRecords(spec))
+    batch = data.batch(start, stop)
+    parts = []
+    for rule in _worker["rules"]:
+        result = evaluate_batch(rule, batch)
+        parts.append((result.branch, result.codes, result._branch_actions, result._dynamic))
+    return parts
+
+
+class PartitionResult:
+    """Results for rows [start, stop): one BatchResult per rule, row indexes relative to start."""
+
+    def __init__(self, start: int, stop: int, results: List[BatchResult]):
+        self.start = start
+        self.stop = stop
+        self.results = results
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def actions(self, row: int) -> List[List[tuple]]:
+        """Per-rule actions for a row of this partition."""
+        return [result.actions(row) for result in self.results]
+
+
+class ParallelEvaluator:
+    """
+    A process pool holding one compiled rule set. processes=0 evaluates in
+    the calling process (same code path, no pool).
+    """
+
+    def __init__(self, rules: Iterable[Union[str, Rule, CompiledRule]], processes: Optional[int] = None,
+                 partition_size: int = 50000, max_pending: Optional[int] = None):
+        self.rules: List[CompiledRule] = [r if isinstance(r, CompiledRule) else compile_rule(r) for r in rules]
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.partition_size = partition_size
+        self.max_pending = max_pending or max(2 * self.processes, 1)
+        self._pool = None
+        asts = [r.rule for r in self.rules]
+        if self.processes > 0:
+            # Workers must share this process's resource tracker, or each would start its own
+            # and unlink the blocks it saw when it exits.
+            resource_tracker.ensure_running()
+            self._pool = multiprocessing.get_context().Pool(self.processes, initializer=_init_worker, initargs=(asts,))
+        else:
+            _init_worker(asts)
+
+    def map(self, data: Union[SharedColumns, SharedRecords]) -> Iterator[PartitionResult]:
+        """Evaluate every partition of a shared dataset, yielding results in row order."""
+        spec, size = data.spec, data.size
+        spec_key = repr(spec)
+        ranges = ((start, min(start + self.partition_size, size)) for start in range(0, size, self.partition_size))
+        if self._pool is None:
+            for start, stop in ranges:
+                yield self._wrap(start, stop, _evaluate_partition(spec_key, spec, start, stop))
+            return
+        pending = deque()
+        for start, stop in ranges:
+            pending.append((start, stop, self._pool.apply_async(_evaluate_partition, (spec_key, spec, start, stop))))
+            if len(pending) >= self.max_pending:
+                start0, stop0, handle = pending.popleft()
+                yield self._wrap(start0, stop0, handle.get())
+        while pending:
+            start0, stop0, handle = pending.popleft()
+            yield self._wrap(start0, stop0, handle.get())
+
+    def _wrap(self, start: int, stop: int, parts) -> PartitionResult:
+        return PartitionResult(start, stop, [BatchResult(rule, *part) for rule, part in zip(self.rules, parts)])
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
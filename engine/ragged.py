@@ -0,0 +1,66 @@
+"""
+Ragged (list-valued) columns for collection quantifiers.
+
+A RaggedArray stores the items of every row's collection flattened into one
+array plus offsets into it, like an Arrow list array: row i owns
+values[offsets[i]:offsets[i + 1]]. Conditions inside FOR EACH / EXISTS are
+evaluated once over the flattened items, and per-row results come from
+segment reductions (np.add.reduceat over the non-empty segments) instead of a
+Python loop per item.
+"""
+from itertools import chain
+from typing import Any, Sequence
+
+import numpy as np
+
+
+class RaggedArray:
+    __slots__ = ("offsets", "values", "_parent_index")
+
+    def __init__(self, offsets: np.ndarray, values: np.ndarray):
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.values = values
+        self._parent_index = None
+
+    @classmethod
+    def from_lists(cls, lists: Sequence[Any]) -> "RaggedArray":
+        """Flatten per-row collections; anything that is not a list is an empty collection."""
+        lengths = np.fromiter((len(v) if isinstance(v, list) else 0 for v in lists),
+                              dtype=np.int64, count=len(lists))
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.fromiter(chain.from_iterable(v for v in lists if isinstance(v, list)),
+                             dtype=object, count=int(offsets[-1]))
+        return cls(offsets, values)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def parent_index(self) -> np.ndarray:
+        """Row that owns each flattened item."""
+        if self._parent_index is None:
+            self._parent_index = np.repeat(np.arange(len(self), dtype=np.int64), self.lengths)
+        return self._parent_index
+
+    def count(self, mask: np.ndarray) -> np.ndarray:
+        """Number of items per row for which mask is True."""
+        counts = np.zeros(len(self), dtype=np.int64)
+        lengths = self.lengths
+        nonempty = lengths > 0
+        if nonempty.any():
+            # Consecutive non-empty segments tile the item array, so reduceat over their starts is exact.
+            counts[nonempty] = np.add.reduceat(mask.astype(np.int64), self.offsets[:-1][nonempty])
+        return counts
+
+    def any(self, mask: np.ndarray) -> np.ndarray:
+        """EXISTS: at least one item matches (False for empty collections)."""
+        return self.count(mask) > 0
+
+    def all(self, mask: np.ndarray) -> np.ndarray:
+        """FOR EACH: every item matches (True for empty collections)."""
+        return self.count(mask) == self.lengths
@@ -0,0 +1,156 @@
+"""
+Runtime helpers shared by compiled rules.
+
+Value semantics used by every evaluator in this package:
+  - records are dicts keyed by entity ({"claim": {...}, "patient": {...}})
+  - a missing field reads as None
+  - ordering comparisons (<, >, <=, >=) are False when either side is None or
+    the types are not comparable; == and != use plain Python equality
+  - dates are ISO `YYYY-MM-DD` strings; `N days` arithmetic on them returns
+    ISO strings; `current_date` defaults to today unless the record sets it
+"""
+import datetime
+import re
+from functools import lru_cache
+
+NUMERIC = frozenset((int, float))
+
+# Action codes used in action tuples and in columnar action arrays.
+APPROVE = "APPROVE"
+REJECT = "REJECT"
+SET = "SET"
+FLAG = "FLAG"
+CONTINUE = "CONTINUE"
+
+
+def get(value, key):
+    """value[key] when value is a dict; None for missing or non-dict intermediates."""
+    return value.get(key) if isinstance(value, dict) else None
+
+
+def today() -> str:
+    return datetime.date.today().isoformat()
+
+
+def _is_number(value) -> bool:
+    return value.__class__ in NUMERIC
+
+
+def _shift_date(value, days, sign):
+    try:
+        date = datetime.date.fromisoformat(value[:10])
+    except (TypeError, ValueError):
+        return None
+    return (date + datetime.timedelta(days=sign * days)).isoformat()
+
+
+class Days:
+    """A `N days` duration operand."""
+    __slots__ = ("days",)
+
+    def __init__(self, days):
+        self.days = days
+
+
+def add(a, b):
+    if a is None or b is None:
+        return None
+    if isinstance(b, Days):
+        return _shift_date(a, b.days, 1) if isinstance(a, str) else None
+    if isinstance(a, Days):
+        return _shift_date(b, a.days, 1) if isinstance(b, str) else None
+    if _is_number(a) and _is_number(b):
+        return a + b
+    return None
+
+
+def sub(a, b):
+    if a is None or b is None:
+        return None
+    if isinstance(b, Days):
+        return _shift_date(a, b.days, -1) if isinstance(a, str) else None
+    if _is_number(a) and _is_number(b):
+        return a - b
+    return None
+
+
+def mul(a, b):
+    if _is_number(a) and _is_number(b):
+        return a * b
+    return None
+
+
+def div(a, b):
+    if _is_number(a) and _is_number(b) and b != 0:
+        return a / b
+    return None
+
+
+def ordered(op):
+    """Return a None/type-safe ordering comparison for op."""
+    def compare(a, b):
+        if a is None or b is None:
+            return False
+        try:
+            return op(a, b)
+        except TypeError:
+            return False
+    return compare
+
+
+def contains(value, container) -> bool:
+    """`value IN container` where container is a runtime list (or None)."""
+    if container is None:
+        return False
+    try:
+        return value in container
+    except TypeError:
+        return False
+
+
+@lru_cache(maxsize=1024)
+def compile_pattern(pattern: str):
+    return re.compile(pattern)
+
+
+def matches(value, pattern) -> bool:
+    """`value MATCHES pattern` where the pattern is only known at runtime."""
+    if not isinstance(value, str) or not isinstance(pattern, str):
+        return False
+    try:
+        return compile_pattern(pattern).search(value) is not None
+    except re.error:
+        return False
+
+
+@lru_cache(maxsize=256)
+def plural(entity: str) -> str:
+    if entity.endswith("is"):
+        return entity[:-2] + "es"
+    if entity.endswith("y") and entity[-2:-1] not in "aeiou":
+        return entity[:-1] + "ies"
+    if entity.endswith(("s", "x", "ch", "sh")):
+        return entity + "es"
+    return entity + "s"
+
+
+def collection_paths(entity: str):
+    """Record paths an `EXISTS entity WHERE ...` may iterate over, in lookup order."""
+    return (entity, plural(entity), f"claim.{plural(entity)}")
+
+
+def collection(record, entity):
+    """
+    Resolve the collection an `EXISTS entity WHERE ...` iterates over:
+    record[entity], record[<plural>] or claim[<plural>], whichever is a list first.
+    """
+    many = plural(entity)
+    for candidate in (record.get(entity), record.get(many), get(record.get("claim"), many)):
+        if isinstance(candidate, list):
+            return candidate
+    return ()
+
+
+def items(value):
+    """Iterate a FOR EACH collection; non-lists iterate as empty."""
+    return value if isinstance(value, list) else ()
@@ -0,0 +1,310 @@
+"""
+Streaming evaluation of claim files (JSONL or CSV) against a rule set.
+
+The input is memory-mapped and cut into chunks of about chunk_size bytes,
+each ending on a line boundary. Each chunk is parsed into a columnar batch:
+JSONL lines become records, and CSV columns become arrays keyed by their
+header (dotted paths such as claim.amount). CSV cells are strings (codes such
+as "99213" or NPIs stay comparable to string literals) unless column_types
+(--type claim.amount=float) declares the column int, float or bool for the
+whole file; a cell that does not parse as the declared type stays a string. The batch is evaluated
+with the columnar engine and its results are appended to the output
+(JSONL or CSV) before the next chunk is read, so memory stays bounded by
+the chunk size whatever the file size.
+
+After every chunk a checkpoint next to the output records the input offset,
+the rows done and the output size. A run with resume=True (--resume)
+truncates the output to the last checkpoint and continues from that byte
+offset; start_offset starts from an explicit offset instead.
+
+CSV rows must not contain embedded newlines.
+
+Usage:
+    python -m engine.stream rules.dsl claims.jsonl -o results.jsonl [--resume]
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import mmap
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.dsl.nodes import Rule
+from app.dsl.parser import parse_rules
+from engine.columnar import Column, ColumnarBatch, evaluate_batch
+from engine.compiler import CompiledRule, compile_rule, rule_hash
+
+logger = logging.getLogger("engine.stream")
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+CSV_OUTPUT_FIELDS = ("row", "rule", "action", "detail", "value")
+_encode = json.JSONEncoder(default=str).encode
+
+
+def _format(path: str, explicit: Optional[str] = None) -> str:
+    fmt = explicit or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unsupported format: {fmt}")
+    return fmt
+
+
+def iter_chunks(mapped: Union[mmap.mmap, bytes], start: int = 0,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, int]]:
+    """(start, end) byte ranges of about chunk_size bytes that end on a line boundary."""
+    size = len(mapped)
+    position = start
+    while position < size:
+        newline = mapped.find(b"\n", min(position + chunk_size, size) - 1)
+        end = size if newline == -1 else newline + 1
+        yield position, end
+        position = end
+
+
+COLUMN_TYPES = ("str", "int", "float", "bool")
+
+
+def _parse_cell(cell: str, kind: str) -> Any:
+    """One CSV cell as the declared type; the text itself if it does not parse."""
+    try:
+        if kind == "int":
+            return int(cell)
+        if kind == "float":
+            return float(cell)
+    except ValueError:
+        return cell
+    lowered = cell.lower()
+    return lowered == "true" if lowered in ("true", "false") else cell
+
+
+def _csv_column(values: Sequence[str], kind: str = "str") -> Column:
+    """Column for CSV text: strings, or the declared int/float/bool type (empty cells are missing)."""
+    text = np.asarray(values, dtype=str)
+    missing = text == ""
+    if kind != "str":
+        try:
+            if kind == "int":
+                return Column.from_array(np.where(missing, "0", text).astype(np.int64), missing)
+            if kind == "float":
+                return Column.from_array(np.where(missing, "nan", text).astype(np.float64), missing)
+            lowered = np.char.lower(text)
+            if np.all(missing | (lowered == "true") | (lowered == "false")):
+                return Column.from_array(lowered == "true", missing)
+        except (ValueError, OverflowError):
+            pass
+        # Some cells are not of the declared type (or beyond int64): convert cell by cell.
+        return Column(np.array([None if cell == "" else _parse_cell(cell, kind) for cell in text.tolist()],
+                               dtype=object))
+    return Column.from_array(text, missing)
+
+
+def _parse_jsonl(data: bytes) -> Tuple[List[Dict[str, Any]], List[Tuple[int, str]]]:
+    lines = [line for line in data.splitlines() if line.strip()]
+    try:
+        # One decoder call for the whole chunk; fall back to line by line to locate bad lines.
+        records = json.loads(b"[" + b",".join(lines) + b"]")
+        if all(isinstance(r, dict) for r in records):
+            return records, []
+    except ValueError:
+        pass
+    records, errors = [], []
+    for line in lines:
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("line is not a JSON object")
+            records.append(record)
+        except ValueError as e:
+            errors.append((len(records), str(e)))
+            records.append({})
+    return records, errors
+
+
+def _parse_csv(data: bytes, header: List[str], column_types: Dict[str, str]) -> ColumnarBatch:
+    rows = [row for row in csv.reader(io.StringIO(data.decode("utf-8"))) if row]
+    columns = {name: _csv_column([row[i] if i < len(row) else "" for row in rows], column_types.get(name, "str"))
+               for i, name in enumerate(header)}
+    return ColumnarBatch(len(rows), columns)
+
+
+class StreamStats:
+    def __init__(self, rows: int = 0, bytes_read: int = 0, errors: int = 0):
+        self.rows = rows
+        self.bytes_read = bytes_read
+        self.errors = errors
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_read / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes_read,
+            "errors": self.errors,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "bytes_per_second": round(self.bytes_per_second, 1),
+        }
+
+
+class StreamEvaluator:
+    def __init__(self, rules: Iterable[Union[str, Rule, CompiledRule]], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 column_types: Optional[Dict[str, str]] = None):
+        self.rules: List[CompiledRule] = [r if isinstance(r, CompiledRule) else compile_rule(r) for r in rules]
+        self.chunk_size = chunk_size
+        self.column_types = dict(column_types or {})
+        unknown = {t for t in self.column_types.values() if t not in COLUMN_TYPES}
+        if unknown:
+            raise ValueError(f"Unsupported column type(s): {', '.join(sorted(unknown))}")
+        self.rules_hash = rule_hash(tuple(r.rule for r in self.rules))
+
+    @classmethod
+    def from_file(cls, rules_path: str, **kwargs) -> "StreamEvaluator":
+        with open(rules_path, "r", encoding="utf-8") as f:
+            return cls(parse_rules(f.read()), **kwargs)
+
+    def iter_batches(self, input_path: str, input_format: Optional[str] = None,
+                     start_offset: int = 0) -> Iterator[Tuple[int, int, ColumnarBatch, List[Tuple[int, str]]]]:
+        """Yield (chunk start, chunk end, batch, parse errors) for the input from start_offset on."""
+        fmt = _format(input_path, input_format)
+        with open(input_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                header: List[str] = []
+                if fmt == "csv":
+                    header_end = mapped.find(b"\n")
+                    header_end = len(mapped) if header_end == -1 else header_end + 1
+                    header = next(csv.reader([mapped[:header_end].decode("utf-8-sig").strip()]), [])
+                    start_offset = max(start_offset, header_end)
+                for start, end in iter_chunks(mapped, start_offset, self.chunk_size):
+                    data = mapped[start:end]
+                    if fmt == "csv":
+                        yield start, end, _parse_csv(data, header, self.column_types), []
+                    else:
+                        records, errors = _parse_jsonl(data)
+                        yield start, end, ColumnarBatch.from_records(records), errors
+
+    def iter_results(self, input_path: str, input_format: Optional[str] = None,
+                     start_offset: int = 0) -> Iterator[List[List[tuple]]]:
+        """Per input row, the actions of every rule (API counterpart of run())."""
+        for _, _, batch, _ in self.iter_batches(input_path, input_format, start_offset):
+            results = [evaluate_batch(rule, batch) for rule in self.rules]
+            for row in range(len(batch)):
+                yield [result.actions(row) for result in results]
+
+    def run(self, input_path: str, output_path: str, input_format: Optional[str] = None,
+            output_format: Optional[str] = None, start_offset: int = 0, resume: bool = False,
+            progress_every: float = 5.0) -> StreamStats:
+        """Evaluate the input file and append results to output_path, checkpointing after each chunk."""
+        out_fmt = _format(output_path, output_format)
+        checkpoint_path = output_path + ".checkpoint"
+        row = 0
+        output_size = None
+        if resume and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("rules_hash") != self.rules_hash:
+                raise ValueError("Checkpoint was written for a different rule set")
+            start_offset, row, output_size = checkpoint["offset"], checkpoint["rows"], checkpoint["output_bytes"]
+            logger.info(f"Resuming {input_path} at byte {start_offset} (row {row}).")
+
+        stats = StreamStats()
+        started = last_report = time.perf_counter()
+        # Without a checkpoint to resume from, the output is rewritten rather than appended to.
+        with open(output_path, "ab" if output_size is not None else "wb") as raw_out:
+            if output_size is not None:
+                raw_out.truncate(output_size)
+                raw_out.seek(0, os.SEEK_END)
+            out = io.TextIOWrapper(raw_out, encoding="utf-8", newline="")
+            writer = csv.writer(out) if out_fmt == "csv" else None
+            if writer is not None and raw_out.tell() == 0:
+                writer.writerow(CSV_OUTPUT_FIELDS)
+            for start, end, batch, errors in self.iter_batches(input_path, input_format, start_offset):
+                error_rows = dict(errors)
+                results = [evaluate_batch(rule, batch) for rule in self.rules]
+                for i in range(len(batch)):
+                    self._write_row(out, writer, row + i, results, i, error_rows.get(i))
+                out.flush()
+                row += len(batch)
+                stats.rows += len(batch)
+                stats.bytes_read += end - start
+                stats.errors += len(errors)
+                self._checkpoint(checkpoint_path, end, row, raw_out.tell())
+                now = time.perf_counter()
+                stats.elapsed = now - started
+                if now - last_report >= progress_every:
+                    last_report = now
+                    logger.info(f"{stats.rows} rows, {stats.rows_per_second:.0f} rows/s, "
+                                f"{stats.bytes_per_second / 1e6:.1f} MB/s (offset {end})")
+            out.detach()
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    def _write_row(self, out, writer, row: int, results, index: int, error: Optional[str]):
+        if writer is None:
+            record: Dict[str, Any] = {"row": row}
+            if error is not None:
+                record["error"] = error
+            else:
+                record["results"] = {
+                    rule.name: [list(a) for a in result.actions(index)] for rule, result in zip(self.rules, results)}
+            out.write(_encode(record) + "\n")
+            return
+        if error is not None:
+            writer.writerow((row, "", "ERROR", error, ""))
+            return
+        for rule, result in zip(self.rules, results):
+            for action in result.actions(index):
+                detail, value = (action[1], action[2]) if len(action) == 3 else (action[1], "")
+                writer.writerow((row, rule.name, action[0], "" if detail is None else detail, value))
+
+    def _checkpoint(self, path: str, offset: int, rows: int, output_bytes: int):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"offset": offset, "rows": rows, "output_bytes": output_bytes,
+                       "rules_hash": self.rules_hash}, f)
+        os.replace(tmp_path, path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m engine.stream", description="Evaluate a claim file against DSL rules.")
+    parser.add_argument("rules", help="File with one or more DSL rules")
+    parser.add_argument("input", help="Claims file (.jsonl or .csv)")
+    parser.add_argument("-o", "--output", required=True, help="Results file (.jsonl or .csv)")
+    parser.add_argument("--input-format", choices=("jsonl", "csv"))
+    parser.add_argument("--output-format", choices=("jsonl", "csv"))
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Bytes per chunk")
+    parser.add_argument("--start-offset", type=int, default=0, help="Byte offset to start reading from")
+    parser.add_argument("--resume", action="store_true", help="Continue from the output's checkpoint")
+    parser.add_argument("--type", action="append", default=[], metavar="COLUMN=TYPE",
+                        help=f"Type of a CSV column ({', '.join(COLUMN_TYPES)}); columns are strings otherwise")
+    args = parser.parse_args(argv)
+
+    column_types = {}
+    for spec in args.type:
+        column, _, kind = spec.partition("=")
+        if kind not in COLUMN_TYPES:
+            parser.error(f"--type {spec}: expected COLUMN=TYPE with TYPE one of {', '.join(COLUMN_TYPES)}")
+        column_types[column] = kind
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    evaluator = StreamEvaluator.from_file(args.rules, chunk_size=args.chunk_size, column_types=column_types)
+    stats = evaluator.run(args.input, args.output, args.input_format, args.output_format,
+                          start_offset=args.start_offset, resume=args.resume)
+    print(json.dumps(stats.as_dict()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
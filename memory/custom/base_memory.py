@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 
 class BaseMemory(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def load(self, *args, **kwargs):
         pass
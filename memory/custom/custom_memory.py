@@ -1,6 +1,8 @@
 from .base_memory import BaseMemory
 
 class CustomMemory(BaseMemory):
+    __slots__ = ("data",)
+
     def __init__(self, data=None):
         self.data = data or []
 
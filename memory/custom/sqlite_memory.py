@@ -0,0 +1,174 @@
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .base_memory import BaseMemory
+from .windowed_memory import Summarizer, Turn, summary_message, to_turn
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    start_tokens INTEGER NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS turns_by_tokens ON turns (session_id, start_tokens);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL,
+    cum_tokens INTEGER NOT NULL,
+    start_seq INTEGER NOT NULL,
+    summary TEXT,
+    summarized_seq INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+_connections: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+_connections_lock = threading.Lock()
+
+
+def _connect(path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    """One shared connection (and write lock) per database file."""
+    with _connections_lock:
+        connection = _connections.get(path)
+        if connection is None:
+            if path != ":memory:" and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SCHEMA)
+            connection = (db, threading.Lock())
+            if path != ":memory:":
+                _connections[path] = connection
+        return connection
+
+
+class SQLiteMemory(BaseMemory):
+    """
+    Conversation memory persisted as an append-only log of turns per session.
+    Each turn stores the session's token total before it, so load() seeks
+    straight to the turns inside the token window: its cost depends on the
+    window, not on the length of the session's history. clear() moves the
+    session's start past the current turns instead of deleting them.
+    Evicted turns can be folded into a stored summary, like WindowedMemory.
+    The summarizer runs outside the write lock; its result is stored only if
+    no other writer moved the summary (or the session start) in the meantime.
+    """
+    __slots__ = ("path", "session_id", "max_tokens", "summarizer", "_db", "_lock")
+
+    def __init__(self, session_id: str, path: str = "data/memory.db", max_tokens: int = 2000,
+                 summarizer: Optional[Summarizer] = None):
+        self.path = path
+        self.session_id = session_id
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self._db, self._lock = _connect(path)
+
+    def _session(self) -> tuple:
+        row = self._db.execute(
+            "SELECT last_seq, cum_tokens, start_seq, summary, summarized_seq FROM sessions WHERE session_id = ?",
+            (self.session_id,)).fetchone()
+        return row or (0, 0, 1, None, 0)
+
+    def _window(self, session: tuple) -> List[Turn]:
+        last_seq, cum_tokens, start_seq = session[:3]
+        rows = self._db.execute(
+            "SELECT role, content, tokens FROM turns INDEXED BY turns_by_tokens "
+            "WHERE session_id = ? AND start_tokens >= ? AND seq >= ? ORDER BY seq",
+            (self.session_id, cum_tokens - self.max_tokens, start_seq)).fetchall()
+        if not rows and last_seq >= start_seq:
+            # The newest turn alone exceeds the window: keep it anyway.
+            rows = self._db.execute(
+                "SELECT role, content, tokens FROM turns WHERE session_id = ? AND seq = ?",
+                (self.session_id, last_seq)).fetchall()
+        return [Turn(role, content, tokens) for role, content, tokens in rows]
+
+    @property
+    def summary(self) -> Optional[str]:
+        return self._session()[3]
+
+    @property
+    def turns(self) -> List[Turn]:
+        return self._window(self._session())
+
+    def load(self) -> List[Dict[str, str]]:
+        session = self._session()
+        messages = [t.as_message() for t in self._window(session)]
+        if session[3]:
+            messages.insert(0, summary_message(session[3]))
+        return messages
+
+    def save(self, item: Union[str, Dict[str, Any], Turn], role: Optional[str] = None):
+        self.extend((to_turn(item, role),))
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]):
+        self.extend((Turn("user", str(next(iter(inputs.values()), ""))),
+                     Turn("assistant", str(next(iter(outputs.values()), "")))))
+
+    def extend(self, turns: Iterable[Turn]):
+        with self._lock, self._db:
+            last_seq, cum_tokens, start_seq, summary, summarized_seq = self._session()
+            rows = []
+            for turn in turns:
+                last_seq += 1
+                rows.append((self.session_id, last_seq, turn.role, turn.content, turn.tokens, cum_tokens))
+                cum_tokens += turn.tokens
+            self._db.executemany(
+                "INSERT INTO turns (session_id, seq, role, content, tokens, start_tokens) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, last_seq, cum_tokens, start_seq, summary, summarized_seq) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.session_id, last_seq, cum_tokens, start_seq, summary, summarized_seq))
+        if self.summarizer is not None:
+            self._summarize()
+
+    def _summarize(self):
+        """Fold turns that fell out of the window since the last summary into it."""
+        while True:
+            last_seq, cum_tokens, start_seq, summary, summarized_seq = self._session()
+            evicted = self._db.execute(
+                "SELECT role, content, tokens, seq FROM turns "
+                "WHERE session_id = ? AND seq >= ? AND seq < ? AND start_tokens < ? ORDER BY seq",
+                (self.session_id, max(start_seq, summarized_seq + 1), last_seq,
+                 cum_tokens - self.max_tokens)).fetchall()
+            if not evicted:
+                return
+            summary = self.summarizer(summary, [Turn(r, c, t) for r, c, t, _ in evicted])
+            with self._lock, self._db:
+                stored = self._db.execute(
+                    "UPDATE sessions SET summary = ?, summarized_seq = ? "
+                    "WHERE session_id = ? AND summarized_seq = ? AND start_seq = ?",
+                    (summary, evicted[-1][3], self.session_id, summarized_seq, start_seq)).rowcount
+            if stored:
+                return
+
+    def clear(self):
+        with self._lock, self._db:
+            last_seq, cum_tokens = self._session()[:2]
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, last_seq, cum_tokens, start_seq, summary, summarized_seq) "
+                "VALUES (?, ?, ?, ?, NULL, ?)",
+                (self.session_id, last_seq, cum_tokens, last_seq + 1, last_seq))
+
+    def to_data(self) -> Dict[str, Any]:
+        """The current window in WindowedMemory's format."""
+        session = self._session()
+        return {"max_tokens": self.max_tokens, "summary": session[3],
+                "turns": [t.to_data() for t in self._window(session)]}
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], session_id: str = "default", **kwargs) -> "SQLiteMemory":
+        """Append a serialized window to a session (its summary replaces the stored one)."""
+        kwargs.setdefault("max_tokens", data.get("max_tokens", 2000))
+        memory = cls(session_id, **kwargs)
+        memory.extend(Turn.from_data(t) for t in data.get("turns", ()))
+        if data.get("summary"):
+            with memory._lock, memory._db:
+                memory._db.execute("UPDATE sessions SET summary = ? WHERE session_id = ?",
+                                   (data["summary"], session_id))
+        return memory
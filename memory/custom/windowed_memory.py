@@ -0,0 +1,136 @@
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from app.utils.token_util import count_tokens
+from .base_memory import BaseMemory
+
+# summarizer(previous summary or None, evicted turns) -> new summary
+Summarizer = Callable[[Optional[str], List["Turn"]], str]
+
+
+class Turn:
+    """One message of a conversation with its cached token count."""
+    __slots__ = ("role", "content", "tokens")
+
+    def __init__(self, role: str, content: str, tokens: Optional[int] = None):
+        self.role = role
+        self.content = content
+        self.tokens = count_tokens(content) if tokens is None else tokens
+
+    def as_message(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+    def to_data(self) -> list:
+        return [self.role, self.content, self.tokens]
+
+    @classmethod
+    def from_data(cls, data: Union[list, tuple, Dict[str, Any]]) -> "Turn":
+        if isinstance(data, dict):
+            return cls(data["role"], data["content"], data.get("tokens"))
+        return cls(*data)
+
+    def __repr__(self):
+        return f"Turn({self.role!r}, {self.content[:40]!r}, tokens={self.tokens})"
+
+
+def to_turn(item: Union[str, Dict[str, Any], Turn], role: Optional[str] = None) -> Turn:
+    """Accept a Turn, a {'role', 'content'} dict or plain text (role defaults to 'user')."""
+    if isinstance(item, Turn):
+        return item
+    if isinstance(item, dict):
+        return Turn(role or item.get("role", "user"), item["content"], item.get("tokens"))
+    return Turn(role or "user", str(item))
+
+
+def summary_message(summary: str) -> Dict[str, str]:
+    return {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+
+
+def llm_summarizer(llm, max_words: int = 150) -> Summarizer:
+    """Summarizer that asks a LangChain chat model to fold evicted turns into the running summary."""
+    def summarize(summary: Optional[str], turns: List[Turn]) -> str:
+        transcript = "\n".join(f"{t.role}: {t.content}" for t in turns)
+        prompt = (
+            f"Update the summary of a conversation about DSL rule generation in at most {max_words} words.\n"
+            f"Current summary: {summary or '(none)'}\n"
+            f"New messages:\n{transcript}\n"
+            "Updated summary:"
+        )
+        response = llm.invoke(prompt)
+        return getattr(response, "content", response).strip()
+    return summarize
+
+
+class WindowedMemory(BaseMemory):
+    """
+    Conversation memory holding the most recent turns within max_tokens.
+    Older turns are evicted as new ones arrive; with a summarizer they are
+    folded into a running summary that load() returns ahead of the window.
+    """
+    __slots__ = ("max_tokens", "summarizer", "summary", "_turns", "_tokens")
+
+    def __init__(self, max_tokens: int = 2000, summarizer: Optional[Summarizer] = None,
+                 data: Optional[Dict[str, Any]] = None):
+        self.max_tokens = max_tokens
+        self.summarizer = summarizer
+        self.summary: Optional[str] = None
+        self._turns: deque = deque()
+        self._tokens = 0
+        if data:
+            self.summary = data.get("summary")
+            self.extend(Turn.from_data(t) for t in data.get("turns", ()))
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens
+
+    @property
+    def turns(self) -> List[Turn]:
+        return list(self._turns)
+
+    def load(self) -> List[Dict[str, str]]:
+        messages = [t.as_message() for t in self._turns]
+        if self.summary:
+            messages.insert(0, summary_message(self.summary))
+        return messages
+
+    def save(self, item: Union[str, Dict[str, Any], Turn], role: Optional[str] = None):
+        self.extend((to_turn(item, role),))
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, Any]):
+        """LangChain-style save: one user turn and one assistant turn."""
+        self.extend((Turn("user", str(next(iter(inputs.values()), ""))),
+                     Turn("assistant", str(next(iter(outputs.values()), "")))))
+
+    def extend(self, turns: Iterable[Turn]):
+        for turn in turns:
+            self._turns.append(turn)
+            self._tokens += turn.tokens
+        self._evict()
+
+    def _evict(self):
+        evicted = []
+        # The newest turn is always kept, even when it alone exceeds the window.
+        while self._tokens > self.max_tokens and len(self._turns) > 1:
+            turn = self._turns.popleft()
+            self._tokens -= turn.tokens
+            evicted.append(turn)
+        if evicted and self.summarizer is not None:
+            self.summary = self.summarizer(self.summary, evicted)
+
+    def clear(self):
+        self._turns.clear()
+        self._tokens = 0
+        self.summary = None
+
+    def to_data(self) -> Dict[str, Any]:
+        return {"max_tokens": self.max_tokens, "summary": self.summary,
+                "turns": [t.to_data() for t in self._turns]}
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], summarizer: Optional[Summarizer] = None, **kwargs) -> "WindowedMemory":
+        kwargs.setdefault("max_tokens", data.get("max_tokens", 2000))
+        return cls(summarizer=summarizer, data=data, **kwargs)
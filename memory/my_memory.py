@@ -3,19 +3,39 @@ class MyMemory:
     Modular memory interface.
 
     Args:
-        backend: 'langchain' (default) or 'custom'.
-        **kwargs: Additional config for LangChain or custom memory.
+        backend: 'langchain' (default), 'custom', 'windowed' or 'sqlite'.
+            - 'langchain': ConversationBufferMemory, or ConversationSummaryBufferMemory
+              (token window plus summary) when both llm and max_token_limit are given.
+            - 'custom': unbounded list (CustomMemory).
+            - 'windowed': turns within max_tokens, evicted turns optionally
+              summarized (WindowedMemory).
+            - 'sqlite': WindowedMemory semantics over an append-only SQLite log
+              keyed by session_id (SQLiteMemory).
+        **kwargs: Additional config for the backend.
     """
-    def __init__(self, backend='langchain', **kwargs):
+    __slots__ = ("backend", "_mem", "_type")
+
+    def __init__(self, backend='langchain', _mem=None, **kwargs):
         self.backend = backend
-        if backend == 'langchain':
-            from langchain.memory import ConversationBufferMemory
-            self._mem = ConversationBufferMemory(**kwargs)
-            self._type = 'langchain'
+        self._type = backend
+        if _mem is not None:
+            self._mem = _mem
+        elif backend == 'langchain':
+            if 'llm' in kwargs and 'max_token_limit' in kwargs:
+                from langchain.memory import ConversationSummaryBufferMemory
+                self._mem = ConversationSummaryBufferMemory(**kwargs)
+            else:
+                from langchain.memory import ConversationBufferMemory
+                self._mem = ConversationBufferMemory(**kwargs)
         elif backend == 'custom':
             from memory.custom.custom_memory import CustomMemory
             self._mem = CustomMemory(**kwargs)
-            self._type = 'custom'
+        elif backend == 'windowed':
+            from memory.custom.windowed_memory import WindowedMemory
+            self._mem = WindowedMemory(**kwargs)
+        elif backend == 'sqlite':
+            from memory.custom.sqlite_memory import SQLiteMemory
+            self._mem = SQLiteMemory(**kwargs)
         else:
             raise ValueError(f"Unknown backend: {backend}")
 
@@ -48,13 +68,18 @@ class MyMemory:
     @classmethod
     def from_data(cls, data, backend='langchain', **kwargs):
         if backend == 'langchain':
-            from langchain.memory import ConversationBufferMemory
-            mem = ConversationBufferMemory(**kwargs)
-            mem.chat_memory.messages = data
-            return cls(backend=backend, **kwargs)
+            memory = cls(backend=backend, **kwargs)
+            memory._mem.chat_memory.messages = list(data)
+            return memory
         elif backend == 'custom':
             from memory.custom.custom_memory import CustomMemory
-            return cls(backend=backend, data=data, **kwargs)
+            return cls(backend=backend, _mem=CustomMemory.from_data(data))
+        elif backend == 'windowed':
+            from memory.custom.windowed_memory import WindowedMemory
+            return cls(backend=backend, _mem=WindowedMemory.from_data(data, **kwargs))
+        elif backend == 'sqlite':
+            from memory.custom.sqlite_memory import SQLiteMemory
+            return cls(backend=backend, _mem=SQLiteMemory.from_data(data, **kwargs))
         else:
             raise ValueError(f"Unknown backend: {backend}")
 
@@ -62,4 +87,4 @@ class MyMemory:
     def lc(self):
         if self._type == 'langchain':
             return self._mem
-        raise AttributeError("No LangChain memory backend.") 
\ No newline at end of file
+        raise AttributeError("No LangChain memory backend.")
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import pytest
+
+from app.admission import AdmissionController, Overloaded
+from app.deadline import Deadline, DeadlineExceeded, request_deadline
+
+
+def test_request_deadline_uses_header_then_default_capped():
+    assert 0.4 < request_deadline(500, 60, 300).remaining() <= 0.5
+    assert 59 < request_deadline(None, 60, 300).remaining() <= 60
+    assert request_deadline(10 ** 9, 60, 300).remaining() <= 300
+    with pytest.raises(DeadlineExceeded):
+        Deadline.after(0).check("planner")
+
+
+def test_overload_is_shed_fast_and_accepted_requests_meet_deadline():
+    controller = AdmissionController(concurrency=2, max_queue=100)
+
+    async def request():
+        deadline = Deadline.after(0.35)
+        started = time.monotonic()
+        try:
+            await controller.run(deadline, time.sleep, 0.1)
+            return "ok", time.monotonic() - started
+        except Overloaded:
+            return "shed", time.monotonic() - started
+
+    async def flood():
+        await controller.run(Deadline.after(1), time.sleep, 0.1)  # learn the service time
+        return await asyncio.gather(*(request() for _ in range(20)))
+
+    results = asyncio.run(flood())
+    accepted = [t for status, t in results if status == "ok"]
+    shed = [t for status, t in results if status == "shed"]
+    assert 2 <= len(accepted) <= 6 and shed
+    assert max(accepted) < 0.35 and max(shed) < 0.01
+
+
+def test_slow_work_raises_deadline_exceeded_and_keeps_its_slot():
+    controller = AdmissionController(concurrency=1)
+
+    async def run():
+        with pytest.raises(DeadlineExceeded):
+            await controller.run(Deadline.after(0.05), time.sleep, 0.2)
+        assert controller.running == 1
+        await asyncio.sleep(0.2)
+        assert controller.running == 0
+
+    asyncio.run(run())
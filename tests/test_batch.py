@@ -0,0 +1,120 @@
+import json
+import threading
+
+import pytest
+
+from app.batch import BatchRunner, CheckpointError, query_key
+
+
+def _write_queries(path, queries):
+    path.write_text("".join(json.dumps({"id": f"q{i}", "query": q}) + "\n" for i, q in enumerate(queries)))
+
+
+def _read(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class FakeGenerate:
+    def __init__(self, fail_on=(), interrupt_after=None):
+        self.calls = []
+        self.fail_on = fail_on
+        self.interrupt_after = interrupt_after
+        self._lock = threading.Lock()
+
+    def __call__(self, query, deadline):
+        with self._lock:
+            self.calls.append(query)
+            if self.interrupt_after is not None and len(self.calls) > self.interrupt_after:
+                raise KeyboardInterrupt
+        if query in self.fail_on:
+            raise RuntimeError("provider error")
+        return {"rule": f'RULE r WHEN claim.amount > {len(query)} THEN REJECT "{query}" END', "valid": True}
+
+
+def test_query_key_normalizes_whitespace_and_case():
+    assert query_key("Reject  claims over $500") == query_key(" reject claims OVER $500 ")
+    assert query_key("reject claims over $500") != query_key("reject claims over $600")
+
+
+def test_duplicates_are_generated_once(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_queries(source, ["a b", "c", "A  B", "c", "d"])
+    generate = FakeGenerate()
+    stats = BatchRunner(generate, concurrency=2).run(str(source), str(output))
+    assert sorted(generate.calls) == ["a b", "c", "d"]
+    assert (stats.generated, stats.duplicates) == (3, 2)
+    rows = {r["id"]: r for r in _read(output)}
+    assert rows["q2"]["duplicate_of"] == "q0"
+    assert rows["q2"]["rule"] == rows["q0"]["rule"]
+    assert rows["q2"]["query"] == "A  B"
+
+
+def test_failures_are_recorded_and_retried_on_request(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_queries(source, ["ok", "bad"])
+    BatchRunner(FakeGenerate(fail_on=("bad",))).run(str(source), str(output))
+    assert {r["id"]: r["status"] for r in _read(output)} == {"q0": "ok", "q1": "error"}
+
+    generate = FakeGenerate()
+    BatchRunner(generate).run(str(source), str(output), resume=True)
+    assert generate.calls == []
+    BatchRunner(generate).run(str(source), str(output), resume=True, retry_errors=True)
+    assert generate.calls == ["bad"]
+    assert _read(output)[-1]["status"] == "ok"
+
+
+def test_interrupted_run_resumes_without_redoing_rows(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    queries = [f"query {i}" for i in range(40)]
+    _write_queries(source, queries)
+    first = FakeGenerate(interrupt_after=15)
+    with pytest.raises(KeyboardInterrupt):
+        BatchRunner(first, concurrency=3).run(str(source), str(output))
+    done = {r["id"] for r in _read(output)}
+    assert 0 < len(done) < 40
+    # A crash while writing leaves a torn checkpoint line and an unrecorded output line.
+    with open(tmp_path / "out.jsonl.checkpoint", "a") as f:
+        f.write('{"id": "q39", "off')
+    with open(output, "a") as f:
+        f.write('{"id": "q39", "status": "ok"}\n')
+
+    second = FakeGenerate()
+    stats = BatchRunner(second, concurrency=3).run(str(source), str(output), resume=True)
+    assert stats.skipped == len(done)
+    assert not done & {f"q{queries.index(q)}" for q in second.calls}
+    rows = _read(output)
+    assert sorted(r["id"] for r in rows) == sorted(f"q{i}" for i in range(40))
+
+
+def test_resume_refuses_a_missing_or_shortened_output(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_queries(source, ["a", "b", "c"])
+    BatchRunner(FakeGenerate()).run(str(source), str(output))
+    output.write_bytes(output.read_bytes()[:10])
+    with pytest.raises(CheckpointError, match="has 10 bytes"):
+        BatchRunner(FakeGenerate()).run(str(source), str(output), resume=True)
+    output.unlink()
+    with pytest.raises(CheckpointError, match="is missing"):
+        BatchRunner(FakeGenerate()).run(str(source), str(output), resume=True)
+    assert not output.exists()
+
+    generate = FakeGenerate()
+    BatchRunner(generate).run(str(source), str(output))
+    assert sorted(generate.calls) == ["a", "b", "c"]
+
+
+def test_error_strings_are_errors_and_retried(tmp_path):
+    source, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    _write_queries(source, ["a", "a", "b"])
+
+    def outage(query, deadline):
+        return {"rule": "[Error] Error code: 429 - rate limited"} if query == "a" else {"rule": "Error: No result generated"}
+
+    stats = BatchRunner(outage, concurrency=1).run(str(source), str(output))
+    rows = {r["id"]: r for r in _read(output)}
+    assert {r["status"] for r in rows.values()} == {"error"} and stats.errors == 3
+    assert rows["q0"]["error"].startswith("[Error]") and rows["q1"]["status"] == "error"
+
+    generate = FakeGenerate()
+    BatchRunner(generate).run(str(source), str(output), resume=True, retry_errors=True)
+    assert sorted(generate.calls) == ["a", "b"]
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+from app.cascade import CascadeTier, ModelCascade
+from app.deadline import Deadline, DeadlineExceeded
+from app.dsl.validator import ValidationResult
+from app.metrics import metrics
+
+TIERS = [CascadeTier("fast", "small-model", min_score=1.0), CascadeTier("reasoning", "large-model", min_score=0.5)]
+
+
+class FakeAgent:
+    def __init__(self, code, model, delay=0.0):
+        self.code = code
+        self.model = model
+        self.delay = delay
+        self.calls = 0
+
+    def generate(self, query, prompt=None, context=None, max_tokens=None, timeout=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"code": self.code, "model": self.model, "usage": {"prompt_tokens": 100, "completion_tokens": 10}}
+
+
+def _validate(code):
+    # "valid:<score>" parses with that structural score; anything else does not parse.
+    if code.startswith("valid:"):
+        return ValidationResult(True, float(code.split(":")[1]))
+    return ValidationResult(False, 0.0, errors=["syntax error"])
+
+
+def _cascade(fast, reasoning):
+    cascade = ModelCascade(TIERS, validator=_validate)
+    cascade._agents = {"fast": fast, "reasoning": reasoning}
+    return cascade
+
+
+def test_accepts_the_first_tier_that_validates():
+    fast, reasoning = FakeAgent("valid:1.0", "small-model-0301"), FakeAgent("valid:1.0", "large-model")
+    outcome = _cascade(fast, reasoning).run("reject claims over 500")
+    assert (outcome["tier"], outcome["model"], outcome["escalations"]) == ("fast", "small-model-0301", 0)
+    assert reasoning.calls == 0
+
+
+def test_escalates_when_validation_fails_and_sums_usage():
+    fast, reasoning = FakeAgent("valid:0.5", "small-model"), FakeAgent("valid:0.5", "large-model")
+    escalated = metrics.get("cascade_escalated_requests_total")
+    outcome = _cascade(fast, reasoning).run("reject claims over 500")
+    assert (outcome["tier"], outcome["escalations"]) == ("reasoning", 1)  # 0.5 is below fast's min_score only
+    assert outcome["usage"] == {"prompt_tokens": 200, "completion_tokens": 20}
+    assert metrics.get("cascade_escalated_requests_total") == escalated + 1
+
+
+def test_returns_the_best_attempt_when_every_tier_fails():
+    fast, reasoning = FakeAgent("valid:0.2", "small-model"), FakeAgent("not a rule", "large-model")
+    outcome = _cascade(fast, reasoning).run("reject claims over 500")
+    assert (outcome["tier"], outcome["codegen_result"], outcome["escalations"]) == ("fast", "valid:0.2", 1)
+    assert reasoning.calls == 1
+
+
+def test_start_tier_skips_cheaper_tiers():
+    fast, reasoning = FakeAgent("valid:1.0", "small-model"), FakeAgent("valid:1.0", "large-model")
+    cascade = _cascade(fast, reasoning)
+    outcome = cascade.run("reject claims over 500", start_tier=cascade.tier_index("reasoning"))
+    assert outcome["tier"] == "reasoning" and fast.calls == 0
+    with pytest.raises(ValueError):
+        cascade.tier_index("unknown")
+
+
+def test_deadline_stops_escalation_with_the_best_attempt():
+    fast, reasoning = FakeAgent("valid:0.5", "small-model", delay=0.05), FakeAgent("valid:1.0", "large-model")
+    stops = metrics.get("cascade_deadline_stops_total")
+    outcome = _cascade(fast, reasoning).run("reject claims over 500", deadline=Deadline.after(0.02))
+    assert outcome["tier"] == "fast" and reasoning.calls == 0
+    assert metrics.get("cascade_deadline_stops_total") == stops + 1
+
+    with pytest.raises(DeadlineExceeded):
+        _cascade(fast, reasoning).run("reject claims over 500", deadline=Deadline.after(0))
@@ -0,0 +1,40 @@
+import json
+
+import httpx
+import pytest
+
+from app.cassette import Cassette, CassetteMiss, CassetteTransport, request_key
+
+
+def _completion(request):
+    body = json.loads(request.content)
+    return httpx.Response(200, json={"choices": [{"message": {"content": body["messages"][-1]["content"].upper()}}]})
+
+
+def test_record_then_replay(tmp_path):
+    calls = []
+
+    def provider(request):
+        calls.append(request)
+        return _completion(request)
+
+    cassette = Cassette(str(tmp_path / "cassette.db"))
+    url = "https://openrouter.ai/api/v1/chat/completions"
+    payload = {"model": "m", "temperature": 0.2, "messages": [{"role": "user", "content": "rule"}]}
+    with httpx.Client(transport=CassetteTransport(cassette, "record", transport=httpx.MockTransport(provider))) as client:
+        recorded = client.post(url, json=payload, headers={"Authorization": "Bearer a"}).json()
+    assert len(calls) == 1 and len(cassette) == 1
+
+    # Key order, None fields and headers do not change the key.
+    reordered = {"messages": payload["messages"], "temperature": 0.2, "model": "m", "user": None}
+    with httpx.Client(transport=CassetteTransport(cassette, "replay", transport=httpx.MockTransport(provider))) as client:
+        assert client.post(url, json=reordered, headers={"Authorization": "Bearer b"}).json() == recorded
+        with pytest.raises(CassetteMiss):
+            client.post(url, json=dict(payload, temperature=0.7))
+    assert len(calls) == 1
+
+
+def test_request_key_ignores_volatile_fields():
+    a = request_key("POST", "/v1/chat", b'{"model": "m", "user": "x", "messages": []}')
+    assert a == request_key("post", "/v1/chat", b'{"messages":[],"model":"m"}')
+    assert a != request_key("POST", "/v1/chat", b'{"messages":[],"model":"n"}')
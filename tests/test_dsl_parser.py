@@ -0,0 +1,64 @@
+import pytest
+
+from app.dsl import ConflictIndex, DSLSyntaxError, parse_rule, validate_rule
+from app.dsl.nodes import And, Compare, Field, IfAction, Literal, Or, Reject
+from app.utils.example_loader import ExampleLoader
+
+
+def test_parse_simple_rule():
+    rule = parse_rule('RULE claim_amount_validation WHEN claim.amount > 10000 THEN REJECT "too high" END')
+    assert rule.name == "claim_amount_validation"
+    clause = rule.clauses[0]
+    assert clause.condition == Compare(">", Field(("claim", "amount")), Literal(10000, "number"))
+    assert clause.actions == (Reject("too high"),)
+
+
+def test_and_binds_tighter_than_or():
+    rule = parse_rule('RULE r WHEN a.x == 1 AND a.y == 2 OR a.z == 3 THEN APPROVE END')
+    condition = rule.clauses[0].condition
+    assert isinstance(condition, Or)
+    assert isinstance(condition.items[0], And)
+
+
+def test_nested_if_action():
+    rule = parse_rule(
+        'RULE r WHEN claim.amount > 5000 THEN IF preauth.approved == true THEN APPROVE '
+        'ELSE REJECT "no preauth" END ELSE APPROVE END'
+    )
+    assert isinstance(rule.clauses[0].actions[0], IfAction)
+
+
+def test_syntax_error():
+    with pytest.raises(DSLSyntaxError):
+        parse_rule('RULE r WHEN claim.amount > THEN APPROVE END')
+
+
+def test_core_examples_parse():
+    for example in ExampleLoader().get_core_examples("1.0"):
+        parse_rule(example["dsl_pattern"])
+
+
+def test_validate_rule_scores_structure():
+    good = validate_rule('```dsl\nRULE r\nWHEN claim.amount > 1\nTHEN APPROVE\nEND\n```')
+    assert good.valid and good.score == 1.0
+    unknown = validate_rule('RULE r WHEN foo.amount > 1 THEN APPROVE END')
+    assert unknown.valid and unknown.score < 1.0
+    broken = validate_rule('WHEN claim.amount > 1')
+    assert not broken.valid and broken.score == 0.0
+
+
+def test_conflict_index_reports_overlapping_contradictions():
+    index = ConflictIndex([
+        'RULE high WHEN claim.amount > 10000 THEN REJECT "too high" END',
+        'RULE low WHEN claim.amount < 100 THEN APPROVE END',
+        'RULE copay WHEN claim.type IN ["vision", "rx"] THEN SET claim.copay = 10 ELSE SET claim.copay = 20 END',
+    ])
+    conflicts = index.check('RULE mid WHEN claim.amount > 5000 AND claim.type == "dental" THEN APPROVE END')
+    assert [(c.other_rule, c.reasons) for c in conflicts] == [("high", ["APPROVE vs REJECT"])]
+    assert conflicts[0].overlap == {"claim.amount": "> 10000"}
+    assert index.check('RULE mid WHEN claim.amount > 100 AND claim.amount <= 10000 THEN APPROVE END') == []
+    # ELSE of `copay` covers every type but vision/rx.
+    assert [c.other_clause for c in index.check('RULE t WHEN claim.type == "rx" THEN SET claim.copay = 5 END')] == [0]
+    assert [c.other_clause for c in index.check('RULE t WHEN claim.type == "lab" THEN SET claim.copay = 5 END')] == [1]
+    index.add('RULE mid WHEN claim.amount > 5000 THEN APPROVE END')
+    assert [(c.rule, c.other_rule) for c in index.find_all()] == [("mid", "high")]
@@ -0,0 +1,192 @@
+from app.dsl import parse_rule
+from app.utils.example_loader import ExampleLoader
+from engine import compile_rule, rule_hash
+
+RULE = '''
+RULE copay_calculation
+WHEN claim.amount > 10000 AND claim.type IN ["inpatient", "surgery"]
+THEN REJECT "Claim amount exceeds maximum allowed limit"
+WHEN EXISTS diagnosis WHERE diagnosis.code MATCHES "^Z[0-9]{2}"
+THEN FLAG "Screening diagnosis"
+ELSE SET claim.copay = claim.amount * 0.2
+END
+'''
+
+
+def test_compiled_rule_actions():
+    rule = compile_rule(RULE)
+    assert rule.evaluate({"claim": {"amount": 20000, "type": "surgery"}}) == [
+        ("REJECT", "Claim amount exceeds maximum allowed limit")]
+    assert rule.evaluate({"claim": {"amount": 100, "diagnoses": [{"code": "Z12"}]}}) == [
+        ("FLAG", "Screening diagnosis")]
+    assert rule.evaluate({"claim": {"amount": 100}}) == [("SET", "claim.copay", 20.0)]
+    # Missing fields and mismatched types never raise; ordering comparisons are False.
+    assert rule.evaluate({"claim": {"amount": "n/a"}}) == [("SET", "claim.copay", None)]
+    assert rule.evaluate({}) == [("SET", "claim.copay", None)]
+
+
+def test_compile_cache_by_hash():
+    first = compile_rule(RULE)
+    assert compile_rule(" ".join(RULE.split())) is first
+    assert first.hash == rule_hash(parse_rule(RULE))
+    assert {"claim.amount", "claim.type"} <= first.fields_read
+
+
+def test_core_examples_compile():
+    for example in ExampleLoader().get_core_examples("1.0"):
+        compile_rule(example["dsl_pattern"]).evaluate({"claim": {"amount": 1}})
+
+
+def test_batch_matches_row_evaluation():
+    from engine.columnar import ColumnarBatch, evaluate_batch
+
+    records = [
+        {"claim": {"amount": 20000, "type": "surgery"}},
+        {"claim": {"amount": 100, "diagnoses": [{"code": "Z12"}]}},
+        {"claim": {"amount": 150.5, "type": "inpatient"}},
+        {"claim": {"amount": True, "type": ["x"]}},
+        {"claim": {"amount": "n/a"}},
+        {"claim": None},
+        {},
+    ]
+    rule = compile_rule(RULE)
+    result = evaluate_batch(rule, ColumnarBatch.from_records(records))
+    assert result.to_list() == [rule.evaluate(r) for r in records]
+    assert list(result.codes) == [2, 4, 3, 3, 3, 3, 3]
+
+
+def test_batch_from_columns():
+    import numpy as np
+    from engine.columnar import ColumnarBatch, evaluate_batch
+
+    batch = ColumnarBatch.from_columns({
+        "claim.amount": np.array([50.0, 20000.0, np.nan]),
+        "patient.age": np.array([70, 30, 80]),
+    })
+    rule = ('RULE r WHEN claim.amount > 10000 THEN REJECT "high" '
+            'ELSE IF patient.age >= 65 THEN SET claim.copay = claim.amount * 0.1 ELSE APPROVE END END')
+    assert evaluate_batch(rule, batch).to_list() == [
+        [("SET", "claim.copay", 5.0)], [("REJECT", "high")], [("SET", "claim.copay", None)]]
+
+
+def test_batch_quantifiers_match_row_evaluation():
+    from engine.columnar import ColumnarBatch, evaluate_batch
+
+    records = [
+        {"claim": {"amount": 10, "line_items": [{"amount": 10, "mods": ["X"]}, {"amount": 9000, "mods": []}],
+                   "diagnoses": [{"code": "Z11"}]}},
+        {"claim": {"amount": 5000, "line_items": [], "diagnoses": []}},
+        {"claim": {"amount": 5000, "line_items": None}, "diagnosis": [{"code": "Z00"}]},
+        {"claim": {"amount": 2000, "line_items": [{"amount": "x", "mods": ["Y", "X"]}]}},
+    ]
+    rule = compile_rule(
+        'RULE r WHEN FOR EACH item IN claim.line_items item.amount < 5000 '
+        'THEN IF EXISTS diagnosis WHERE diagnosis.code MATCHES "^Z" AND claim.amount > 1000 '
+        'THEN FLAG "screening" ELSE APPROVE END '
+        'WHEN EXISTS line_item WHERE line_item.amount > claim.amount OR FOR EACH m IN line_item.mods m == "X" '
+        'THEN REJECT "line item" END'
+    )
+    result = evaluate_batch(rule, ColumnarBatch.from_records(records))
+    assert result.to_list() == [rule.evaluate(r) for r in records]
+    assert list(result.codes) == [2, 1, 4, 0]
+
+
+def test_rule_network_matches_individual_rules():
+    from engine.network import RuleNetwork
+
+    rules = [
+        'RULE high WHEN claim.amount > 10000 AND patient.insurance_status == "active" THEN REJECT "high" END',
+        'RULE very_high WHEN claim.amount >= 50000 THEN FLAG "very high" END',
+        'RULE small WHEN claim.amount < 100 OR claim.type IN ["dental", "vision"] THEN APPROVE ELSE CONTINUE END',
+        'RULE senior WHEN patient.insurance_status == "active" AND patient.age > 65 '
+        'THEN IF claim.amount > 10000 THEN SET claim.copay = claim.amount * 0.1 ELSE APPROVE END END',
+        'RULE lines WHEN EXISTS line_item WHERE line_item.amount > 10000 THEN FLAG "line" END',
+    ]
+    network = RuleNetwork(rules)
+    assert network.stats["distinct_predicates"] < network.stats["predicates"]
+    compiled = [compile_rule(r) for r in rules]
+    records = [
+        {"claim": {"amount": 60000, "type": "dental"}, "patient": {"insurance_status": "active", "age": 70}},
+        {"claim": {"amount": 50, "line_items": [{"amount": 20000}]}, "patient": {"insurance_status": "inactive"}},
+        {"claim": {"amount": "n/a", "type": ["x"]}, "patient": {"age": None}},
+        {"claim": {"amount": float("nan")}},
+        {},
+    ]
+    for record in records:
+        expected = [(i, a) for i, rule in enumerate(compiled) if (a := rule.evaluate(record))]
+        assert repr(network.evaluate(record)) == repr(expected)
+
+
+def test_parallel_evaluator_preserves_order():
+    from engine.parallel import ParallelEvaluator, SharedColumns, SharedRecords
+
+    rule = 'RULE r WHEN claim.amount > 100 THEN REJECT "high" ELSE SET claim.copay = claim.amount * 2 END'
+    records = [{"claim": {"amount": i * 7 % 250}} for i in range(1000)]
+    expected = [compile_rule(rule).evaluate(r) for r in records]
+    with ParallelEvaluator([rule], processes=2, partition_size=128, max_pending=2) as evaluator:
+        for data in (SharedRecords(records), SharedColumns.from_records(records, ["claim.amount"])):
+            with data:
+                got = [part.actions(i)[0] for part in evaluator.map(data) for i in range(len(part))]
+            assert got == expected
+
+
+def test_incremental_evaluator_reevaluates_only_affected_pairs():
+    from engine.incremental import IncrementalEvaluator
+
+    amount = 'RULE amount WHEN claim.amount > 100 THEN REJECT "high" ELSE APPROVE END'
+    age = 'RULE age WHEN patient.age > 65 THEN FLAG "senior" END'
+    evaluator = IncrementalEvaluator(":memory:", [amount, age])
+    stats = evaluator.upsert_claims({"c1": {"claim": {"amount": 50}, "patient": {"age": 70}},
+                                     "c2": {"claim": {"amount": 500}, "patient": {"age": 30}}})
+    assert stats["evaluated"] == 4
+    assert evaluator.results("c1") == {"amount": [("APPROVE", None)], "age": [("FLAG", "senior")]}
+
+    stats = evaluator.apply_delta({"c1": {"claim.amount": 150}})
+    assert (stats["evaluated"], stats["skipped"]) == (1, 1)
+    assert evaluator.results("c1")["amount"] == [("REJECT", "high")]
+    assert evaluator.upsert_claims({"c2": {"claim": {"amount": 500}, "patient": {"age": 30}}})["evaluated"] == 0
+    assert evaluator.upsert_claims({"c2": {"claim": {"amount": 500}, "patient": {"age": 80}}})["evaluated"] == 1
+
+    changed = amount.replace("> 100", "> 1000")
+    assert evaluator.set_rules([changed, age]) == {"added": 1, "removed": 1, "evaluated": 2}
+    assert evaluator.results("c2") == {"amount": [("APPROVE", None)], "age": [("FLAG", "senior")]}
+    evaluator.close()
+
+
+def test_non_dict_intermediates_read_as_missing():
+    from engine.columnar import ColumnarBatch, evaluate_batch
+    from engine.network import RuleNetwork
+
+    rule = compile_rule('RULE r WHEN claim.amount > 1 OR EXISTS diagnosis WHERE diagnosis.code == "Z" '
+                        'OR FOR EACH item IN claim.line_items item.amount > 1 THEN REJECT "x" ELSE APPROVE END')
+    records = [{"claim": "oops"}, {"claim": 5}, {"claim": ["a"]}, {"claim": {"line_items": ["a", 3]}},
+               {"claim": {"diagnoses": "Z"}}]
+    expected = [[("APPROVE", None)]] * len(records)
+    assert [rule.evaluate(r) for r in records] == expected
+    assert evaluate_batch(rule, ColumnarBatch.from_records(records)).to_list() == expected
+    network = RuleNetwork([rule.rule])
+    assert [network.evaluate(r) for r in records] == [[(0, a)] for a in expected]
+
+
+def test_large_integers_compare_exactly():
+    from engine.columnar import ColumnarBatch, evaluate_batch
+
+    records = [{"claim": {"amount": 2 ** 60, "paid": 2 ** 60 + 1}}, {"claim": {"amount": 2 ** 60 + 1, "paid": 3}},
+               {"claim": {"amount": 10 ** 400, "paid": 1}}, {"claim": {"amount": 5, "paid": 2 ** 60}}]
+    for condition in ("claim.amount == 1152921504606846977", "claim.amount > 1152921504606846976",
+                      "claim.amount < claim.paid", "claim.amount + 1 == 1152921504606846977",
+                      "claim.paid * 2 >= 2305843009213693954"):
+        rule = compile_rule(f'RULE r WHEN {condition} THEN REJECT "x" ELSE APPROVE END')
+        expected = [rule.evaluate(r) for r in records]
+        assert evaluate_batch(rule, ColumnarBatch.from_records(records)).to_list() == expected, condition
+
+
+def test_mixed_bool_and_number_columns_match_row_evaluation():
+    from engine.columnar import ColumnarBatch, evaluate_batch
+
+    records = [{"claim": {"amount": v}} for v in (True, 1, 2 ** 60, 1.0, False, 0, "1")]
+    for condition in ("claim.amount > 0", "claim.amount == 1", "claim.amount == true", "claim.amount IN [1, 2]",
+                      "claim.amount != 0"):
+        rule = compile_rule(f'RULE r WHEN {condition} THEN APPROVE END')
+        expected = [rule.evaluate(r) for r in records]
+        assert evaluate_batch(rule, ColumnarBatch.from_records(records)).to_list() == expected, condition
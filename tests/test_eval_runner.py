@@ -0,0 +1,84 @@
+import json
+
+from app.dsl.compare import rule_similarity
+from app.eval_runner import EvalRunner
+
+EXPECTED = '```dsl\nRULE high_amount\nWHEN claim.amount > 1000 AND claim.type == "x"\nTHEN REJECT "high"\nEND\n```'
+EXAMPLES = [
+    {"prompt": "reject high x claims", "response": EXPECTED, "category": "validation"},
+    {"prompt": "flag high claims", "response": EXPECTED, "category": "fraud_detection"},
+]
+
+
+def test_normalized_scoring():
+    renamed = 'RULE other WHEN claim.type == "x" AND 1000 < claim.amount THEN REJECT "high" END'
+    assert rule_similarity(renamed, EXPECTED) == 1.0
+    assert 0 < rule_similarity(renamed.replace("1000", "500"), EXPECTED) < 1
+    assert rule_similarity("not a rule", EXPECTED) == 0.0
+
+
+def test_runner_skips_unchanged_examples(tmp_path):
+    calls = []
+
+    def generate(prompt):
+        calls.append(prompt)
+        return EXPECTED if prompt.startswith("reject") else 'RULE r WHEN claim.amount > 5 THEN FLAG "x" END'
+
+    cache = str(tmp_path / "cache.jsonl")
+    report = EvalRunner(generate, {"model": "a"}, cache, concurrency=2, rpm=0).run(EXAMPLES)
+    assert sorted(calls) == sorted(e["prompt"] for e in EXAMPLES)
+    assert report["summary"]["evaluated"] == 2 and report["summary"]["exact"] == 1
+    assert report["by_category"]["validation"]["mean_score"] == 1.0
+    assert len((tmp_path / "cache.jsonl").read_text().splitlines()) == 2
+
+    calls.clear()
+    report = EvalRunner(generate, {"model": "a"}, cache, rpm=0).run(EXAMPLES)
+    assert calls == [] and report["summary"]["cached"] == 2
+    # A model change invalidates every cached result.
+    EvalRunner(generate, {"model": "b"}, cache, rpm=0).run(EXAMPLES)
+    assert len(calls) == 2
+
+
+def test_cache_is_appended_per_result_and_survives_a_torn_line(tmp_path):
+    cache = tmp_path / "cache.jsonl"
+    runner = EvalRunner(lambda prompt: EXPECTED, {"model": "a"}, str(cache), rpm=0)
+    runner.run(EXAMPLES[:1])
+    with open(cache, "a") as f:
+        f.write('{"key": "torn", "res')
+    runner._evaluate(1, EXAMPLES[1], "second")
+    lines = cache.read_text().splitlines()
+    assert len(lines) == 2 and json.loads(lines[0])["result"]["prompt"] == EXAMPLES[0]["prompt"]
+
+    calls = []
+    report = EvalRunner(lambda prompt: calls.append(prompt) or EXPECTED, {"model": "a"}, str(cache), rpm=0).run(EXAMPLES)
+    assert calls == [EXAMPLES[1]["prompt"]] and report["summary"]["cached"] == 1
+    assert [json.loads(line)["result"]["prompt"] for line in cache.read_text().splitlines()] == \
+        [e["prompt"] for e in EXAMPLES]
+
+
+def test_error_text_is_a_failure_and_not_cached(tmp_path):
+    cache = tmp_path / "cache.jsonl"
+    report = EvalRunner(lambda prompt: "[Error] Error code: 429", {"model": "a"}, str(cache), rpm=0).run(EXAMPLES[:1])
+    result = report["results"][0]
+    assert result["error"].startswith("[Error]") and result["score"] == 0.0 and not result["valid"]
+    assert report["summary"]["errors"] == 1 and cache.read_text() == ""
+
+    calls = []
+    EvalRunner(lambda prompt: calls.append(prompt) or EXPECTED, {"model": "a"}, str(cache), rpm=0).run(EXAMPLES[:1])
+    assert calls == [EXAMPLES[0]["prompt"]]
+
+
+def test_partial_run_keeps_other_examples_cached(tmp_path):
+    cache = str(tmp_path / "cache.jsonl")
+    EvalRunner(lambda prompt: EXPECTED, {"model": "a"}, cache, rpm=0).run(EXAMPLES)
+    EvalRunner(lambda prompt: EXPECTED, {"model": "a"}, cache, rpm=0).run(EXAMPLES[:1])  # e.g. --limit 1
+    changed = [dict(EXAMPLES[0], response=EXPECTED.replace("1000", "500")), EXAMPLES[1]]
+    EvalRunner(lambda prompt: EXPECTED, {"model": "a"}, cache, rpm=0).run(changed[:1])
+
+    calls = []
+    report = EvalRunner(lambda prompt: calls.append(prompt) or EXPECTED, {"model": "a"}, cache, rpm=0).run(changed)
+    assert calls == [] and report["summary"]["cached"] == 2
+    assert len((tmp_path / "cache.jsonl").read_text().splitlines()) == 2  # the stale entry for example 0 is gone
+    # Same prompts under another version are separate examples.
+    EvalRunner(lambda prompt: EXPECTED, {"version": "2.0"}, cache, rpm=0).run(changed)
+    assert len((tmp_path / "cache.jsonl").read_text().splitlines()) == 4
@@ -0,0 +1,51 @@
+import asyncio
+
+from app.evaluation import EvaluationService, RuleSetRegistry, evaluate_claims
+from app.metrics import metrics
+
+
+def test_single_claim_requests_are_micro_batched(tmp_path):
+    (tmp_path / "demo.dsl").write_text(
+        'RULE a WHEN claim.amount > 100 THEN REJECT "high" ELSE APPROVE END\n'
+        'RULE b WHEN claim.type == "x" THEN FLAG "x" END\n')
+    service = EvaluationService(RuleSetRegistry(str(tmp_path)), window_ms=50, max_batch=1000)
+    rule_set = service.resolve(rule_set_id="demo")
+    assert service.resolve(rule=(tmp_path / "demo.dsl").read_text()).hash == rule_set.hash
+    claims = [{"claim": {"amount": i * 13 % 200, "type": "xy"[i % 2]}} for i in range(50)]
+
+    async def run():
+        return await asyncio.gather(*(service.evaluate(rule_set, [c]) for c in claims))
+
+    batches = metrics.get("evaluate_batches_total")
+    results = asyncio.run(run())
+    assert [r[0] for r in results] == evaluate_claims(rule_set, claims)
+    assert metrics.get("evaluate_batches_total") - batches == 1
+    assert results[0][0] == {"a": [("APPROVE", None)], "b": [("FLAG", "x")]}
+
+
+def test_bad_claim_only_fails_its_own_request(tmp_path, monkeypatch):
+    import pytest
+
+    from app import evaluation
+    from app.evaluation import ClaimEvaluationError
+
+    real = evaluation.evaluate_claims
+
+    def evaluate_claims(rule_set, claims):
+        if any(c.get("bad") for c in claims):
+            raise TypeError("malformed claim")
+        return real(rule_set, claims)
+
+    monkeypatch.setattr(evaluation, "evaluate_claims", evaluate_claims)
+    service = EvaluationService(RuleSetRegistry(str(tmp_path)), window_ms=50, max_batch=1000)
+    rule_set = service.resolve(rule='RULE a WHEN claim.amount > 100 THEN REJECT "high" ELSE APPROVE END')
+
+    async def run():
+        return await asyncio.gather(service.evaluate(rule_set, [{"claim": {"amount": 500}}]),
+                                    service.evaluate(rule_set, [{"bad": True}]), return_exceptions=True)
+
+    good, bad = asyncio.run(run())
+    assert good == [{"a": [("REJECT", "high")]}]
+    assert isinstance(bad, ClaimEvaluationError)
+    with pytest.raises(ClaimEvaluationError):
+        asyncio.run(service.evaluate(rule_set, [{"claim": {"amount": 1}}, {"bad": True}]))
@@ -0,0 +1,57 @@
+from types import SimpleNamespace
+
+from agents.langchain.generation_profile import GenerationProfile, get_generation_profile, split_reasoning
+
+STOP = "END\n```"
+
+
+def test_llm_kwargs_caps_answer_and_adds_reasoning_budget():
+    profile = GenerationProfile(stop=[STOP], max_tokens=1024, reasoning_max_tokens=512, exclude_reasoning=True)
+    assert profile.llm_kwargs() == {"stop": [STOP], "max_tokens": 1536,
+                                    "extra_body": {"reasoning": {"max_tokens": 512, "exclude": True}}}
+    assert profile.llm_kwargs(max_tokens=400)["max_tokens"] == 912  # the tighter cap wins
+    assert profile.llm_kwargs(max_tokens=4000)["max_tokens"] == 1536
+    assert GenerationProfile(reasoning_effort="low").llm_kwargs() == {"extra_body": {"reasoning": {"effort": "low"}}}
+    assert GenerationProfile().llm_kwargs() == {}
+
+
+def test_restore_stop_only_after_a_stop_finish():
+    profile = GenerationProfile(stop=[STOP])
+    cut = '```dsl\nRULE r\nWHEN claim.amount > 500\nTHEN REJECT "x"\n'
+    assert profile.restore_stop(cut, "stop") == cut.rstrip() + "\n" + STOP
+    assert profile.restore_stop(cut, "length") == cut  # truncated, not stopped: leave as is
+    assert profile.restore_stop(cut, None) == cut
+    closed = cut + STOP
+    assert profile.restore_stop(closed, "stop") == closed
+    assert profile.restore_stop("I cannot help with that.", "stop") == "I cannot help with that."
+    assert GenerationProfile().restore_stop(cut, "stop") == cut
+
+
+def test_restore_stop_leaves_a_natural_end_with_trailing_prose():
+    profile = GenerationProfile(stop=[STOP])
+    answer = '```dsl\nRULE r\nWHEN claim.amount > 500\nTHEN REJECT "x"\nEND\n```\n\nThis rejects large claims.'
+    assert profile.restore_stop(answer, "stop") == answer
+    unfenced = 'RULE r WHEN claim.amount > 500 THEN REJECT "x" END\nLet me know if you need changes.'
+    assert profile.restore_stop(unfenced, "stop") == unfenced
+
+
+def test_split_reasoning_from_field_and_inline_blocks():
+    message = SimpleNamespace(content="<think>plan the rule</think>RULE r END",
+                              additional_kwargs={"reasoning_content": "from the provider"})
+    reasoning, answer = split_reasoning(message)
+    assert answer == "RULE r END"
+    assert "from the provider" in reasoning and "plan the rule" in reasoning
+    assert split_reasoning("<think>never closed") == ("<think>never closed", "")
+
+
+def test_profile_lookup_by_longest_model_prefix(monkeypatch):
+    import config.settings
+
+    profiles = {"default": {"stop": [STOP], "max_tokens": 1024},
+                "deepseek/": {"max_tokens": 512},
+                "deepseek/deepseek-r1": {"max_tokens": 2048, "reasoning_max_tokens": 1024}}
+    monkeypatch.setattr(config.settings, "get_settings", lambda: SimpleNamespace(GENERATION_PROFILES=profiles))
+    assert get_generation_profile("deepseek/deepseek-r1:free").reasoning_max_tokens == 1024
+    assert get_generation_profile("deepseek/deepseek-v3").max_tokens == 512
+    assert get_generation_profile("mistralai/mistral-7b-instruct").stop == [STOP]
+    assert get_generation_profile(None).max_tokens == 1024
@@ -0,0 +1,17 @@
+from app.utils.grammar_index import get_grammar_index
+
+
+def test_for_each_closure_pulls_in_its_tokens():
+    index = get_grammar_index("1.0")
+    closure = index.closure(["forEachCondition"])
+    assert {"FOR", "EACH", "IN", "itemName", "collectionPath", "fieldPath"} <= closure
+    # condition is a dispatch point: included, but its alternatives are not expanded
+    assert "condition" in closure and "existsCondition" not in closure
+
+
+def test_slice_is_smaller_than_grammar_and_follows_examples():
+    index = get_grammar_index("1.0")
+    plain = index.slice_for("Validate claim amount exceeds limit")
+    assert "forEachCondition:" not in plain and "WS:" not in plain
+    with_example = index.slice_for("Check line items", [{"dsl_pattern": "RULE r WHEN FOR EACH x IN claim.items x.a > 0 THEN APPROVE END"}])
+    assert "forEachCondition:" in with_example
@@ -0,0 +1,49 @@
+import time
+
+from app.history import HistoryStore, HistoryWriter, text_rule_hash
+
+RULE = '```dsl\nRULE high\nWHEN claim.amount > 1000\nTHEN REJECT "high"\nEND\n```'
+
+
+def test_writer_batches_records_and_queries_by_time_and_rule(tmp_path):
+    writer = HistoryWriter(HistoryStore(str(tmp_path), segment_bytes=32 * 1024), batch_size=50, flush_interval=0.05)
+    started = time.time()
+    for i in range(400):
+        writer.record(endpoint="generate", query=f"q{i}", prompt={"prompt": "p"}, model="fast", latency=0.1,
+                      rule=RULE if i % 4 == 0 else f"RULE r{i} WHEN claim.x > {i} THEN FLAG \"x\" END",
+                      valid=True, ts=started + i)
+    writer.close()
+
+    store = HistoryStore(str(tmp_path), segment_bytes=32 * 1024)
+    assert len(store.segments()) > 1
+    high = store.query(rule_hash=text_rule_hash(RULE), limit=1000)
+    assert len(high) == 100 and high[0]["query"] == "q396" and high[0]["valid"] is True
+    window = store.query(start=started + 100, end=started + 110)
+    assert [r["query"] for r in window] == [f"q{i}" for i in range(109, 99, -1)]
+    assert window[0]["prompt_hash"] and window[0]["completion_tokens"] > 0
+    assert text_rule_hash(RULE.replace("RULE high\n", "RULE high ")) == text_rule_hash(RULE)
+
+
+def test_old_segments_are_dropped(tmp_path):
+    store = HistoryStore(str(tmp_path), segment_bytes=1, max_segments=2)
+    for i in range(5):
+        store.write([(float(i), "generate", "q", None, None, 0, 0, 0.1, "ok", None, None, None, None)])
+    assert len(store.segments()) == 2
+    assert [r["ts"] for r in store.query()] == [4.0, 3.0]
+
+
+def test_record_generation_stores_model_and_reported_usage(tmp_path, monkeypatch):
+    from app import history
+
+    writer = HistoryWriter(HistoryStore(str(tmp_path)), flush_interval=0.01)
+    monkeypatch.setattr(history, "get_history_writer", lambda: writer)
+    history.record_generation("generate", "q1", {"codegen_result": RULE, "codegen_tier": "fast",
+                                                 "codegen_model": "deepseek/deepseek-r1:free",
+                                                 "usage": {"prompt_tokens": 812, "completion_tokens": 40}}, 0.5)
+    history.record_generation("generate", "q2", {"codegen_result": RULE, "codegen_model": "m"}, 0.5)
+    writer.close()
+
+    reported, estimated = sorted(HistoryStore(str(tmp_path)).query(), key=lambda r: r["query"])
+    assert (reported["model"], reported["tier"]) == ("deepseek/deepseek-r1:free", "fast")
+    assert (reported["prompt_tokens"], reported["completion_tokens"]) == (812, 40)
+    assert estimated["model"] == "m" and estimated["completion_tokens"] > 0
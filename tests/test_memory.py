@@ -0,0 +1,55 @@
+from memory.custom.sqlite_memory import SQLiteMemory
+from memory.custom.windowed_memory import WindowedMemory
+from memory.my_memory import MyMemory
+
+
+def _summarize(summary, turns):
+    return ((summary + " ") if summary else "") + " ".join(t.content.split()[1] for t in turns)
+
+
+def test_windowed_memory_evicts_and_round_trips():
+    memory = MyMemory("windowed", max_tokens=30, summarizer=_summarize)
+    for i in range(20):
+        memory.save(f"turn {i} " + "x" * 36, role="user" if i % 2 == 0 else "assistant")
+    messages = memory.load()
+    assert messages[0] == {"role": "system", "content": "Summary of the earlier conversation: "
+                           + " ".join(str(i) for i in range(20 - len(messages) + 1))}
+    assert sum(len(m["content"]) for m in messages[1:]) // 4 <= 30
+    assert messages[-1]["content"].startswith("turn 19")
+    copy = MyMemory.from_data(memory.to_data(), backend="windowed", summarizer=_summarize)
+    assert copy.load() == messages
+    assert MyMemory.from_data(["a", "b"], backend="custom").load() == ["a", "b"]
+
+
+def test_sqlite_memory_matches_windowed_memory(tmp_path):
+    path = str(tmp_path / "memory.db")
+    stored = SQLiteMemory("s1", path=path, max_tokens=30, summarizer=_summarize)
+    windowed = WindowedMemory(max_tokens=30, summarizer=_summarize)
+    SQLiteMemory("s2", path=path).save("other session")
+    for i in range(20):
+        stored.save(f"turn {i} " + "x" * 36)
+        windowed.save(f"turn {i} " + "x" * 36)
+    assert stored.load() == windowed.load()
+    assert SQLiteMemory("s1", path=path, max_tokens=30).load() == windowed.load()
+    stored.clear()
+    assert stored.load() == []
+    assert SQLiteMemory("s2", path=path).load() == [{"role": "user", "content": "other session"}]
+
+
+def test_sqlite_memory_summarizes_outside_the_lock(tmp_path):
+    path = str(tmp_path / "memory.db")
+    stored = SQLiteMemory("s1", path=path, max_tokens=30)
+    calls = []
+
+    def summarize(summary, turns):
+        assert not stored._lock.locked()
+        calls.append([t.content.split()[1] for t in turns])
+        if len(calls) == 1:
+            stored.clear()  # a concurrent writer: this summary must not be stored
+        return _summarize(summary, turns)
+
+    stored.summarizer = summarize
+    for i in range(10):
+        stored.save(f"turn {i} " + "x" * 36)
+    assert calls[0] == ["0"]
+    assert stored.summary and "0" not in stored.summary.split()
@@ -0,0 +1,35 @@
+import pytest
+
+from app.planner import merge_subrule_results, plan_subrules
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Validate amount, coverage, ICD-10 code and provider network",
+     ["Validate amount", "Validate coverage", "Validate ICD-10 code", "Validate provider network"]),
+    ("Create rules to check claim amount, diagnosis code, and provider NPI.",
+     ["Create rules to check claim amount", "Create rules to check diagnosis code",
+      "Create rules to check provider NPI"]),
+])
+def test_enumerations_are_split(query, expected):
+    assert plan_subrules(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "Flag claims where amount > 5000 and provider is out of network",
+    "check that the patient is over 18 and has active insurance",
+    "Validate amount and coverage",
+    "Validate claims where amount, units and code are present",
+    "Check amount over 5000, units over 10 and code",
+    "Generate a rule rejecting claims over $10,000",
+])
+def test_conjunctions_and_single_intents_are_not_split(query):
+    assert plan_subrules(query) == [query]
+
+
+def test_merge_renames_duplicate_rule_names():
+    rule = 'RULE amount_check WHEN claim.amount > 1 THEN APPROVE END'
+    merged = merge_subrule_results([{"index": 1, "codegen_result": rule}, {"index": 0, "codegen_result": rule},
+                                    {"index": 2, "codegen_result": "not a rule"}])
+    assert merged["valid_rules"] == 2
+    assert "RULE amount_check_2" in merged["codegen_result"]
+    assert merged["rule_set"][2]["validation"]["valid"] is False
@@ -0,0 +1,46 @@
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from app.profiling import Profile, ProfileStore, start_profile
+
+
+def _busy(state):
+    return {"total": sum(i * i for i in range(state["n"]))}
+
+
+def test_profile_records_nodes_across_threads(tmp_path):
+    profile = Profile("query", "header")
+    node = profile.wrap("generator", _busy)
+    assert node.__name__ == "_busy"
+    with ThreadPoolExecutor(2) as pool:
+        assert list(pool.map(node, [{"n": 20000}, {"n": 30000}]))[0] == {"total": sum(i * i for i in range(20000))}
+    profile.finish()
+
+    timing = profile.as_dict()["nodes"]["generator"]
+    assert timing["calls"] == 2 and timing["wall_seconds"] > 0 and timing["cpu_seconds"] > 0
+    assert any("_busy" in f["function"] for f in profile.top_functions())
+    path = tmp_path / "run.prof"
+    path.write_bytes(profile.pstats_bytes())
+    assert any(func[2] == "_busy" for func in pstats.Stats(str(path)).stats)
+
+
+def test_store_keeps_most_recent_profiles():
+    store = ProfileStore(capacity=2)
+    profiles = [Profile(str(i)).finish() for i in range(3)]
+    for profile in profiles:
+        store.add(profile)
+    assert [p["label"] for p in store.list()] == ["2", "1"]
+    assert store.get(profiles[0].profile_id) is None and store.get(profiles[2].profile_id) is profiles[2]
+
+
+def test_profile_header_requires_the_admin_token(monkeypatch):
+    from app import profiling
+
+    settings = SimpleNamespace(PROFILE_HEADER_ENABLED=True, PROFILE_SAMPLE_RATE=0.0, ADMIN_TOKEN="")
+    monkeypatch.setattr(profiling, "get_settings", lambda: settings)
+    assert start_profile("1", admin_token="") is None
+    settings.ADMIN_TOKEN = "secret"
+    assert start_profile("1") is None
+    assert start_profile("1", admin_token="wrong") is None
+    assert start_profile("1", admin_token="secret").trigger == "header"
@@ -0,0 +1,88 @@
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("faiss")
+
+from app.rag.embeddings import HashingEmbedder
+from app.rag.index import RagIndex, content_hash
+
+EXAMPLES = [
+    {"prompt": "Reject claims over $5000", "description": "amount threshold"},
+    {"prompt": "Flag inpatient stays longer than 30 days", "description": "length of stay"},
+    {"prompt": "Approve preventive care visits", "description": "visit type"},
+]
+
+
+def _open(path, **kwargs):
+    return RagIndex(str(path), embedder=HashingEmbedder(64), **kwargs)
+
+
+def test_add_search_delete_and_reload(tmp_path):
+    index = _open(tmp_path)
+    assert index.add(EXAMPLES) == 3
+    assert index.add(EXAMPLES[:1]) == 0
+    hits = index.search("claims over $5000", k=1)
+    assert hits[0]["prompt"] == EXAMPLES[0]["prompt"] and hits[0]["score"] > 0
+    assert index.delete([content_hash(EXAMPLES[0])]) == 1
+    assert all(h["prompt"] != EXAMPLES[0]["prompt"] for h in index.search("claims over $5000", k=3))
+    index.close()
+
+    reopened = _open(tmp_path)
+    assert len(reopened) == 2
+    assert reopened.search("inpatient stays", k=1)[0]["prompt"] == EXAMPLES[1]["prompt"]
+    assert reopened.sync(EXAMPLES) == {"added": 1, "removed": 0}
+    reopened.close()
+    assert len(_open(tmp_path)) == 3
+
+
+def test_interrupted_write_keeps_sqlite_and_faiss_consistent(tmp_path, monkeypatch):
+    index = _open(tmp_path)
+    index.add(EXAMPLES[:2])
+    monkeypatch.setattr(index._faiss, "write_index", lambda *args: (_ for _ in ()).throw(OSError("disk full")))
+    with pytest.raises(OSError):
+        index.add(EXAMPLES[2:])
+    with pytest.raises(OSError):
+        index.delete([content_hash(EXAMPLES[0])])
+    assert len(index) == 2
+    monkeypatch.undo()
+    index.close()
+
+    reopened = _open(tmp_path)
+    assert len(reopened) == 2
+    assert reopened.sync(EXAMPLES) == {"added": 1, "removed": 0}
+
+
+def test_missing_index_file_is_rebuilt_from_sqlite(tmp_path):
+    index = _open(tmp_path)
+    index.add(EXAMPLES)
+    index.close()
+    for name in os.listdir(tmp_path):
+        if name.endswith(".faiss"):
+            os.remove(tmp_path / name)
+
+    reopened = _open(tmp_path)
+    assert len(reopened) == 3
+    assert reopened.search("preventive care", k=1)[0]["prompt"] == EXAMPLES[2]["prompt"]
+
+
+def test_search_during_writes(tmp_path):
+    index = _open(tmp_path, ivf_threshold=200)
+    index.add(EXAMPLES)
+    errors = []
+
+    def search():
+        try:
+            for _ in range(200):
+                assert index.search("claims over $5000", k=2)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=search)
+    thread.start()
+    for start in range(0, 300, 30):
+        index.add({"prompt": f"rule {i}", "description": f"generated {i}"} for i in range(start, start + 30))
+    thread.join()
+    assert not errors
+    assert len(index) == 303
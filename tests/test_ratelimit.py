@@ -0,0 +1,63 @@
+import time
+
+import httpx
+import pytest
+
+from app.metrics import metrics
+from app.ratelimit import (AIMDController, LLMRateLimiter, RateLimitedTransport, RateLimitTimeout, TokenBucket,
+                           retry_after_seconds)
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    bucket = TokenBucket(600, capacity=2)  # 10 per second
+    assert [round(bucket.reserve(1), 2) for _ in range(4)] == [0.0, 0.0, 0.1, 0.2]
+    bucket.adjust(2)
+    assert bucket.reserve(1) < 0.2
+
+
+def test_aimd_increases_on_success_and_halves_on_overload():
+    controller = AIMDController(initial=4, maximum=8)
+    for _ in range(8):
+        controller.on_success()
+    assert 5 <= controller.limit < 6
+    sent = [controller.acquire(timeout=0) for _ in range(2)]
+    controller.on_overload(sent[0])
+    controller.on_overload(sent[1])  # sent before the decrease: no second decrease
+    assert 2.5 <= controller.limit < 3
+    assert controller.acquire(timeout=0) is None  # two in flight, limit 2
+    controller.release()
+    assert controller.acquire(timeout=0) is not None
+
+
+def test_transport_honours_retry_after():
+    responses = iter([httpx.Response(429, headers={"Retry-After": "0.2"}), httpx.Response(200, json={})])
+    limiter = LLMRateLimiter(rpm=0, initial_concurrency=4)
+    waits = metrics.snapshot()["timings"].get("llm_queue_wait_seconds", {}).get("count", 0)
+    with httpx.Client(transport=RateLimitedTransport(limiter, httpx.MockTransport(lambda r: next(responses)))) as client:
+        assert client.post("https://llm/v1/chat/completions", json={"messages": []}).status_code == 429
+        assert limiter.stats()["limit"] == 2
+        started = time.monotonic()
+        assert client.post("https://llm/v1/chat/completions", json={"messages": []}).status_code == 200
+    assert time.monotonic() - started >= 0.15
+    assert metrics.snapshot()["timings"]["llm_queue_wait_seconds"]["count"] == waits + 2
+    assert retry_after_seconds("3") == 3.0 and retry_after_seconds("soon") is None
+
+
+def test_acquire_fails_fast_past_the_request_timeout():
+    limiter = LLMRateLimiter(rpm=60, initial_concurrency=1, burst_seconds=1)  # one request, then one per second
+    sent = limiter.acquire(timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(timeout=0.1)  # the bucket is empty for ~1s
+    assert time.monotonic() - started < 0.1
+    limiter.requests.adjust(1)
+    with pytest.raises(RateLimitTimeout):
+        limiter.acquire(timeout=0.1)  # the only slot is taken
+    limiter.release(sent)
+
+    limiter = LLMRateLimiter(rpm=60, burst_seconds=1)
+    limiter.release(limiter.acquire())
+    transport = RateLimitedTransport(limiter, httpx.MockTransport(lambda r: httpx.Response(200, json={})))
+    with httpx.Client(transport=transport, timeout=httpx.Timeout(5, pool=0.1)) as client:
+        with pytest.raises(httpx.PoolTimeout):
+            client.post("https://llm/v1/chat/completions", json={"messages": []})
@@ -0,0 +1,52 @@
+from app.router import ComplexityRouter, featurize
+
+PROFILES = {
+    "basic": {"tier": "fast", "max_examples": 2, "example_token_budget": 60, "max_output_tokens": 400},
+    "advanced": {"tier": "reasoning", "max_examples": 3, "example_token_budget": 1000, "max_output_tokens": 2048},
+}
+
+EXAMPLES = [
+    {"prompt": "Reject claims over 500 dollars", "complexity": "basic",
+     "dsl_pattern": 'RULE r WHEN claim.amount > 500 THEN REJECT "x" END'},
+    {"prompt": "Flag claims under 10 dollars", "complexity": "basic",
+     "dsl_pattern": 'RULE r WHEN claim.amount < 10 THEN FLAG "x" END'},
+    {"prompt": "Approve claims with amount equal to zero", "complexity": "basic",
+     "dsl_pattern": "RULE r WHEN claim.amount == 0 THEN APPROVE END"},
+    {"prompt": "For each line item with a diagnosis code not covered by the policy, "
+               "reject the claim unless prior authorization exists", "complexity": "advanced",
+     "dsl_pattern": "RULE r WHEN FOR EACH item IN claim.line_items item.code != 1 THEN REJECT \"x\" END " * 4},
+    {"prompt": "Reject inpatient claims where any diagnosis requires prior authorization "
+               "and the provider is out of network", "complexity": "advanced",
+     "dsl_pattern": "RULE r WHEN EXISTS diagnosis WHERE diagnosis.code == \"Z\" THEN REJECT \"x\" END " * 4},
+]
+
+
+def test_featurize_drops_stop_words_and_adds_bigrams():
+    assert featurize("Create a rule to reject claims") == {"reject": 1, "claims": 1, "reject_claims": 1}
+
+
+def test_routes_by_predicted_complexity():
+    router = ComplexityRouter(EXAMPLES, PROFILES)
+    simple = router.route("Reject claims over 1000 dollars")
+    assert (simple.complexity, simple.tier, simple.max_output_tokens) == ("basic", "fast", 400)
+    assert 0.5 < simple.confidence <= 1.0
+    hard = router.route("Reject claims where a diagnosis needs prior authorization for each line item")
+    assert (hard.complexity, hard.tier, hard.max_examples) == ("advanced", "reasoning", 3)
+    assert hard.as_dict()["example_token_budget"] == 1000
+
+
+def test_unlabelled_examples_fall_back_to_the_default_profile():
+    router = ComplexityRouter([{"prompt": "anything"}], PROFILES)
+    route = router.route("Reject claims over 500 dollars")
+    assert (route.complexity, route.tier, route.confidence) == ("advanced", "reasoning", 0.0)
+
+
+def test_select_examples_ranks_by_similarity_within_the_budget():
+    router = ComplexityRouter(EXAMPLES, PROFILES)
+    route = router.route("Reject claims over 1000 dollars")
+    selected = router.select_examples("Reject claims over 1000 dollars", route)
+    assert selected[0] is EXAMPLES[0]
+    assert len(selected) <= route.max_examples
+    assert all(e["complexity"] == "basic" for e in selected)  # the long examples do not fit the 60-token budget
+    generous = router.route("Reject claims where a diagnosis needs prior authorization for each line item")
+    assert len(router.select_examples("prior authorization diagnosis", generous)) == 3
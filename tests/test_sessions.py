@@ -0,0 +1,59 @@
+from app.sessions import SessionStore, delta_query
+
+RULE = 'RULE high_amount WHEN claim.amount > 10000 THEN REJECT "too high" END'
+
+
+def test_session_records_rule_and_builds_delta_prompt():
+    store = SessionStore(max_sessions=10)
+    session = store.create()
+    session.record("reject claims over 10000", f"```dsl\n{RULE}\n```", examples=[{"prompt": "p", "dsl_pattern": RULE}])
+    store.put(session)
+    assert store.get(session.session_id) is session
+    assert session.rule.name == "high_amount" and session.turns == 1
+    query = delta_query(session.rule_text, "also flag claims over 5000")
+    assert "also flag claims over 5000" in query and "dsl_pattern" not in query
+    assert [m["role"] for m in session.as_dict()["history"]] == ["user", "assistant"]
+
+
+def test_session_store_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    sessions = [store.create() for _ in range(3)]
+    for session in sessions[:2]:
+        session.record("q", RULE)
+        store.put(session)
+    store.get(sessions[0].session_id)  # touch: sessions[1] is now the oldest
+    sessions[2].record("q", RULE)
+    store.put(sessions[2])
+    assert store.get(sessions[1].session_id) is None
+    assert store.get(sessions[0].session_id) is sessions[0]
+
+    capped = SessionStore(max_bytes=sessions[0].size * 2 + 1)
+    for session in sessions:
+        capped.put(session)
+    assert len(capped) == 2 and capped.bytes <= capped.max_bytes
+
+
+def test_session_growth_is_accounted_and_evicts_by_bytes():
+    store = SessionStore(max_bytes=20000, memory_tokens=100000)
+    other = store.create()
+    other.record("q", RULE)
+    store.put(other)
+    session = store.create()
+    for turn in range(6):
+        session.record(f"turn {turn} " + "x" * 1000, RULE + " " * 2000)
+        store.put(session)
+        assert store.bytes == sum(s.size for s in (other, session) if store.get(s.session_id) is s)
+    assert session.size > 20000 - other.size
+    assert store.get(other.session_id) is None
+    assert store.bytes == session.size
+    assert store.delete(session.session_id) and store.bytes == 0
+
+
+def test_failed_turn_does_not_replace_the_current_rule():
+    session = SessionStore().create()
+    session.record("reject claims over 10000", "[Error] Error code: 429")
+    assert session.rule_text == "" and session.turns == 1  # still a first-turn generation next time
+    session.record("reject claims over 10000", RULE)
+    session.record("also flag claims over 5000", "Error: No result generated")
+    assert session.rule_text == RULE and session.rule.name == "high_amount"
+    assert session.as_dict()["history"][-1]["content"] == "Error: No result generated"
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from engine.stream import StreamEvaluator
+
+RULES = [
+    'RULE amount_limit WHEN claim.amount > 1000 THEN REJECT "too high" END',
+    'RULE copay WHEN patient.age >= 65 THEN SET claim.copay = claim.amount * 0.5 END',
+]
+TYPES = {"claim.amount": "float", "patient.age": "int"}
+
+
+def _write_claims(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"claim": {"amount": i * 37 % 2000}, "patient": {"age": 60 + i % 10}}) + "\n")
+        f.write("{broken\n")
+
+
+def test_stream_jsonl_and_resume(tmp_path):
+    claims, expected_out, out = tmp_path / "claims.jsonl", tmp_path / "expected.jsonl", tmp_path / "out.jsonl"
+    _write_claims(claims, 500)
+    evaluator = StreamEvaluator(RULES, chunk_size=2048)
+    stats = evaluator.run(str(claims), str(expected_out))
+    assert stats.rows == 501 and stats.errors == 1
+    lines = expected_out.read_text().splitlines()
+    assert json.loads(lines[-1])["error"]
+    assert json.loads(lines[5])["results"] == {"amount_limit": [], "copay": [["SET", "claim.copay", 92.5]]}
+
+    class Interrupted(StreamEvaluator):
+        chunks = 0
+
+        def _checkpoint(self, *args):
+            super()._checkpoint(*args)
+            Interrupted.chunks += 1
+            if Interrupted.chunks == 3:
+                raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        Interrupted(RULES, chunk_size=2048).run(str(claims), str(out))
+    StreamEvaluator(RULES, chunk_size=2048).run(str(claims), str(out), resume=True)
+    assert out.read_text() == expected_out.read_text()
+
+
+def test_stream_csv(tmp_path):
+    claims = tmp_path / "claims.csv"
+    claims.write_text("claim.amount,patient.age\n5000,70\n10,\n,80\n")
+    rows = list(StreamEvaluator(RULES, column_types=TYPES).iter_results(str(claims)))
+    assert rows == [
+        [[("REJECT", "too high")], [("SET", "claim.copay", 2500.0)]],
+        [[], []],
+        [[], [("SET", "claim.copay", None)]],
+    ]
+
+
+def test_fresh_run_overwrites_output(tmp_path):
+    claims, out = tmp_path / "claims.csv", tmp_path / "out.csv"
+    claims.write_text("claim.amount,patient.age\n5000,70\n10,60\n")
+    evaluator = StreamEvaluator(RULES, column_types=TYPES)
+    evaluator.run(str(claims), str(out))
+    first = out.read_text()
+    evaluator.run(str(claims), str(out))
+    assert out.read_text() == first
+    assert first.startswith("row,rule,action")
+
+
+def test_csv_column_types():
+    from engine.stream import _csv_column
+
+    assert _csv_column(["99213", "00123", ""]).values.tolist() == ["99213", "00123", None]
+    assert _csv_column(["-5", "12", ""], "int").values.tolist() == [-5, 12, None]
+    assert _csv_column(["--5", "3", str(2 ** 70)], "int").values.tolist() == ["--5", 3, 2 ** 70]
+    assert _csv_column(["0", "0.5", "-0.25"], "float").values.tolist() == [0.0, 0.5, -0.25]
+    assert _csv_column(["True", "false", ""], "bool").values.tolist() == [True, False, None]
+    assert _csv_column(["yes", "false"], "bool").values.tolist() == ["yes", False]
+
+
+def test_csv_matches_jsonl(tmp_path):
+    rules = ['RULE visit WHEN procedure.code IN ["99213", "99214"] THEN FLAG "visit" END',
+             'RULE npi WHEN provider.npi MATCHES "^[0-9]{10}$" THEN APPROVE END',
+             'RULE limit WHEN claim.amount > 100 THEN REJECT "high" END']
+    claims = [{"procedure": {"code": code}, "provider": {"npi": npi}, "claim": {"amount": amount}}
+              for code, npi, amount in [("99213", "1234567890", 50.0), ("A0425", "12345", 500.0),
+                                        ("99214", "0987654321", 150.5)] * 20]
+    jsonl, csv_path = tmp_path / "claims.jsonl", tmp_path / "claims.csv"
+    jsonl.write_text("".join(json.dumps(c) + "\n" for c in claims))
+    csv_path.write_text("procedure.code,provider.npi,claim.amount\n" + "".join(
+        f"{c['procedure']['code']},{c['provider']['npi']},{c['claim']['amount']}\n" for c in claims))
+    evaluator = StreamEvaluator(rules, chunk_size=256, column_types={"claim.amount": "float"})
+    expected = list(evaluator.iter_results(str(jsonl)))
+    assert expected[0] == [[("FLAG", "visit")], [("APPROVE", None)], []]
+    assert list(evaluator.iter_results(str(csv_path))) == expected
+
+
+def test_leading_zero_codes_compare_as_strings(tmp_path):
+    claims = tmp_path / "claims.csv"
+    claims.write_text("procedure.code\n00123\n123\n")
+    rules = ['RULE code WHEN procedure.code == "00123" THEN FLAG "code" END']
+    rows = list(StreamEvaluator(rules).iter_results(str(claims)))
+    assert rows == [[[("FLAG", "code")]], [[]]]
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from app.dsl import DSLSyntaxError, parse_rule, validate_rule
+from app.dsl.synth import ClaimGenerator, RuleGenerator, iter_rules, load_fields, main
+from engine import evaluate
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return RuleGenerator(max_depth=3, max_conditions=6, seed=7)
+
+
+def test_generated_rules_parse_validate_and_evaluate(generator):
+    claims = ClaimGenerator(seed=7)
+    for i in range(300):
+        text, conditions, depth = generator.generate(i)
+        assert validate_rule(text).valid, text
+        assert depth <= 3
+        evaluate(text, claims.claim(i))
+
+
+def test_generation_is_reproducible_per_index(generator):
+    assert generator.rule(42) == RuleGenerator(max_depth=3, max_conditions=6, seed=7).rule(42)
+    assert generator.rule(42) != RuleGenerator(max_depth=3, max_conditions=6, seed=8).rule(42)
+
+
+def test_depth_and_size_limits():
+    flat = RuleGenerator(max_depth=0, max_conditions=1)
+    for i in range(50):
+        text, conditions, depth = flat.generate(i)
+        assert (conditions, depth) == (1, 0)
+        assert " AND " not in text.split("\nTHEN")[0]
+
+
+def test_near_valid_rules_do_not_parse(generator):
+    records = list(iter_rules(generator, 200, near_valid=0.5))
+    invalid = [r for r in records if not r["valid"]]
+    assert 50 < len(invalid) < 150
+    for record in invalid:
+        assert record["mutation"]
+        with pytest.raises(DSLSyntaxError):
+            parse_rule(record["rule"])
+
+
+def test_claim_distributions_from_spec(tmp_path):
+    spec = tmp_path / "fields.yaml"
+    spec.write_text("patient.age: {type: number, dist: int, low: 65, high: 70}\n"
+                    "claim.type: {type: string, choices: [inpatient]}\n")
+    claims = ClaimGenerator(load_fields(str(spec)), missing=0.0)
+    for i in range(50):
+        claim = claims.claim(i)
+        assert 65 <= claim["patient"]["age"] <= 70
+        assert claim["claim"]["type"] == "inpatient"
+        assert claim["claim"]["line_items"]
+
+
+def test_cli_streams_jsonl(tmp_path):
+    out = tmp_path / "rules.jsonl"
+    assert main(["rules", str(out), "--count", "25", "--start", "100", "--near-valid", "0.2"]) == 0
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    assert [r["id"] for r in records] == list(range(100, 125))